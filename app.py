@@ -1,10 +1,25 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse
 from pydantic import BaseModel
-from typing import Optional, Literal
+from typing import List, Optional, Literal
+import asyncio
 import httpx
+import json
 import os
+import time
 from dotenv import load_dotenv
+from functools import lru_cache
+
+import cancellation
+from chunking import CHUNK_LINES
+from jobs import JobRunner, JobStore
+from profiling import PROFILE_DIR, ProfileSession, Timings, current_timings, http_trace, span
+from prompts import split_cacheable
+from routing import AUTO, GENERATE, provider_of_key, router, strategy_key
+from structured import PROSE_MAX_TOKENS, RhymePair, gemini_schema
+from search import SearchIndex
+from scheduler import OUTPUT_RESERVE, Overloaded, estimate_tokens, scheduler
 
 # Load .env file
 load_dotenv()
@@ -19,6 +34,30 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-request stage timings (Server-Timing header) and armed profiling, see profiling.py
+profile_session = ProfileSession()
+
+@app.middleware("http")
+async def timing_middleware(request: Request, call_next):
+    timings = Timings()
+    token = current_timings.set(timings)
+    profiler = profile_session.claim(request.url.path)
+    try:
+        if profiler:
+            with profiler:
+                response = await call_next(request)
+        else:
+            response = await call_next(request)
+    finally:
+        current_timings.reset(token)
+        if profiler:
+            profile_session.release(profiler, request.url.path)
+    response.headers["Server-Timing"] = timings.header()
+    return response
+
+# Outermost: each request runs as a task that a client disconnect or /cancel/{request_id} cancels
+app.add_middleware(cancellation.CancelOnDisconnect)
+
 # Models
 class RhymeIdentificationRequest(BaseModel):
     text: str
@@ -26,6 +65,18 @@ class RhymeIdentificationRequest(BaseModel):
     prompt_strategy: Literal["zero_shot_structured", "zero_shot_algorithm", "few_shot", "zero_shot_cot", "few_shot_cot"]
     use_rag: bool = False
     api_key: str
+    priority: Literal["interactive", "batch"] = "interactive"
+    # "json": schema-constrained output, validated into RhymeResponse.pairs (see structured.py)
+    output_format: Literal["text", "json"] = "text"
+    include_timings: bool = False
+    # Poems longer than this many verse lines are analyzed in overlapping stanza chunks,
+    # concurrently, and the pairs merged (see chunking.py); 0 sends every poem whole
+    chunk_lines: int = CHUNK_LINES
+    # model "auto": the cheapest model predicted to answer within deadline_s and, if set, measured
+    # at min_accuracy or better offline (see routing.py); keys per provider as for generation
+    deadline_s: Optional[float] = None
+    min_accuracy: Optional[Literal["low", "medium", "high"]] = None
+    api_keys: dict[str, str] = {}
 
 class RhymeGenerationRequest(BaseModel):
     theme: str
@@ -34,13 +85,81 @@ class RhymeGenerationRequest(BaseModel):
     num_lines: int = 4
     model: str
     use_rag: bool = False
+    # Leave lines the poets repeat (COPY annotations, see repetition.py) out of the RAG examples
+    exclude_copies: bool = False
     api_key: str
+    priority: Literal["interactive", "batch"] = "interactive"
+    include_timings: bool = False
+    # Best-of-N: run best_of drafts concurrently (round-robin over models, default [model]) and
+    # return the first one the local rhyme check finds compliant (see best_of_n.py)
+    best_of: int = 1
+    models: Optional[list[str]] = None
+    # Keys per provider for the models above; api_key is used for providers not listed
+    api_keys: dict[str, str] = {}
+    # Meter label from meter.py ("iambic-15", "trochaic-8"): added to the prompt, used to pick
+    # RAG examples and checked on the result (verification)
+    meter: Optional[str] = None
+    # Corpus poet (records.POETS id) to write like: their fingerprint summary goes in the prompt
+    # and RAG examples are their most typical pairs, then the nearest poets' (see style.py)
+    poet: Optional[str] = None
+    # model "auto", see RhymeIdentificationRequest
+    deadline_s: Optional[float] = None
+    min_accuracy: Optional[Literal["low", "medium", "high"]] = None
 
 class RhymeResponse(BaseModel):
     result: str
     model_used: str
     prompt_used: str
     tokens_used: Optional[int] = None
+    # Input tokens the provider served from its prompt cache
+    cached_tokens: Optional[int] = None
+    # Typed rhyme pairs when output_format is "json"
+    pairs: Optional[list[RhymePair]] = None
+    # Milliseconds per stage (rag, prompt, queue, client, connect, tls, upstream, download, parse) if include_timings
+    timings: Optional[dict[str, float]] = None
+    # Local check of the returned poem (best-of-N or a requested meter), and every draft's status and score
+    verification: Optional[dict] = None
+    drafts: Optional[list[dict]] = None
+    # Long poems: lines, own lines, tokens and latency of every chunk
+    chunks: Optional[list[dict]] = None
+    # model "auto": the chosen model, why, and the predicted cost/latency of every candidate
+    routing: Optional[dict] = None
+
+class AttributionRequest(BaseModel):
+    text: str
+    variant: Optional[Literal["topintzi"]] = None
+    top: int = 3
+
+class PackedIdentificationRequest(BaseModel):
+    texts: list[str]
+    model: str
+    prompt_strategy: Literal["zero_shot_structured", "zero_shot_algorithm", "few_shot", "zero_shot_cot", "few_shot_cot"]
+    api_key: str
+    priority: Literal["interactive", "batch"] = "interactive"
+
+class PackedIdentificationResponse(BaseModel):
+    # Per poem, in input order: result (JSON), pairs, packed, fallback, input/output tokens, latency_s
+    results: list[dict]
+    model_used: str
+    stats: dict
+
+class ProfileRequest(BaseModel):
+    mode: Literal["cprofile", "sample"] = "sample"
+    # Profile the next `requests` requests under `path`...
+    requests: int = 10
+    path: str = "/"
+    # ...or a build_corpus job with these params instead
+    build: Optional[dict] = None
+
+class JobRequest(BaseModel):
+    kind: Literal["build_corpus", "analyze", "batch_identify"]
+    # build_corpus: poets | all, variant, mode, max_distance
+    # analyze: texts and/or poets, variant, mode, max_distance
+    # batch_identify: texts and/or poets, model, prompt_strategy, poll_interval
+    params: dict = {}
+
+# Seconds a lane is held back after a provider 429 without Retry-After
+UPSTREAM_BACKOFF = 30
 
 # API Keys
 ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY", "")
@@ -124,74 +243,212 @@ MODEL_CONFIGS = {
     }
 }
 
-async def call_model(model_name: str, prompt: str, api_key: str) -> tuple[str, Optional[int]]:
-    """Call specified model with prompt using provided API key"""
+def anthropic_content(prompt: str):
+    """Message content with the static template prefix (prompts.split_cacheable) marked for caching"""
+    prefix, rest = split_cacheable(prompt)
+    if not prefix:
+        return prompt
+    return [
+        {"type": "text", "text": prefix, "cache_control": {"type": "ephemeral"}},
+        {"type": "text", "text": rest}
+    ]
+
+def json_schema_format(schema: dict) -> dict:
+    """OpenAI-style response_format for strict JSON schema output (OpenRouter passes it on)"""
+    return {"type": "json_schema", "json_schema": {"name": "report", "strict": True, "schema": schema}}
+
+async def call_model(model_name: str, prompt: str, api_key: str, priority: str = "interactive",
+                     max_tokens: int = PROSE_MAX_TOKENS,
+                     schema: Optional[dict] = None,
+                     strategy: Optional[str] = None) -> tuple[str, Optional[int], Optional[int]]:
+    """
+    Call specified model with prompt using provided API key.
+    Returns (text, output tokens, cached input tokens); counts are None when the provider does not report them.
+    With a JSON schema the reply is constrained to it (forced tool call for Anthropic,
+    response_format / responseSchema elsewhere) and returned as JSON text.
+    Admission goes through the per-provider/key scheduler: 429 with Retry-After
+    when the lane is saturated, batch calls only run when no interactive one waits.
+    The static template prefix is marked with cache_control for Anthropic; Google,
+    OpenAI and OpenRouter cache repeated prefixes implicitly.
+    Latency, errors and output tokens go to the router (routing.py) under strategy.
+    """
     if model_name not in MODEL_CONFIGS:
         raise HTTPException(400, f"Model {model_name} not supported")
     
     config = MODEL_CONFIGS[model_name]
     provider = config["provider"]
-    
-    async with httpx.AsyncClient(timeout=120.0) as client:
-        if provider == "anthropic":
-            headers = {
-                "x-api-key": api_key,
-                "anthropic-version": "2023-06-01",
-                "content-type": "application/json"
-            }
-            data = {
-                "model": config["model_name"],
-                "max_tokens": 4000,
-                "messages": [{"role": "user", "content": prompt}]
-            }
-            response = await client.post(config["endpoint"], headers=headers, json=data)
-            result = response.json()
-            return result["content"][0]["text"], result["usage"]["output_tokens"]
+
+    lane = scheduler.lane(provider, api_key)
+    input_tokens = estimate_tokens(prompt)
+    try:
+        with span("queue"):
+            reserved = await lane.acquire(input_tokens + min(OUTPUT_RESERVE, max_tokens), priority)
+    except Overloaded as e:
+        raise HTTPException(429, str(e), headers={"Retry-After": str(e.retry_after)})
+    except asyncio.CancelledError:
+        # Request cancelled (client gone or /cancel) while queued: nothing was sent
+        cancellation.metrics.call_aborted("queued", input_tokens, min(OUTPUT_RESERVE, max_tokens))
+        raise
+
+    # A new client per call builds its SSL context each time; "client" shows what that costs
+    with span("client"):
+        client = httpx.AsyncClient(timeout=120.0, event_hooks={"request": [trace_request]})
+    sent = time.monotonic()
+    settled = False
+
+    def settle(actual: Optional[int]):
+        nonlocal settled
+        settled = True
+        lane.settle(reserved, actual)
+
+    try:
+        async with client:
+            if provider == "anthropic":
+                headers = {
+                    "x-api-key": api_key,
+                    "anthropic-version": "2023-06-01",
+                    "content-type": "application/json"
+                }
+                data = {
+                    "model": config["model_name"],
+                    "max_tokens": max_tokens,
+                    "messages": [{"role": "user", "content": anthropic_content(prompt)}]
+                }
+                if schema:
+                    data["tools"] = [{"name": "report", "description": "Report the analysis", "input_schema": schema}]
+                    data["tool_choice"] = {"type": "tool", "name": "report"}
+                response = await client.post(config["endpoint"], headers=headers, json=data)
+                result = check_upstream(response, lane)
+                usage = result["usage"]
+                # Cache reads do not count against the input-token rate limit, cache writes do
+                settle(usage["input_tokens"] + usage.get("cache_creation_input_tokens", 0)
+                       + usage["output_tokens"])
+                if schema:
+                    tool_input = next(b["input"] for b in result["content"] if b["type"] == "tool_use")
+                    text = json.dumps(tool_input, ensure_ascii=False)
+                else:
+                    text = result["content"][0]["text"]
+                reply = text, usage["output_tokens"], usage.get("cache_read_input_tokens")
         
-        elif provider == "google":
-            endpoint = f"https://generativelanguage.googleapis.com/v1beta/models/{model_name}:generateContent?key={api_key}"
-            data = {
-                "contents": [{"parts": [{"text": prompt}]}],
-                "generationConfig": {"maxOutputTokens": 4000}
-            }
-            response = await client.post(endpoint, json=data)
-            result = response.json()
-            return result["candidates"][0]["content"]["parts"][0]["text"], None
+            elif provider == "google":
+                endpoint = f"https://generativelanguage.googleapis.com/v1beta/models/{model_name}:generateContent?key={api_key}"
+                data = {
+                    "contents": [{"parts": [{"text": prompt}]}],
+                    "generationConfig": {"maxOutputTokens": max_tokens}
+                }
+                if schema:
+                    data["generationConfig"]["responseMimeType"] = "application/json"
+                    data["generationConfig"]["responseSchema"] = gemini_schema(schema)
+                response = await client.post(endpoint, json=data)
+                result = check_upstream(response, lane)
+                usage = result.get("usageMetadata", {})
+                settle(usage.get("totalTokenCount"))
+                reply = (result["candidates"][0]["content"]["parts"][0]["text"], None,
+                         usage.get("cachedContentTokenCount", 0) if usage else None)
         
-        elif provider == "openai":
-            headers = {
-                "Authorization": f"Bearer {api_key}",
-                "Content-Type": "application/json"
-            }
-            data = {
-                "model": model_name,
-                "messages": [{"role": "user", "content": prompt}],
-                "max_tokens": 4000
-            }
-            response = await client.post(config["endpoint"], headers=headers, json=data)
-            result = response.json()
-            return result["choices"][0]["message"]["content"], result["usage"]["completion_tokens"]
+            elif provider == "openai":
+                headers = {
+                    "Authorization": f"Bearer {api_key}",
+                    "Content-Type": "application/json"
+                }
+                data = {
+                    "model": model_name,
+                    "messages": [{"role": "user", "content": prompt}],
+                    "max_tokens": max_tokens
+                }
+                if schema:
+                    data["response_format"] = json_schema_format(schema)
+                response = await client.post(config["endpoint"], headers=headers, json=data)
+                result = check_upstream(response, lane)
+                usage = result["usage"]
+                settle(usage["total_tokens"])
+                reply = (result["choices"][0]["message"]["content"], usage["completion_tokens"],
+                         (usage.get("prompt_tokens_details") or {}).get("cached_tokens", 0))
         
-        elif provider == "openrouter":
-            headers = {
-                "Authorization": f"Bearer {api_key}",
-                "Content-Type": "application/json",
-                "HTTP-Referer": "http://localhost:8052",
-                "X-Title": "Greek Rhyme System"
-            }
-            data = {
-                "model": config["model_name"],
-                "messages": [{"role": "user", "content": prompt}],
-                "max_tokens": 4000
-            }
-            response = await client.post(config["endpoint"], headers=headers, json=data)
-            result = response.json()
-            return result["choices"][0]["message"]["content"], result.get("usage", {}).get("completion_tokens")
+            elif provider == "openrouter":
+                headers = {
+                    "Authorization": f"Bearer {api_key}",
+                    "Content-Type": "application/json",
+                    "HTTP-Referer": "http://localhost:8052",
+                    "X-Title": "Greek Rhyme System"
+                }
+                data = {
+                    "model": config["model_name"],
+                    "messages": [{"role": "user", "content": prompt}],
+                    "max_tokens": max_tokens
+                }
+                if schema:
+                    data["response_format"] = json_schema_format(schema)
+                response = await client.post(config["endpoint"], headers=headers, json=data)
+                result = check_upstream(response, lane)
+                usage = result.get("usage") or {}
+                settle(usage.get("total_tokens"))
+                reply = (result["choices"][0]["message"]["content"], usage.get("completion_tokens"),
+                         (usage.get("prompt_tokens_details") or {}).get("cached_tokens") if usage else None)
+    except asyncio.CancelledError:
+        # Closing the client aborts the upstream request; the input was sent, the output is saved
+        if not settled:
+            settle(input_tokens)
+        cancellation.metrics.call_aborted("upstream", input_tokens, reserved - input_tokens,
+                                          time.monotonic() - sent)
+        raise
+    except Exception as e:
+        # Provider 429s, HTTP errors, timeouts and malformed replies count against the model.
+        # Only the input is assumed used, so the output reserve goes back to the lane.
+        if not settled:
+            settle(input_tokens)
+        router.record(model_name, strategy, time.monotonic() - sent, ok=False)
+        if isinstance(e, httpx.TimeoutException):
+            raise HTTPException(504, f"{provider} did not answer in time") from e
+        raise
+    router.record(model_name, strategy, time.monotonic() - sent, ok=True, output_tokens=reply[1])
+    return reply
+
+async def trace_request(request: httpx.Request):
+    """Time the connection and upstream stages of provider calls (profiling.http_trace)"""
+    request.extensions["trace"] = http_trace()
+
+def check_upstream(response: httpx.Response, lane) -> dict:
+    """
+    Pass provider rate limiting on to the client (and hold the lane back), and
+    report other provider errors as 502, instead of failing on the body
+    """
+    if response.status_code == 429:
+        retry_after = response.headers.get("retry-after", "")
+        seconds = int(retry_after) if retry_after.isdigit() else UPSTREAM_BACKOFF
+        lane.backoff(seconds)
+        raise HTTPException(429, f"{lane.provider} rate limit reached", headers={"Retry-After": str(seconds)})
+    if not response.is_success:
+        raise HTTPException(502, f"{lane.provider} returned {response.status_code}: {response.text[:300]}")
+    with span("parse"):
+        return response.json()
+
+def route_auto(request, strategy: str, input_tokens: int):
+    """
+    Model "auto": pick the model for this request (routing.py) among those with a key.
+    Returns the request with model and api_key set, and the routing decision.
+    """
+    if request.deadline_s is not None and request.deadline_s <= 0:
+        raise HTTPException(400, "deadline_s must be > 0")
+    keys = {provider: key for provider, key in request.api_keys.items() if key}
+    provider = provider_of_key(request.api_key)
+    if provider and provider not in keys:
+        keys[provider] = request.api_key
+    models = {name: config["provider"] for name, config in MODEL_CONFIGS.items()}
+    waits = {name: scheduler.lane(p, keys[p]).expected_wait(input_tokens + OUTPUT_RESERVE, request.priority)
+             for name, p in models.items() if p in keys}
+    try:
+        decision = router.choose(strategy, input_tokens, models, keys, request.deadline_s,
+                                 request.min_accuracy, waits)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    chosen = decision["chosen"]
+    return request.model_copy(update={"model": chosen, "api_key": keys[models[chosen]]}), decision
 
 @app.get("/models")
 async def get_models():
-    """Get available models"""
-    return {"models": list(MODEL_CONFIGS.keys())}
+    """Get available models ("auto" routes per request, see routing.py)"""
+    return {"models": list(MODEL_CONFIGS.keys()) + [AUTO]}
 
 @app.post("/identify", response_model=RhymeResponse)
 async def identify_rhymes(request: RhymeIdentificationRequest):
@@ -202,55 +459,393 @@ async def identify_rhymes(request: RhymeIdentificationRequest):
     rag_context = ""
     if request.use_rag:
         from rag_system import get_relevant_examples
-        rag_context = await get_relevant_examples(request.text)
-    
-    prompt = get_identification_prompt(
-        request.text,
-        request.prompt_strategy,
-        rag_context
-    )
+        with span("rag"):
+            rag_context = await get_relevant_examples(request.text)
+
+    strategy = strategy_key(request.prompt_strategy, request.output_format)
+    routing = None
+    if request.model == AUTO:
+        request, routing = route_auto(request, strategy, estimate_tokens(request.text + rag_context))
+
+    if request.chunk_lines < 0:
+        raise HTTPException(400, "chunk_lines must be >= 0")
+    if request.chunk_lines:
+        from chunking import identify_chunked, split_poem
+        from structured import StructuredOutputError
+        chunks = split_poem(request.text, request.chunk_lines)
+        if chunks:
+            try:
+                merged = await identify_chunked(chunks, request.model, request.prompt_strategy, request.api_key,
+                                                request.priority, request.output_format, rag_context)
+            except StructuredOutputError as e:
+                raise HTTPException(502, str(e))
+            prompt = merged["prompt"]
+            return RhymeResponse(
+                result=merged["result"],
+                model_used=request.model,
+                prompt_used=prompt[:500] + "..." if len(prompt) > 500 else prompt,
+                tokens_used=merged["tokens"],
+                cached_tokens=merged["cached"],
+                pairs=merged["pairs"],
+                timings=current_timings.get().as_dict() if request.include_timings else None,
+                chunks=merged["chunks"],
+                routing=routing
+            )
     
-    result, tokens = await call_model(request.model, prompt, request.api_key)
+    if request.output_format == "json":
+        from structured import (MAX_OUTPUT_TOKENS, PAIRS_SCHEMA, StructuredOutputError,
+                                parse_structured, structured_prompt)
+        with span("prompt"):
+            prompt = structured_prompt(request.text, request.prompt_strategy, rag_context)
+        result, tokens, cached = await call_model(request.model, prompt, request.api_key, request.priority,
+                                                  MAX_OUTPUT_TOKENS[request.prompt_strategy], PAIRS_SCHEMA,
+                                                  strategy=strategy)
+        try:
+            pairs = parse_structured(result, len(request.text.strip().splitlines()))
+        except StructuredOutputError as e:
+            raise HTTPException(502, str(e))
+    else:
+        with span("prompt"):
+            prompt = get_identification_prompt(
+                request.text,
+                request.prompt_strategy,
+                rag_context
+            )
+        result, tokens, cached = await call_model(request.model, prompt, request.api_key, request.priority,
+                                                  strategy=strategy)
+        pairs = None
     
     return RhymeResponse(
         result=result,
         model_used=request.model,
         prompt_used=prompt[:500] + "..." if len(prompt) > 500 else prompt,
-        tokens_used=tokens
+        tokens_used=tokens,
+        cached_tokens=cached,
+        pairs=pairs,
+        timings=current_timings.get().as_dict() if request.include_timings else None,
+        routing=routing
+    )
+
+@app.post("/identify/packed", response_model=PackedIdentificationResponse)
+async def identify_rhymes_packed(request: PackedIdentificationRequest):
+    """Identify rhymes in many short poems, several poems per model call (see packing.py)"""
+    from packing import identify_packed
+
+    if not request.texts:
+        raise HTTPException(400, "No texts given")
+    results, stats = await identify_packed(
+        request.texts,
+        request.model,
+        request.prompt_strategy,
+        request.api_key,
+        request.priority
     )
+    return PackedIdentificationResponse(results=results, model_used=request.model, stats=stats)
 
 @app.post("/generate", response_model=RhymeResponse)
 async def generate_rhymes(request: RhymeGenerationRequest):
     """Generate Greek poetry with specified rhyme patterns"""
     from prompts import get_generation_prompt
+    from meter import meter_spec
+
+    if request.meter and not meter_spec(request.meter):
+        raise HTTPException(400, f"Unknown meter {request.meter!r} (expected <foot>-<syllables>, e.g. iambic-15)")
+    style = None
+    if request.poet:
+        from records import POETS
+        from style import describe
+        if request.poet not in POETS:
+            raise HTTPException(404, f"Unknown poet {request.poet}")
+        style = await asyncio.to_thread(describe, request.poet)
     
     # Get RAG examples if requested
     rag_context = ""
     if request.use_rag:
         from rag_system import get_generation_examples
-        rag_context = await get_generation_examples(
+        with span("rag"):
+            rag_context = await get_generation_examples(
+                request.rhyme_type,
+                request.features,
+                request.theme,
+                exclude_copies=request.exclude_copies,
+                meter=request.meter,
+                poet=request.poet
+            )
+    
+    with span("prompt"):
+        prompt = get_generation_prompt(
+            request.theme,
             request.rhyme_type,
             request.features,
-            request.theme
+            request.num_lines,
+            rag_context,
+            request.meter,
+            style
         )
+
+    routing = None
+    if request.model == AUTO and not request.models:
+        request, routing = route_auto(request, GENERATE, estimate_tokens(prompt))
     
-    prompt = get_generation_prompt(
-        request.theme,
-        request.rhyme_type,
-        request.features,
-        request.num_lines,
-        rag_context
-    )
-    
-    result, tokens = await call_model(request.model, prompt, request.api_key)
+    if request.best_of != 1:
+        return await generate_best(request, prompt, routing)
+
+    result, tokens, cached = await call_model(request.model, prompt, request.api_key, request.priority,
+                                              strategy=GENERATE)
+    verification = None
+    if request.meter:
+        from best_of_n import verify
+        verification = verify(result, request.rhyme_type, request.features, request.num_lines, request.meter)
     
     return RhymeResponse(
         result=result,
         model_used=request.model,
         prompt_used=prompt[:500] + "..." if len(prompt) > 500 else prompt,
-        tokens_used=tokens
+        tokens_used=tokens,
+        cached_tokens=cached,
+        timings=current_timings.get().as_dict() if request.include_timings else None,
+        verification=verification,
+        routing=routing
+    )
+
+async def generate_best(request: RhymeGenerationRequest, prompt: str, routing: Optional[dict] = None) -> RhymeResponse:
+    from best_of_n import draft_plan, generate_best_of
+
+    try:
+        plan = draft_plan(request.models or [request.model], request.best_of)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    for model in set(plan):
+        if model not in MODEL_CONFIGS:
+            raise HTTPException(400, f"Model {model} not supported")
+    drafts = [(model, request.api_keys.get(MODEL_CONFIGS[model]["provider"]) or request.api_key) for model in plan]
+    best, summary = await generate_best_of(prompt, drafts, request.rhyme_type, request.features,
+                                           request.num_lines, request.priority, request.meter)
+    return RhymeResponse(
+        result=best["result"],
+        model_used=best["model"],
+        prompt_used=prompt[:500] + "..." if len(prompt) > 500 else prompt,
+        tokens_used=best["tokens"],
+        cached_tokens=best["cached_tokens"],
+        timings=current_timings.get().as_dict() if request.include_timings else None,
+        verification=best["verification"],
+        drafts=summary,
+        routing=routing
     )
 
+@app.get("/scheduler/stats")
+async def scheduler_stats():
+    """Per provider/key lane: limits, available capacity, queue depth and wait times"""
+    return {"lanes": scheduler.stats(), "cancellations": cancellation.metrics.snapshot()}
+
+@app.get("/routing/stats")
+async def routing_stats():
+    """Moving-average latency, error rate and output tokens per model and strategy (model "auto")"""
+    return router.snapshot()
+
+@app.post("/cancel/{request_id}")
+async def cancel_request(request_id: str):
+    """Cancel an in-flight request by its X-Request-ID; its upstream calls are aborted"""
+    if not cancellation.registry.cancel(request_id, "explicit"):
+        raise HTTPException(404, f"No request {request_id} in flight")
+    return {"request_id": request_id, "cancelled": True}
+
+# Admin endpoints need X-Admin-Token = ADMIN_TOKEN; without ADMIN_TOKEN only local clients may call them
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+def check_admin(request: Request, token: Optional[str]):
+    if ADMIN_TOKEN:
+        if token != ADMIN_TOKEN:
+            raise HTTPException(403, "Invalid admin token")
+    elif not request.client or request.client.host not in ("127.0.0.1", "::1"):
+        raise HTTPException(403, "Admin endpoints are local-only unless ADMIN_TOKEN is set")
+
+@app.post("/admin/profile")
+async def start_profiling(request: ProfileRequest, http_request: Request,
+                          x_admin_token: Optional[str] = Header(None)):
+    """Profile the next N requests under a path, or a corpus build job (see profiling.py)"""
+    check_admin(http_request, x_admin_token)
+    try:
+        if request.build is not None:
+            store = get_job_store()
+            job_id = store.submit("build_corpus", {**request.build, "profile": request.mode})
+            return {"job": store.get(job_id)}
+        profile_session.arm(request.mode, request.requests, request.path)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    return profile_session.status()
+
+@app.get("/admin/profile")
+async def profiling_status(http_request: Request, x_admin_token: Optional[str] = Header(None)):
+    check_admin(http_request, x_admin_token)
+    return profile_session.status()
+
+@app.get("/admin/profiles/{name}")
+async def get_profile(name: str, http_request: Request, x_admin_token: Optional[str] = Header(None)):
+    """Download a written profile (.prof for cProfile, .folded collapsed stacks for sampling)"""
+    check_admin(http_request, x_admin_token)
+    path = PROFILE_DIR / name
+    if name not in profile_session.written or not path.exists():
+        raise HTTPException(404, f"No profile {name}")
+    return FileResponse(path, filename=name)
+
+@app.websocket("/ws/live")
+async def live_analysis(websocket: WebSocket):
+    """
+    Local rhyme analysis of the editor text, updated per line edit (see live.py).
+    Client messages: {"type": "reset", "text", "variant"} or {"type": "edit", "edits": [...]},
+    each with an optional "version" that is echoed back with the annotation diff.
+    """
+    from live import LiveSession
+
+    await websocket.accept()
+    session = LiveSession()
+    try:
+        while True:
+            raw = await websocket.receive_text()
+            start = time.perf_counter()
+            message = {}
+            try:
+                message = json.loads(raw)
+                if not isinstance(message, dict):
+                    message = {}
+                    raise ValueError("Messages must be JSON objects")
+                if message.get("type") == "reset":
+                    session = LiveSession(variant=message.get("variant"))
+                    diff = session.reset(message.get("text", ""))
+                elif message.get("type") == "edit":
+                    diff = session.apply(message.get("edits", []))
+                else:
+                    raise ValueError(f"Unknown message type {message.get('type')!r}")
+            except (ValueError, KeyError, TypeError) as e:
+                # A failed edit may have been partly applied; the client resends the full text
+                await websocket.send_json({"type": "error", "version": message.get("version"),
+                                           "detail": str(e), "resync": True})
+                continue
+            await websocket.send_json({
+                "type": "diff",
+                "version": message.get("version"),
+                **diff,
+                "elapsed_ms": round((time.perf_counter() - start) * 1000, 2)
+            })
+    except WebSocketDisconnect:
+        pass
+
+# Background jobs (corpus builds, batch analyses) run in a local process pool.
+# jobs/jobs.db is opened on first use, not when app.py is imported.
+@lru_cache(maxsize=None)
+def get_job_store() -> JobStore:
+    return JobStore()
+
+job_runner: Optional[JobRunner] = None
+
+@app.on_event("startup")
+async def start_job_runner():
+    global job_runner
+    job_runner = JobRunner(get_job_store())
+    app.state.job_task = asyncio.create_task(job_runner.run())
+
+@app.on_event("shutdown")
+async def stop_job_runner():
+    app.state.job_task.cancel()
+    job_runner.shutdown()
+
+@app.post("/jobs")
+async def submit_job(request: JobRequest, http_request: Request, x_admin_token: Optional[str] = Header(None)):
+    """Queue a corpus build or batch analysis (admin only: builds write the json/ corpus files)"""
+    check_admin(http_request, x_admin_token)
+    store = get_job_store()
+    try:
+        job_id = store.submit(request.kind, request.params)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    return store.get(job_id)
+
+@app.get("/jobs")
+async def list_jobs(status: Optional[str] = None, limit: int = 50):
+    """Recent jobs, newest first"""
+    try:
+        return {"jobs": get_job_store().list(status, limit)}
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: int):
+    """Status and progress (lines processed, pairs found, ETA)"""
+    job = get_job_store().get(job_id)
+    if job is None:
+        raise HTTPException(404, f"Job {job_id} not found")
+    return job
+
+@app.post("/jobs/{job_id}/cancel")
+async def cancel_job(job_id: int, http_request: Request, x_admin_token: Optional[str] = Header(None)):
+    check_admin(http_request, x_admin_token)
+    store = get_job_store()
+    if store.cancel(job_id) is None:
+        raise HTTPException(404, f"Job {job_id} not found")
+    return store.get(job_id)
+
+@app.get("/jobs/{job_id}/artifacts/{name}")
+async def get_job_artifact(job_id: int, name: str):
+    """Download a file produced by a finished job"""
+    path = get_job_store().artifact(job_id, name)
+    if path is None:
+        raise HTTPException(404, f"Job {job_id} has no artifact {name}")
+    return FileResponse(path, filename=name)
+
+# Corpus search index (index/search.db), refreshed from the corpus files at most every few seconds.
+# Opened on first use, not when app.py is imported.
+@lru_cache(maxsize=None)
+def get_search_index() -> SearchIndex:
+    return SearchIndex()
+
+@app.get("/search")
+async def search_corpora(q: str = "", poet: Optional[str] = None,
+                         variant: Optional[Literal["regular", "topintzi"]] = None,
+                         classification: Optional[str] = None, tag: List[str] = Query([]),
+                         page: int = 1, page_size: int = 20):
+    """
+    Accent- and case-insensitive search over every poet's rhyme pairs (see search.py).
+    Words match as prefixes; repeated tag= parameters must all match. Returns one
+    page of pairs and facet counts (poet, variant, classification, tag) for the whole match.
+    """
+    try:
+        index = await asyncio.to_thread(get_search_index)
+        await asyncio.to_thread(index.refresh_if_due)
+        return await asyncio.to_thread(index.search, q, poet, variant, classification, tag,
+                                       page, page_size)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+@app.get("/meter")
+async def meter_lines(poet: Optional[str] = None, meter: Optional[str] = None, syllables: Optional[int] = None,
+                      ending: Optional[Literal["M", "F2", "F3"]] = None, page: int = 1, page_size: int = 50):
+    """
+    Verse lines by meter label ("iambic-15"), syllable count and ending, from the per-line
+    meter indexes (meter.py), with counts per meter, syllable count and ending over the match
+    """
+    from meter import query
+    from records import POETS
+
+    if poet and poet not in POETS:
+        raise HTTPException(404, f"Unknown poet {poet}")
+    try:
+        return await asyncio.to_thread(query, [poet] if poet else POETS, meter, syllables, ending, page, page_size)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+@app.post("/attribute")
+async def attribute_poem(request: AttributionRequest):
+    """Nearest corpus poets to a poem by style fingerprint, from the local analyzer (see style.py)"""
+    from style import attribute
+
+    if not request.text.strip():
+        raise HTTPException(400, "No text given")
+    try:
+        return await asyncio.to_thread(attribute, request.text, request.variant, request.top)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
 @app.get("/")
 async def root():
     return {"message": "Greek Rhyme System API", "docs": "/docs"}
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Local stand-in for the provider batch APIs used by provider_batch.py
+Implements the Anthropic Message Batches and OpenAI Files/Batches endpoints
+in memory. Batches end BATCH_DELAY seconds after submission and every
+request is answered with a short canned reply that names its custom_id.
+Anthropic custom_ids are checked like the real API (^[a-zA-Z0-9_-]{1,64}$, unique).
+Results come back in reverse order, so callers must match on custom_id.
+No API key is checked.
+
+    python batch_standin.py 8070
+    ANTHROPIC_BASE_URL=http://localhost:8070 OPENAI_BASE_URL=http://localhost:8070 ...
+"""
+
+import email.parser
+import json
+import re
+import time
+import uuid
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import PlainTextResponse
+
+BATCH_DELAY = 2.0
+# Anthropic rejects a batch whose custom_ids do not all match this, or repeat
+ANTHROPIC_CUSTOM_ID = re.compile(r"[a-zA-Z0-9_-]{1,64}")
+
+app = FastAPI(title="Provider batch stand-in")
+
+batches = {}
+files = {}
+
+
+def canned_reply(custom_id: str, prompt: str) -> dict:
+    text = f"Stand-in reply for {custom_id}: no rhymes analysed."
+    return {"text": text, "input_tokens": max(1, len(prompt) // 3), "output_tokens": max(1, len(text) // 3)}
+
+
+def prompt_of(messages: list) -> str:
+    """Message text; content is a string or a list of text blocks"""
+    return "".join(m["content"] if isinstance(m["content"], str) else "".join(b.get("text", "") for b in m["content"])
+                   for m in messages)
+
+
+def ended(batch: dict) -> bool:
+    return batch["cancelled"] or time.time() - batch["created"] >= BATCH_DELAY
+
+
+# === ANTHROPIC MESSAGE BATCHES ===
+
+def anthropic_view(batch: dict, request: Request) -> dict:
+    done = ended(batch)
+    n = len(batch["requests"])
+    return {
+        "id": batch["id"],
+        "type": "message_batch",
+        "processing_status": "ended" if done else "in_progress",
+        "request_counts": {
+            "processing": 0 if done else n,
+            "succeeded": n if done and not batch["cancelled"] else 0,
+            "errored": 0, "canceled": n if batch["cancelled"] else 0, "expired": 0,
+        },
+        "results_url": str(request.url_for("anthropic_results", batch_id=batch["id"])) if done else None,
+    }
+
+
+@app.post("/v1/messages/batches")
+async def anthropic_create(request: Request):
+    body = await request.json()
+    ids = [r["custom_id"] for r in body["requests"]]
+    bad = next((i for i in ids if not ANTHROPIC_CUSTOM_ID.fullmatch(i)), None)
+    if bad is not None:
+        raise HTTPException(400, f"custom_id {bad!r} must match ^[a-zA-Z0-9_-]{{1,64}}$")
+    if len(set(ids)) != len(ids):
+        raise HTTPException(400, "custom_id values must be unique within a batch")
+    batch = {"id": f"msgbatch_{uuid.uuid4().hex[:16]}", "created": time.time(), "cancelled": False,
+             "requests": body["requests"]}
+    batches[batch["id"]] = batch
+    return anthropic_view(batch, request)
+
+
+@app.get("/v1/messages/batches/{batch_id}")
+async def anthropic_get(batch_id: str, request: Request):
+    if batch_id not in batches:
+        raise HTTPException(404, "batch not found")
+    return anthropic_view(batches[batch_id], request)
+
+
+@app.post("/v1/messages/batches/{batch_id}/cancel")
+async def anthropic_cancel(batch_id: str, request: Request):
+    batches[batch_id]["cancelled"] = True
+    return anthropic_view(batches[batch_id], request)
+
+
+@app.get("/v1/messages/batches/{batch_id}/results", name="anthropic_results")
+async def anthropic_results(batch_id: str):
+    batch = batches[batch_id]
+    lines = []
+    for r in reversed(batch["requests"]):
+        if batch["cancelled"]:
+            lines.append({"custom_id": r["custom_id"], "result": {"type": "canceled"}})
+            continue
+        reply = canned_reply(r["custom_id"], prompt_of(r["params"]["messages"]))
+        lines.append({"custom_id": r["custom_id"], "result": {"type": "succeeded", "message": {
+            "content": [{"type": "text", "text": reply["text"]}],
+            "usage": {"input_tokens": reply["input_tokens"], "output_tokens": reply["output_tokens"]},
+        }}})
+    return PlainTextResponse("\n".join(json.dumps(rec, ensure_ascii=False) for rec in lines))
+
+
+# === OPENAI FILES + BATCHES ===
+
+@app.post("/v1/files")
+async def openai_upload(request: Request):
+    # Multipart parsed with the stdlib so the stand-in needs nothing beyond FastAPI
+    raw = b"Content-Type: " + request.headers["content-type"].encode() + b"\r\n\r\n" + await request.body()
+    parts = {p.get_param("name", header="content-disposition"): p.get_payload(decode=True)
+             for p in email.parser.BytesParser().parsebytes(raw).get_payload()}
+    file_id = f"file-{uuid.uuid4().hex[:16]}"
+    files[file_id] = parts["file"].decode("utf-8")
+    return {"id": file_id, "object": "file", "purpose": parts.get("purpose", b"").decode()}
+
+
+def openai_view(batch: dict) -> dict:
+    done = ended(batch)
+    n = len(batch["requests"])
+    status = "cancelled" if batch["cancelled"] else "completed" if done else "in_progress"
+    return {
+        "id": batch["id"],
+        "object": "batch",
+        "status": status,
+        "output_file_id": batch["output_file_id"] if status == "completed" else None,
+        "error_file_id": None,
+        "request_counts": {"total": n, "completed": n if status == "completed" else 0, "failed": 0},
+    }
+
+
+@app.post("/v1/batches")
+async def openai_create(request: Request):
+    body = await request.json()
+    requests = [json.loads(line) for line in files[body["input_file_id"]].splitlines() if line.strip()]
+    batch = {"id": f"batch_{uuid.uuid4().hex[:16]}", "created": time.time(), "cancelled": False,
+             "requests": requests, "output_file_id": f"file-{uuid.uuid4().hex[:16]}"}
+    batches[batch["id"]] = batch
+
+    lines = []
+    for r in reversed(requests):
+        reply = canned_reply(r["custom_id"], prompt_of(r["body"]["messages"]))
+        lines.append({"custom_id": r["custom_id"], "response": {"status_code": 200, "body": {
+            "choices": [{"message": {"role": "assistant", "content": reply["text"]}}],
+            "usage": {"prompt_tokens": reply["input_tokens"], "completion_tokens": reply["output_tokens"]},
+        }}, "error": None})
+    files[batch["output_file_id"]] = "\n".join(json.dumps(rec, ensure_ascii=False) for rec in lines)
+    return openai_view(batch)
+
+
+@app.get("/v1/batches/{batch_id}")
+async def openai_get(batch_id: str):
+    if batch_id not in batches:
+        raise HTTPException(404, "batch not found")
+    return openai_view(batches[batch_id])
+
+
+@app.post("/v1/batches/{batch_id}/cancel")
+async def openai_cancel(batch_id: str):
+    batches[batch_id]["cancelled"] = True
+    return openai_view(batches[batch_id])
+
+
+@app.get("/v1/files/{file_id}/content")
+async def openai_file_content(file_id: str):
+    if file_id not in files:
+        raise HTTPException(404, "file not found")
+    return PlainTextResponse(files[file_id])
+
+
+if __name__ == "__main__":
+    import sys
+    import uvicorn
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8070
+    uvicorn.run(app, host="127.0.0.1", port=port)
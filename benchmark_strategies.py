@@ -0,0 +1,409 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Strategy cost/accuracy benchmark for rhyme identification
+Samples gold pairs from the enhanced corpora, runs them across prompt
+strategies and models, and reports per-feature precision/recall against
+latency, tokens and cost.
+
+Every live response is recorded, so a run can be replayed offline:
+
+    python benchmark_strategies.py --models gemini-2.5-flash gpt-4o --samples 50
+    python benchmark_strategies.py --replay --min-f1 0.7
+    python benchmark_strategies.py --structured     # also JSON mode (structured.py), compared per strategy
+"""
+
+import argparse
+import asyncio
+import glob
+import hashlib
+import json
+import os
+import random
+import re
+import statistics
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from corpus_format import load_enhanced_corpus
+from prompts import get_identification_prompt
+from scheduler import estimate_tokens
+
+STRATEGIES = ["zero_shot_structured", "zero_shot_algorithm", "few_shot", "zero_shot_cot", "few_shot_cot"]
+# Suffix of a strategy run in JSON output mode, e.g. "few_shot+json"
+JSON_SUFFIX = "+json"
+
+# Features scored per gold pair (taxonomy tags the prompts ask the model for)
+FEATURES = ["M", "F2", "F3", "RICH", "IDV", "MOS", "IMP", "PURE"]
+
+# USD per 1M tokens (input, output); update when provider pricing changes
+MODEL_PRICES = {
+    "claude-sonnet-4.5": (3.00, 15.00),
+    "claude-sonnet-3.7": (3.00, 15.00),
+    "gemini-3-pro": (2.00, 12.00),
+    "gemini-2.5-pro": (1.25, 10.00),
+    "gemini-2.5-flash": (0.30, 2.50),
+    "gemini-2.5-flash-lite": (0.10, 0.40),
+    "gemini-2.0-flash": (0.10, 0.40),
+    "gpt-4o": (2.50, 10.00),
+    "llama-3.3-70b": (0.13, 0.40),
+    "llama-3.1-70b": (0.40, 0.40),
+    "qwen-2.5-72b": (0.35, 0.40),
+    "mistral-large": (2.00, 6.00),
+}
+
+PROVIDER_KEY_ENV = {
+    "anthropic": "ANTHROPIC_API_KEY",
+    "google": "GOOGLE_API_KEY",
+    "openai": "OPENAI_API_KEY",
+    "openrouter": "OPENROUTER_API_KEY",
+}
+
+DEFAULT_RECORDINGS = "benchmarks/strategy_responses.jsonl"
+DEFAULT_REPORT = "benchmarks/strategy_report.json"
+
+
+# === GOLD DATA ===
+
+def gold_features(classification: str, features: List[str]) -> set:
+    """Map corpus annotations onto the taxonomy tags scored by the benchmark"""
+    tags = set()
+    parts = classification.split("-") + list(features)
+    for p in parts:
+        if p in ("M", "F2", "F3", "RICH", "IDV", "PURE"):
+            tags.add(p)
+        elif p in ("MOS", "MOSAIC"):
+            tags.add("MOS")
+        elif p == "IMPERFECT" or p.startswith("IMP"):
+            tags.add("IMP")
+    return tags
+
+
+def load_gold_samples(pattern: str = "json/corpus_*_enhanced.json", n: int = 100,
+                      seed: int = 13) -> List[Dict]:
+    """
+    Sample gold pairs from the enhanced corpora.
+    Each sample is the pair's context snippet with 1-based gold line numbers.
+    """
+    pool = []
+    for path in sorted(glob.glob(pattern)):
+        data = load_enhanced_corpus(path)
+        poet = data.get("poet", Path(path).stem)
+        for idx, entry in enumerate(data.get("entries", [])):
+            if "UNKNOWN" in entry["classification"]:
+                continue
+            pool.append({
+                "id": f"{poet}:{idx}",
+                "poet": poet,
+                "text": "\n".join(entry["context"]),
+                "gold_pair": sorted(p + 1 for p in entry["rhyme_positions"]),
+                "classification": entry["classification"],
+                "gold_features": sorted(gold_features(entry["classification"], entry["features"])),
+            })
+
+    rng = random.Random(seed)
+    return rng.sample(pool, min(n, len(pool)))
+
+
+# === OUTPUT PARSING ===
+
+PAIR_RE = re.compile(
+    r"(?:Lines?|L|Στίχοι|Στίχος)\s*(\d+)\s*(?:[-–—,&/]|and|και|vs\.?|→)\s*(?:Lines?|L)?\s*(\d+)",
+    re.IGNORECASE
+)
+CODE_RE = re.compile(r"\b(M|F2|F3)((?:-[A-Z0-9]+(?:-2W)?)*)\b")
+
+
+def parse_identification(output: str) -> List[Dict]:
+    """
+    Extract (line pair, feature tags) records from free-form model output.
+    The classification code nearest after each line-pair mention is attributed to it.
+    """
+    matches = list(PAIR_RE.finditer(output))
+    pairs = []
+    for k, m in enumerate(matches):
+        end = matches[k + 1].start() if k + 1 < len(matches) else len(output)
+        window = output[m.end():end]
+        a, b = int(m.group(1)), int(m.group(2))
+        if a == b:
+            continue
+        tags = set()
+        code = CODE_RE.search(window)
+        if code:
+            tags = gold_features(code.group(0), [])
+            if not tags & {"RICH", "IDV", "MOS", "IMP"}:
+                tags.add("PURE")
+        pairs.append({"pair": sorted((a, b)), "features": sorted(tags)})
+    return pairs
+
+
+def parse_response(rec: Dict, sample: Dict) -> List[Dict]:
+    """Pair records of a prose or JSON-mode response; invalid JSON counts as no pairs"""
+    if not rec["strategy"].endswith(JSON_SUFFIX):
+        return parse_identification(rec["response"])
+    from structured import StructuredOutputError, parse_structured
+    try:
+        structured = parse_structured(rec["response"], len(sample["text"].splitlines()))
+    except StructuredOutputError:
+        return []
+    pairs = []
+    for p in structured:
+        # Same tag mapping as the prose codes
+        tags = gold_features(p.classification, [])
+        if not tags & {"RICH", "IDV", "MOS", "IMP"}:
+            tags.add("PURE")
+        pairs.append({"pair": p.lines, "features": sorted(tags)})
+    return pairs
+
+
+# === RECORDINGS ===
+
+class ResponseStore:
+    """Append-only JSONL store of model responses keyed by (model, strategy, prompt)"""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.records = {}
+        if self.path.exists():
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        rec = json.loads(line)
+                        self.records[rec["key"]] = rec
+
+    @staticmethod
+    def key(model: str, strategy: str, prompt: str) -> str:
+        return hashlib.sha256(f"{model}\x00{strategy}\x00{prompt}".encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict]:
+        return self.records.get(key)
+
+    def put(self, rec: Dict):
+        self.records[rec["key"]] = rec
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+
+
+def api_key_for(model: str) -> str:
+    from app import MODEL_CONFIGS
+    config = MODEL_CONFIGS[model]
+    return config.get("key") or os.getenv(PROVIDER_KEY_ENV[config["provider"]], "")
+
+
+# === RUNNER ===
+
+async def run_one(sample: Dict, model: str, strategy: str, store: ResponseStore,
+                  mode: str, sem: asyncio.Semaphore) -> Optional[Dict]:
+    """Run one (sample, model, strategy) cell, from the recordings when possible"""
+    if strategy.endswith(JSON_SUFFIX):
+        from structured import MAX_OUTPUT_TOKENS, PAIRS_SCHEMA, structured_prompt
+        base = strategy[:-len(JSON_SUFFIX)]
+        prompt = structured_prompt(sample["text"], base)
+        options = {"max_tokens": MAX_OUTPUT_TOKENS[base], "schema": PAIRS_SCHEMA}
+    else:
+        prompt = get_identification_prompt(sample["text"], strategy)
+        options = {}
+    key = ResponseStore.key(model, strategy, prompt)
+
+    rec = store.get(key) if mode != "live" else None
+    if rec is None:
+        if mode == "replay":
+            return None
+        from app import call_model
+        async with sem:
+            start = time.perf_counter()
+            try:
+                output, out_tokens, cached = await call_model(model, prompt, api_key_for(model), priority="batch", **options)
+            except Exception as e:
+                print(f"  ⚠ {model}/{strategy}/{sample['id']}: {e}")
+                return {"error": str(e), "model": model, "strategy": strategy}
+            latency = time.perf_counter() - start
+        rec = {
+            "key": key,
+            "model": model,
+            "strategy": strategy,
+            "sample_id": sample["id"],
+            "response": output,
+            "input_tokens": estimate_tokens(prompt),
+            "output_tokens": out_tokens if out_tokens is not None else estimate_tokens(output),
+            "cached_tokens": cached,
+            "latency_s": round(latency, 3),
+        }
+        store.put(rec)
+
+    return rec
+
+
+def score(samples: List[Dict], results: Dict) -> Dict:
+    """Aggregate per (model, strategy) accuracy, latency, tokens and cost"""
+    by_sample = {s["id"]: s for s in samples}
+    report = {}
+
+    for (model, strategy), recs in results.items():
+        counts = {f: {"tp": 0, "fp": 0, "fn": 0} for f in FEATURES}
+        pair_hits = 0
+        latencies, out_tokens, costs = [], [], []
+
+        for rec in recs:
+            sample = by_sample[rec["sample_id"]]
+            gold = set(sample["gold_features"])
+            predicted = parse_response(rec, sample)
+            match = next((p for p in predicted if p["pair"] == sample["gold_pair"]), None)
+            pred = set(match["features"]) if match else set()
+            if match:
+                pair_hits += 1
+            for f in FEATURES:
+                if f in pred and f in gold:
+                    counts[f]["tp"] += 1
+                elif f in pred:
+                    counts[f]["fp"] += 1
+                elif f in gold:
+                    counts[f]["fn"] += 1
+
+            latencies.append(rec["latency_s"])
+            out_tokens.append(rec["output_tokens"])
+            price_in, price_out = MODEL_PRICES.get(model, (0.0, 0.0))
+            costs.append((rec["input_tokens"] * price_in + rec["output_tokens"] * price_out) / 1e6)
+
+        per_feature = {}
+        f1s = []
+        for f, c in counts.items():
+            p = c["tp"] / (c["tp"] + c["fp"]) if c["tp"] + c["fp"] else 0.0
+            r = c["tp"] / (c["tp"] + c["fn"]) if c["tp"] + c["fn"] else 0.0
+            f1 = 2 * p * r / (p + r) if p + r else 0.0
+            per_feature[f] = {"precision": round(p, 3), "recall": round(r, 3), "f1": round(f1, 3),
+                              "support": c["tp"] + c["fn"]}
+            if c["tp"] + c["fn"]:
+                f1s.append(f1)
+
+        n = len(recs)
+        report[f"{model}/{strategy}"] = {
+            "model": model,
+            "strategy": strategy,
+            "samples": n,
+            "pair_recall": round(pair_hits / n, 3) if n else 0.0,
+            "macro_f1": round(sum(f1s) / len(f1s), 3) if f1s else 0.0,
+            "features": per_feature,
+            "latency_p50_s": round(statistics.median(latencies), 3) if latencies else None,
+            "latency_p95_s": round(sorted(latencies)[int(0.95 * (n - 1))], 3) if latencies else None,
+            "output_tokens_mean": round(sum(out_tokens) / n, 1) if n else None,
+            "cost_per_poem_usd": round(sum(costs) / n, 6) if n else None,
+        }
+
+    return report
+
+
+def compare_structured(report: Dict) -> Dict:
+    """Output-token and p50 latency reduction of each JSON-mode cell against its prose strategy"""
+    comparison = {}
+    for name, r in report.items():
+        prose = report.get(name[:-len(JSON_SUFFIX)]) if name.endswith(JSON_SUFFIX) else None
+        if not prose or not r["samples"] or not prose["samples"]:
+            continue
+        comparison[name] = {
+            "output_tokens": [prose["output_tokens_mean"], r["output_tokens_mean"]],
+            "output_tokens_reduction": round(1 - r["output_tokens_mean"] / prose["output_tokens_mean"], 3),
+            "latency_p50_s": [prose["latency_p50_s"], r["latency_p50_s"]],
+            "latency_p50_reduction": round(1 - r["latency_p50_s"] / prose["latency_p50_s"], 3),
+            "macro_f1": [prose["macro_f1"], r["macro_f1"]],
+        }
+    return comparison
+
+
+def cheapest_meeting_bar(report: Dict, min_f1: float, min_pair_recall: float = 0.0) -> Optional[Dict]:
+    """Cheapest (model, strategy) whose macro-F1 and pair recall meet the bar"""
+    eligible = [r for r in report.values()
+                if r["samples"] and r["macro_f1"] >= min_f1 and r["pair_recall"] >= min_pair_recall]
+    return min(eligible, key=lambda r: (r["cost_per_poem_usd"], r["latency_p50_s"]), default=None)
+
+
+async def run_benchmark(samples: List[Dict], models: List[str], strategies: List[str],
+                        store: ResponseStore, mode: str = "cached", concurrency: int = 4) -> Dict:
+    sem = asyncio.Semaphore(concurrency)
+    cells = [(s, m, st) for m in models for st in strategies for s in samples]
+    outputs = await asyncio.gather(*(run_one(s, m, st, store, mode, sem) for s, m, st in cells))
+
+    results = defaultdict(list)
+    missing = errors = 0
+    for (s, m, st), rec in zip(cells, outputs):
+        if rec is None:
+            missing += 1
+        elif "error" in rec:
+            errors += 1
+        else:
+            results[(m, st)].append(rec)
+
+    if missing:
+        print(f"  ⚠ {missing} cells have no recorded response (replay mode)")
+    if errors:
+        print(f"  ⚠ {errors} cells failed")
+    return score(samples, results)
+
+
+def print_report(report: Dict):
+    print(f"\n{'model/strategy':45} {'n':>4} {'pairR':>6} {'F1':>6} {'p50 s':>7} {'out tok':>8} {'$/poem':>9}")
+    for name, r in sorted(report.items(), key=lambda kv: kv[1]["cost_per_poem_usd"] or 0):
+        print(f"{name:45} {r['samples']:>4} {r['pair_recall']:>6.2f} {r['macro_f1']:>6.2f} "
+              f"{r['latency_p50_s'] or 0:>7.2f} {r['output_tokens_mean'] or 0:>8.0f} "
+              f"{r['cost_per_poem_usd'] or 0:>9.5f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark identification strategies for cost and accuracy")
+    parser.add_argument("--models", nargs="+", default=["gemini-2.5-flash"])
+    parser.add_argument("--strategies", nargs="+", default=STRATEGIES, choices=STRATEGIES)
+    parser.add_argument("--samples", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=13)
+    parser.add_argument("--corpora", default="json/corpus_*_enhanced.json")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--recordings", default=DEFAULT_RECORDINGS)
+    parser.add_argument("--report", default=DEFAULT_REPORT)
+    parser.add_argument("--structured", action="store_true",
+                        help="Also run each strategy in JSON output mode and compare tokens/latency")
+    parser.add_argument("--min-f1", type=float, default=None,
+                        help="Recommend the cheapest model/strategy meeting this macro-F1")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--replay", action="store_true", help="Use recorded responses only (offline)")
+    group.add_argument("--live", action="store_true", help="Ignore recordings and call every model")
+    args = parser.parse_args()
+
+    mode = "replay" if args.replay else "live" if args.live else "cached"
+    samples = load_gold_samples(args.corpora, args.samples, args.seed)
+    print(f"Loaded {len(samples)} gold pairs; mode={mode}")
+
+    store = ResponseStore(args.recordings)
+    if mode == "replay" and not store.records:
+        raise SystemExit(f"No recorded responses in {args.recordings}: none are shipped with the repository, "
+                         "so run once without --replay (API keys needed) to record them")
+    strategies = args.strategies + [s + JSON_SUFFIX for s in args.strategies] if args.structured else args.strategies
+    report = asyncio.run(run_benchmark(samples, args.models, strategies, store, mode, args.concurrency))
+    print_report(report)
+
+    output = {"mode": mode, "samples": len(samples), "seed": args.seed, "results": report}
+    if args.structured:
+        output["structured_vs_prose"] = compare_structured(report)
+        print(f"\n{'JSON mode vs prose':45} {'out tok':>15} {'saved':>6} {'p50 s':>13} {'saved':>6}")
+        for name, c in output["structured_vs_prose"].items():
+            print(f"{name:45} {c['output_tokens'][0]:>7.0f}→{c['output_tokens'][1]:<7.0f} "
+                  f"{c['output_tokens_reduction']:>6.0%} {c['latency_p50_s'][0]:>6.2f}→{c['latency_p50_s'][1]:<6.2f} "
+                  f"{c['latency_p50_reduction']:>6.0%}")
+    if args.min_f1 is not None:
+        best = cheapest_meeting_bar(report, args.min_f1)
+        output["recommendation"] = best and {"model": best["model"], "strategy": best["strategy"]}
+        if best:
+            print(f"\n✓ Cheapest meeting F1 ≥ {args.min_f1}: {best['model']} / {best['strategy']} "
+                  f"(${best['cost_per_poem_usd']:.5f}/poem, p50 {best['latency_p50_s']}s)")
+        else:
+            print(f"\n⚠ No model/strategy meets F1 ≥ {args.min_f1}")
+
+    Path(args.report).parent.mkdir(parents=True, exist_ok=True)
+    with open(args.report, 'w', encoding='utf-8') as f:
+        json.dump(output, f, ensure_ascii=False, indent=2)
+    print(f"Saved report to {args.report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Best-of-N generation with local rhyme verification
+Hard patterns (F3 + RICH + MOS, ...) often come back from one sample with
+lines that do not rhyme as asked. Here N drafts of the same generation
+prompt run concurrently, on one model or spread over several, and every
+draft is checked locally as soon as it arrives: its verse lines go
+through the corpus rhyme detector, every line against every other
+(rhyme_detection.find_rhymes_windowed over the whole draft), and each
+line scores by whether it is in a pair with the requested stress and
+features (and, if asked, whether it scans in the requested meter,
+meter.py). The first fully compliant draft wins and the other
+calls are cancelled; otherwise the best-scoring draft is returned once
+all are in. Wall-clock time is that of the first compliant draft rather
+than of a series of retries, at the price of the parallel calls.
+
+    best, drafts = await generate_best_of(prompt, [("gemini-2.5-flash", key)] * 4, "F3", ["RICH"], 4)
+    best["verification"]   # {"score": 1.0, "compliant": True, "pairs": [...]}
+"""
+
+import asyncio
+import re
+import time
+from typing import Dict, List, Optional, Tuple
+
+from meter import fits_meter, scan_line
+from rhyme_detection import MIN_LINE_LENGTH, find_rhymes_windowed
+
+MAX_DRAFTS = 8
+# A line whose rhyme has the right stress but misses a requested feature
+PARTIAL_CREDIT = 0.5
+
+# Requested feature -> tag the detector produces; COPY cannot be checked on a new poem
+FEATURE_TAGS = {"IMP-0F": "IMP-0F-TOPINTZI", "IMP-0M": "IMP-0", "IDV-2W": "IDV"}
+UNCHECKED = {"COPY"}
+
+# Phonetic annotations, list numbering and rhyme listings ("καρδιά / φωτιά") around the verse
+ANNOTATION_RE = re.compile(r"\[[^\]]*\]|\([^)]*\)")
+NUMBERING_RE = re.compile(r"^\d+[.):]\s*")
+NOT_VERSE = ("/", "→", "~", "=")
+
+
+def is_greek(c: str) -> bool:
+    return "Ͱ" <= c <= "Ͽ" or "ἀ" <= c <= "῿"
+
+
+def verse_lines(text: str, num_lines: int) -> List[str]:
+    """The first num_lines lines of Greek verse in a model answer (titles and annotations skipped)"""
+    lines = []
+    for raw in text.splitlines():
+        raw = raw.strip()
+        if raw.startswith("#") or (raw.startswith("**") and raw.endswith("**")) or raw.endswith(":"):
+            continue
+        line = NUMBERING_RE.sub("", ANNOTATION_RE.sub("", raw).strip(" \t*_>`-–•")).strip(" \t*_`")
+        letters = [c for c in line if c.isalpha()]
+        if (len(line) < MIN_LINE_LENGTH or any(m in line for m in NOT_VERSE)
+                or sum(map(is_greek, letters)) < 0.9 * len(letters)):
+            continue
+        lines.append(line)
+        if len(lines) == num_lines:
+            break
+    return lines
+
+
+def pair_tags(features: List[str]) -> set:
+    """Detector features as matching tags (IMP-* subtypes also count as IMP)"""
+    tags = set(features)
+    if any(f.startswith("IMP-") for f in features):
+        tags.add("IMP")
+    return tags
+
+
+def verify(text: str, rhyme_type: str, features: List[str], num_lines: int, meter: Optional[str] = None) -> Dict:
+    """
+    Score a draft against the requested pattern: each of num_lines lines counts 1 if it
+    is in a pair with the stress and all features, PARTIAL_CREDIT with the stress only.
+    With a meter ("iambic-15"), the share of lines that scan in it counts half the score.
+    compliant: exactly num_lines verse lines, all fully matched (and in the meter).
+    """
+    variant = "topintzi" if "IMP-0F" in features else None
+    wanted = {rhyme_type, *(FEATURE_TAGS.get(f, f) for f in features if f not in UNCHECKED)}
+    lines = verse_lines(text, num_lines)
+
+    full, partial, pairs = set(), set(), []
+    # Drafts are a few lines, so every pair is compared (any rhyme scheme, no pruning)
+    for i, j, res in find_rhymes_windowed(lines, window=len(lines), variant=variant):
+        tags = pair_tags(res["features"])
+        if rhyme_type not in tags:
+            continue
+        matched = wanted <= tags
+        (full if matched else partial).update((i, j))
+        pairs.append({"lines": [i + 1, j + 1], "classification": res["classification"],
+                      "phonetic": res["phonetic"], "matches": matched})
+
+    score = (len(full) + PARTIAL_CREDIT * len(partial - full)) / max(num_lines, len(lines), 1)
+    compliant = len(lines) == num_lines and len(full) == num_lines
+    result = {"verse_lines": len(lines), "pairs": pairs, "unchecked": [f for f in features if f in UNCHECKED]}
+    if meter:
+        in_meter = [fits_meter(line, meter) for line in lines]
+        score = (score + sum(in_meter) / max(num_lines, len(lines), 1)) / 2
+        compliant = compliant and all(in_meter)
+        result["meter"] = {"requested": meter, "lines_in_meter": sum(in_meter),
+                           "scans": [scan_line(line)._asdict() for line in lines]}
+    return {"score": round(score, 3), "compliant": compliant, **result}
+
+
+async def generate_best_of(prompt: str, drafts: List[Tuple[str, str]], rhyme_type: str, features: List[str],
+                           num_lines: int, priority: str = "interactive",
+                           meter: Optional[str] = None) -> Tuple[Dict, List[Dict]]:
+    """
+    Run one call per (model, api_key) draft concurrently. Returns the chosen draft
+    (result, model, tokens, cached_tokens, latency_s, verification) and a summary of
+    every draft (done, failed or cancelled). Raises the first error if no draft succeeds.
+    """
+    from app import call_model
+    from routing import GENERATE
+
+    start = time.perf_counter()
+
+    async def run(k: int, model: str, api_key: str) -> Tuple[int, Dict]:
+        try:
+            text, tokens, cached = await call_model(model, prompt, api_key, priority, strategy=GENERATE)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            return k, {"error": e}
+        return k, {
+            "result": text,
+            "tokens": tokens,
+            "cached_tokens": cached,
+            "latency_s": round(time.perf_counter() - start, 3),
+            # Local and fast (ms), so it runs on the event loop
+            "verification": verify(text, rhyme_type, features, num_lines, meter),
+        }
+
+    tasks = [asyncio.create_task(run(k, model, key)) for k, (model, key) in enumerate(drafts)]
+    finished: Dict[int, Dict] = {}
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            k, res = await next_done
+            finished[k] = res
+            if "error" not in res and res["verification"]["compliant"]:
+                break
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    summary = []
+    for k, (model, _) in enumerate(drafts):
+        res = finished.get(k)
+        if res is None:
+            summary.append({"model": model, "status": "cancelled"})
+        elif "error" in res:
+            summary.append({"model": model, "status": "failed", "error": str(res["error"])})
+        else:
+            v = res["verification"]
+            summary.append({"model": model, "status": "done", "score": v["score"], "compliant": v["compliant"],
+                            "latency_s": res["latency_s"]})
+
+    ok = [(k, res) for k, res in finished.items() if "error" not in res]
+    if not ok:
+        raise next(res["error"] for res in finished.values())
+    # Highest score; among equals the one that arrived first (dict order)
+    k, best = max(ok, key=lambda item: item[1]["verification"]["score"])
+    summary[k]["chosen"] = True
+    return {**best, "model": drafts[k][0]}, summary
+
+
+def draft_plan(models: List[str], n: int) -> List[str]:
+    """n drafts spread round-robin over the models"""
+    if not 1 <= n <= MAX_DRAFTS:
+        raise ValueError(f"best_of must be between 1 and {MAX_DRAFTS}")
+    return [models[k % len(models)] for k in range(n)]
+
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Build the per-poet rhyme corpora (regular + enhanced) from raw_text/
+Reads the poet's line table (see ingest.py) instead of re-parsing the
+text for every variant; rhymes are only searched within a poem. The
+per-line meter index (meter.py) is written alongside.
+
+    python build_corpus_from_txt.py TellosAgras
+    python build_corpus_from_txt.py --all --variant topintzi
+"""
+
+import json
+from collections import defaultdict
+from pathlib import Path
+
+from corpus_format import save_v2
+from ingest import RAW_DIR, JSON_DIR, load_line_table, line_table_path, iter_poems
+from meter import meter_index_path, meter_index_stale, write_meter_index
+from rhyme_detection import find_rhymes_windowed, find_rhymes_bucketed
+
+VARIANTS = {
+    None: {"suffix": "", "label": None},
+    "topintzi": {"suffix": "_topintzi", "label": "Topintzi (IMP-0F allowed)"},
+}
+
+
+def corpus_paths(poet, variant=None):
+    """(regular, enhanced) corpus files of a poet"""
+    suffix = VARIANTS[variant]["suffix"]
+    return JSON_DIR / f"corpus_{poet}{suffix}.json", JSON_DIR / f"corpus_{poet}_enhanced{suffix}.json"
+
+
+def build_poet_corpus(poet, variant=None, mode="window", max_distance=None, rebuild_lines=False,
+                      progress=None):
+    """
+    Detect rhyme pairs in every poem of a poet's line table and write both corpus formats.
+    progress: optional jobs.Progress, advanced after every poem
+    """
+    table = load_line_table(poet, rebuild=rebuild_lines)
+    texts = [row[3] for row in table["lines"]]
+    print(f"Processing {poet} ({table['total_lines']} lines, {len(table['poems'])} poems)...")
+
+    examples = []
+    entries = []
+    detect_stats = defaultdict(int)
+
+    for _, offset, lines in iter_poems(table):
+        if mode == "bucketed":
+            found = find_rhymes_bucketed(lines, max_distance=max_distance, stats=detect_stats, variant=variant)
+        else:
+            found = find_rhymes_windowed(lines, stats=detect_stats, variant=variant)
+
+        if progress is not None:
+            progress.advance(lines=len(lines), pairs=len(found))
+
+        for i, j, res in found:
+            gi, gj = offset + i, offset + j
+            examples.append({
+                "lines": [texts[gi], texts[gj]],
+                "line_numbers": [gi + 1, gj + 1],
+                "classification": res["classification"],
+                "phonetic": res["phonetic"],
+                "features": res["features"]
+            })
+
+            # Context is rebuilt from the line table on read (see corpus_format)
+            entries.append({
+                "line_indices": [gi, gj],
+                "phonetic": res["phonetic"],
+                "classification": res["classification"],
+                "features": res["features"]
+            })
+
+    if mode == "bucketed":
+        print(f"  Examined {detect_stats['examined']} of {detect_stats['candidate_pairs']} candidate pairs "
+              f"({detect_stats['pruned']} pruned).")
+
+    suffix = VARIANTS[variant]["suffix"]
+    label = VARIANTS[variant]["label"]
+
+    regular = {"poet": poet, "source": table["source"]}
+    if label:
+        regular["variant"] = label
+    regular["total_rhymes"] = len(examples)
+    regular["examples"] = examples
+
+    enhanced = {
+        "version": f"enhanced_txt{suffix}_v2",
+        "poet": poet,
+        "source": table["source"]
+    }
+    if label:
+        enhanced["variant"] = label
+    enhanced["total_entries"] = len(entries)
+    enhanced["line_table"] = str(line_table_path(poet))
+    enhanced["entries"] = entries
+
+    regular_path, enhanced_path = corpus_paths(poet, variant)
+    with open(regular_path, 'w', encoding='utf-8') as f:
+        json.dump({poet: regular}, f, ensure_ascii=False, indent=2)
+    save_v2(enhanced, enhanced_path)
+
+    print(f"  ✓ {len(examples)} rhyme pairs → {regular_path}, {enhanced_path}")
+
+    # Per-line meter, shared by the variants: rescanned only when the line table changed
+    if meter_index_stale(poet):
+        write_meter_index(poet, table)
+        print(f"  ✓ meter index → {meter_index_path(poet)}")
+    return len(examples)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Build rhyme corpora from raw poet texts")
+    parser.add_argument("poets", nargs="*", help="Poet names (raw_text/<Poet>.txt)")
+    parser.add_argument("--all", action="store_true", help="Build every poet in raw_text/")
+    parser.add_argument("--variant", choices=[v for v in VARIANTS if v], default=None)
+    parser.add_argument("--mode", choices=["window", "bucketed"], default="window")
+    parser.add_argument("--max-distance", type=int, default=None)
+    parser.add_argument("--rebuild-lines", action="store_true", help="Re-ingest the raw text first")
+    args = parser.parse_args()
+
+    poets = args.poets
+    if args.all:
+        poets = sorted(p.stem for p in Path(RAW_DIR).glob("*.txt") if p.name != "requirements.txt")
+
+    total = sum(build_poet_corpus(p, args.variant, args.mode, args.max_distance, args.rebuild_lines)
+                for p in poets)
+    print(f"Done: {total} rhyme pairs from {len(poets)} poets.")
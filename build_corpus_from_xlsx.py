@@ -4,7 +4,7 @@ import json
 import sys
 import os
 from collections import defaultdict
-from greek_phonology import classify_rhyme_pair, analyze_mosaic_pattern, extract_pre_rhyme_vowel
+from rhyme_detection import find_rhymes_windowed, find_rhymes_bucketed
 
 
 
@@ -32,7 +32,7 @@ def clean_html(raw_html):
     # Actually, unescape should fix &nbsp; to space, which strip() removes.
     return cleantext.strip()
 
-def build_corpus(xlsx_path, output_path):
+def build_corpus(xlsx_path, output_path, mode="window", max_distance=None):
     print(f"Loading {xlsx_path}...")
     try:
         df = pd.read_excel(xlsx_path)
@@ -61,131 +61,35 @@ def build_corpus(xlsx_path, output_path):
         examples = []
         stats = defaultdict(int)
         
-        # Iterate through lines to find rhymes
-        # Window size 4 (check i against i+1, i+2, i+3)
-        # To avoid duplicates (e.g. A rhymes with B, B rhymes with A), we only look forward.
+        # Iterate through lines to find rhymes.
+        # window: check i against i+1, i+2, i+3 (forward only, to avoid duplicate A~B / B~A)
+        # bucketed: any distance up to max_distance, classifying only within rhyme-key buckets
+        detect_stats = defaultdict(int)
+        if mode == "bucketed":
+            found = find_rhymes_bucketed(lines, max_distance=max_distance, stats=detect_stats)
+        else:
+            found = find_rhymes_windowed(lines, stats=detect_stats)
         
-        for i in range(len(lines)):
-            line1 = lines[i]
-            # Skip short lines or headers
-            if len(line1) < 4: continue
+        for i, j, res in found:
+            # Limit examples per poet to avoid huge file?
+            # Let's keep all for now, we can filter later.
+            ex = {
+                "lines": [lines[i], lines[j]],
+                "line_numbers": [i+1, j+1], # Relative to start of processing
+                "classification": res["classification"],
+                "phonetic": res["phonetic"],
+                "features": res["features"]
+            }
+            examples.append(ex)
             
-            w1 = line1.split()[-1]
-            
-            for j in range(1, 4):
-                if i + j >= len(lines): break
-                
-                line2 = lines[i+j]
-                if len(line2) < 4: continue
-                # Use extract_rhyme_domain to handle clitics (e.g. "kalivi mas")
-                # This returns the full rhyme domain string (e.g. "kalivi mas")
-                from greek_phonology import extract_rhyme_domain
-                rd1 = extract_rhyme_domain(line1)
-                rd2 = extract_rhyme_domain(line2)
-                
-                w1 = rd1['rhyme_domain']
-                w2 = rd2['rhyme_domain']
-                
-                # Check for Rhyme
-                # 1. Standard Check
-                res = classify_rhyme_pair(w1, w2)
-                
-                is_valid = False
-                classification = ""
-                features = []
-                phonetic = []
-                
-                if res['type'] != 'NONE':
-                    is_valid = True
-                    stress_type = res.get('subtype', 'M')
-                    rhyme_type = res['type']
-                    
-                    # Construct classification: STRESS-TYPE (e.g. F2-PURE or F2-IMP-C-IMPERFECT)
-                    if 'imperfect_type' in res:
-                        imp_type = res['imperfect_type']
-                        classification = f"{stress_type}-{imp_type}-{rhyme_type}"
-                        features.append(imp_type)
-                    else:
-                        classification = f"{stress_type}-{rhyme_type}"
-                    
-                    features.append(stress_type)
-                    features.append(rhyme_type) # PURE, RICH, IMPERFECT
-                    
-                    if 'details' in res:
-                        features.append(res['details'])
-                    
-                    # Check for IDV (Pre-rhyme Identical Vowel)
-                    idv1 = extract_pre_rhyme_vowel(w1)
-                    idv2 = extract_pre_rhyme_vowel(w2)
-                    if idv1 and idv2 and idv1 == idv2:
-                        features.append("IDV")
-                        classification += "-IDV"
-                
-                # 2. Mosaic Check (if not valid or just to be sure)
-                # Only check mosaic if standard failed or if we want to be thorough
-                # Mosaic check is more expensive. Let's check it if standard failed OR if it's F2/F3
-                if not is_valid:
-                    mosaic_res = analyze_mosaic_pattern(line1, line2)
-                    if mosaic_res['mosaic_candidate']:
-                        is_valid = True
-                        classification = "MOSAIC"
-                        features.append("MOS")
-                        features.append("F2") # Usually mosaic is F2
-                        # Extract phonetic from mosaic analysis
-                        phonetic = [mosaic_res['line1_rhyme']['rhyme_domain_phonetic'], 
-                                    mosaic_res['line2_rhyme']['rhyme_domain_phonetic']]
-                        
-                        # Filter out IDENTICAL rhymes (Repetition)
-                        # e.g. "to Dromo" vs "to Dromo"
-                        # If phonetics match perfectly AND the words are very similar/identical, skip.
-                        # We want interesting rhymes, not repetition.
-                        if phonetic[0] == phonetic[1]:
-                             # Check if words are also identical (or close)
-                             # mosaic_res['line1_rhyme']['words'] is a list of words.
-                             # Normalize: remove punctuation, lowercase, strip accents
-                             import unicodedata
-                             def normalize(w_list):
-                                 s = "".join(w_list).lower().replace("'", "").replace("’", "")
-                                 # Strip accents
-                                 s = ''.join(c for c in unicodedata.normalize('NFD', s) if unicodedata.category(c) != 'Mn')
-                                 return s
-                                 
-                             w1_norm = normalize(mosaic_res['line1_rhyme']['words'])
-                             w2_norm = normalize(mosaic_res['line2_rhyme']['words'])
-                             
-                             # Reject if one is contained in the other (e.g. "luludi" in "menaluludi")
-                             # Or if they are identical
-                             if w1_norm == w2_norm or w1_norm.endswith(w2_norm) or w2_norm.endswith(w1_norm):
-                                 is_valid = False # Reject identical repetition
-                
-                if is_valid:
-                    # Add to examples
-                    # Limit examples per poet to avoid huge file? 
-                    # Let's keep all for now, we can filter later.
-                    
-                    # If phonetic wasn't set by mosaic
-                    if not phonetic:
-                         # We need to re-extract or just use placeholders.
-                         # classify_rhyme_pair doesn't return phonetics directly in the dict (it returns type).
-                         # We can call extract_rhyme_domain to get phonetics.
-                         from greek_phonology import extract_rhyme_domain
-                         rd1 = extract_rhyme_domain(line1)
-                         rd2 = extract_rhyme_domain(line2)
-                         phonetic = [rd1.get('rhyme_domain_phonetic', ''), rd2.get('rhyme_domain_phonetic', '')]
-
-                    ex = {
-                        "lines": [line1, line2],
-                        "line_numbers": [i+1, i+1+j], # Relative to start of processing
-                        "classification": classification,
-                        "phonetic": phonetic,
-                        "features": features
-                    }
-                    examples.append(ex)
-                    
-                    # Update stats
-                    stats['total_rhymes'] += 1
-                    for f in features:
-                        stats[f] += 1
+            # Update stats
+            stats['total_rhymes'] += 1
+            for f in res["features"]:
+                stats[f] += 1
+        
+        if mode == "bucketed":
+            print(f"  Examined {detect_stats['examined']} of {detect_stats['candidate_pairs']} candidate pairs "
+                  f"({detect_stats['pruned']} pruned, {detect_stats['buckets']} buckets).")
         
         # Calculate percentages for stats
         final_stats = {"total_rhymes_found": stats['total_rhymes']}
@@ -210,4 +114,13 @@ def build_corpus(xlsx_path, output_path):
     print("Done.")
 
 if __name__ == "__main__":
-    build_corpus("GLC_Anemoskala_select_text.xlsx", "rhyme_corpus.json")
+    import argparse
+    parser = argparse.ArgumentParser(description="Build a rhyme corpus from the GLC Excel export")
+    parser.add_argument("xlsx_path", nargs="?", default="GLC_Anemoskala_select_text.xlsx")
+    parser.add_argument("output_path", nargs="?", default="rhyme_corpus.json")
+    parser.add_argument("--mode", choices=["window", "bucketed"], default="window",
+                        help="bucketed finds long-distance rhymes by pruning on a coarse rhyme key")
+    parser.add_argument("--max-distance", type=int, default=None,
+                        help="Maximum line distance in bucketed mode (default: unbounded)")
+    args = parser.parse_args()
+    build_corpus(args.xlsx_path, args.output_path, args.mode, args.max_distance)
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cancel request handlers when the client goes away or asks to
+A closed tab or a frontend timeout used to leave call_model waiting up to
+120 s on the provider and paying for every output token. The ASGI
+middleware below runs each HTTP request in its own task under a request
+id (the client's X-Request-ID header or a new one, echoed in the
+response). Once the body has been read it keeps listening on the
+connection; on http.disconnect, or POST /cancel/{request_id}, the task is
+cancelled. The CancelledError reaches the awaited httpx call, which closes
+the upstream connection at once, or the scheduler queue, which drops the
+call before it is sent.
+
+call_model reports each aborted call here: calls still queued cost
+nothing, calls in flight cost their input but not the output still to come.
+GET /scheduler/stats shows the totals under "cancellations".
+
+    fetch("/identify", {headers: {"X-Request-ID": id}, ...})
+    navigator.sendBeacon(`/cancel/${id}`)        // e.g. on pagehide
+"""
+
+import asyncio
+import uuid
+from collections import Counter
+from typing import Dict
+
+REQUEST_ID_HEADER = "x-request-id"
+# Status sent when a request is cancelled through /cancel while its client still waits
+CANCELLED_STATUS = 499
+
+
+class CancellationMetrics:
+    def __init__(self):
+        self.requests = Counter()
+        self.by_path = Counter()
+        self.calls = Counter()
+        self.tokens_saved = Counter()
+        self.upstream_seconds = 0.0
+
+    def request_cancelled(self, path: str, reason: str):
+        self.requests[reason] += 1
+        self.by_path[path] += 1
+
+    def call_aborted(self, stage: str, input_tokens: int, output_tokens: int, seconds: float = 0.0):
+        """
+        stage "queued": never sent, input and output saved; "upstream": the input
+        is paid, the output reservation is the estimate of what was saved
+        """
+        self.calls[stage] += 1
+        if stage == "queued":
+            self.tokens_saved["input"] += input_tokens
+        self.tokens_saved["output_estimate"] += output_tokens
+        self.upstream_seconds += seconds
+
+    def snapshot(self) -> Dict:
+        return {
+            "requests": dict(self.requests),
+            "by_path": dict(self.by_path),
+            "calls_aborted": dict(self.calls),
+            "tokens_saved": dict(self.tokens_saved),
+            "upstream_seconds_at_abort": round(self.upstream_seconds, 3),
+            "in_flight": len(registry.tasks),
+        }
+
+
+class Registry:
+    """In-flight request tasks by request id"""
+
+    def __init__(self):
+        self.tasks: Dict[str, asyncio.Task] = {}
+        self.reasons: Dict[str, str] = {}
+
+    def cancel(self, request_id: str, reason: str) -> bool:
+        task = self.tasks.get(request_id)
+        if task is None or task.done():
+            return False
+        self.reasons.setdefault(request_id, reason)
+        task.cancel()
+        return True
+
+
+metrics = CancellationMetrics()
+registry = Registry()
+
+
+class CancelOnDisconnect:
+    """ASGI middleware: HTTP requests run as cancellable tasks, see the module docstring"""
+
+    def __init__(self, app, exclude_prefixes=("/cancel",)):
+        self.app = app
+        self.exclude = exclude_prefixes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(self.exclude):
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        request_id = headers.get(REQUEST_ID_HEADER.encode(), b"").decode("latin-1")[:64] or uuid.uuid4().hex
+        if request_id in registry.tasks:
+            request_id = f"{request_id}-{uuid.uuid4().hex[:8]}"
+        disconnected = asyncio.Event()
+        body_done = asyncio.Event()
+        response = {"started": False, "done": False}
+
+        async def app_receive():
+            # After the body, the app only hears about the disconnect (from the watcher below)
+            if body_done.is_set():
+                await disconnected.wait()
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                disconnected.set()
+            elif not message.get("more_body", False):
+                body_done.set()
+            return message
+
+        async def app_send(message):
+            if message["type"] == "http.response.start":
+                response["started"] = True
+                message = {**message, "headers": [*message.get("headers", []),
+                                                  (REQUEST_ID_HEADER.encode(), request_id.encode("latin-1"))]}
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                response["done"] = True
+            await send(message)
+
+        async def watch():
+            await body_done.wait()
+            while True:
+                message = await receive()
+                if message["type"] == "http.disconnect":
+                    disconnected.set()
+                    # The server reports a disconnect after a complete response too
+                    if not response["done"]:
+                        registry.cancel(request_id, "disconnect")
+                    return
+
+        task = asyncio.current_task()
+        registry.tasks[request_id] = task
+        watcher = asyncio.create_task(watch())
+        try:
+            await self.app(scope, app_receive, app_send)
+        except asyncio.CancelledError:
+            reason = registry.reasons.get(request_id)
+            if reason is None:
+                # Not ours (server shutdown): let it propagate
+                raise
+            # Ours: the request ends here. A gone client needs no answer, one that sent /cancel gets 499
+            if hasattr(task, "uncancel"):  # 3.11+
+                task.uncancel()
+            metrics.request_cancelled(scope["path"], reason)
+            if reason == "explicit" and not disconnected.is_set() and not response["started"]:
+                await send_cancelled(send, request_id)
+        finally:
+            watcher.cancel()
+            registry.tasks.pop(request_id, None)
+            registry.reasons.pop(request_id, None)
+
+
+async def send_cancelled(send, request_id: str):
+    body = b'{"detail":"Request cancelled"}'
+    await send({"type": "http.response.start", "status": CANCELLED_STATUS,
+                "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()),
+                            (REQUEST_ID_HEADER.encode(), request_id.encode("latin-1"))]})
+    await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Overlapping chunks for long identification inputs
+A long poem sent as one prompt can exceed the context, and the answer is
+cut at the output cap, so the end of the poem is never analyzed. Here the
+verse lines are numbered globally (blank lines between stanzas are kept
+but not counted) and cut on stanza boundaries into chunks of at most
+CHUNK_LINES lines. Every chunk also carries the next DEFAULT_WINDOW lines
+as overlap, so a pair that starts on one of its own lines and ends within
+the detectors' rhyme window (rhyme_detection) is still seen whole.
+
+Each chunk owns the pairs whose first line is one of its own lines; its
+prompt says so, and the merge keeps every pair once, from its owner,
+with global line numbers. All chunks run concurrently, so a long poem
+takes about as long as its slowest chunk.
+
+    chunks = split_poem(text)                          # [] when the poem fits one prompt
+    merged = await identify_chunked(chunks, "gemini-2.5-flash", "few_shot", key, output_format="json")
+"""
+
+import asyncio
+import json
+import re
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from prompts import get_identification_prompt
+from rhyme_detection import DEFAULT_WINDOW
+
+CHUNK_LINES = 40
+# Lines after a chunk's own lines, enough for a pair starting on its last line
+OVERLAP_LINES = DEFAULT_WINDOW
+
+CHUNK_NOTE = """
+(Lines {first}-{last} of a longer poem, numbered as in the whole poem. Use these numbers and
+only report pairs whose first line is between {first} and {own_last}; lines after {own_last}
+are context.)"""
+
+BLANK_RE = re.compile(r"\n\s*\n")
+
+
+class Chunk(NamedTuple):
+    first: int
+    own_last: int
+    last: int
+    # Stanzas of (global line number, text)
+    stanzas: List[List[Tuple[int, str]]]
+
+    def text(self) -> str:
+        body = "\n\n".join("\n".join(f"{n}. {line}" for n, line in stanza) for stanza in self.stanzas)
+        return body + CHUNK_NOTE.format(first=self.first, last=self.last, own_last=self.own_last)
+
+    def owns(self, line: int) -> bool:
+        return self.first <= line <= self.own_last
+
+
+def numbered_stanzas(text: str) -> List[List[Tuple[int, str]]]:
+    """Stanzas (split on blank lines) of globally numbered verse lines"""
+    stanzas, n = [], 0
+    for block in BLANK_RE.split(text.strip()):
+        lines = [line.strip() for line in block.splitlines() if line.strip()]
+        if lines:
+            stanzas.append([(n + k, line) for k, line in enumerate(lines, 1)])
+            n += len(lines)
+    return stanzas
+
+
+def split_poem(text: str, max_lines: int = CHUNK_LINES) -> List[Chunk]:
+    """
+    Chunks of whole stanzas (a stanza longer than max_lines is cut by lines), each
+    followed by OVERLAP_LINES lines of overlap; [] when the poem has at most max_lines lines
+    """
+    stanzas = []
+    for stanza in numbered_stanzas(text):
+        stanzas += [stanza[k:k + max_lines] for k in range(0, len(stanza), max_lines)]
+    if sum(map(len, stanzas)) <= max_lines:
+        return []
+
+    chunks, k = [], 0
+    while k < len(stanzas):
+        own, size = [], 0
+        while k < len(stanzas) and (not own or size + len(stanzas[k]) <= max_lines):
+            own.append(stanzas[k])
+            size += len(stanzas[k])
+            k += 1
+        # Overlap: the next OVERLAP_LINES lines, stanza breaks kept
+        overlap, extra, j = [], 0, k
+        while j < len(stanzas) and extra < OVERLAP_LINES:
+            overlap.append(stanzas[j][:OVERLAP_LINES - extra])
+            extra += len(overlap[-1])
+            j += 1
+        parts = own + overlap
+        chunks.append(Chunk(own[0][0][0], own[-1][-1][0], parts[-1][-1][0], parts))
+    return chunks
+
+
+def merge_pairs(per_chunk: List[Tuple[Chunk, List]]) -> List:
+    """Pairs (structured.RhymePair) kept once, from the chunk that owns their first line"""
+    merged = {}
+    for chunk, pairs in per_chunk:
+        for pair in pairs:
+            a, b = pair.lines
+            if chunk.owns(a) and b <= chunk.last and (a, b) not in merged:
+                merged[(a, b)] = pair
+    return [merged[key] for key in sorted(merged)]
+
+
+async def identify_chunk(chunk: Chunk, model: str, strategy: str, api_key: str, priority: str,
+                         output_format: str, rag_context: str) -> Dict:
+    from app import call_model
+    from routing import strategy_key
+    from structured import MAX_OUTPUT_TOKENS, PAIRS_SCHEMA, parse_structured, structured_prompt
+
+    start = time.perf_counter()
+    if output_format == "json":
+        prompt = structured_prompt(chunk.text(), strategy, rag_context)
+        result, tokens, cached = await call_model(model, prompt, api_key, priority,
+                                                  MAX_OUTPUT_TOKENS[strategy], PAIRS_SCHEMA,
+                                                  strategy=strategy_key(strategy, output_format))
+        # Raises StructuredOutputError, like an unchunked request
+        pairs = parse_structured(result, chunk.last)
+    else:
+        prompt = get_identification_prompt(chunk.text(), strategy, rag_context)
+        result, tokens, cached = await call_model(model, prompt, api_key, priority, strategy=strategy)
+        pairs = None
+    return {"prompt": prompt, "result": result, "tokens": tokens, "cached": cached, "pairs": pairs,
+            "latency_s": round(time.perf_counter() - start, 3)}
+
+
+def total(values: List[Optional[int]]) -> Optional[int]:
+    known = [v for v in values if v is not None]
+    return sum(known) if known else None
+
+
+async def identify_chunked(chunks: List[Chunk], model: str, strategy: str, api_key: str,
+                           priority: str = "interactive", output_format: str = "text",
+                           rag_context: str = "") -> Dict:
+    """
+    Identify every chunk concurrently. Returns result (merged pairs as JSON, or the
+    chunks' analyses under "=== Lines a-b ===" headers), the first chunk's prompt,
+    summed tokens, the merged pairs (JSON mode) and a summary per chunk.
+    """
+    done = await asyncio.gather(*(identify_chunk(c, model, strategy, api_key, priority, output_format, rag_context)
+                                  for c in chunks))
+    pairs = None
+    if output_format == "json":
+        pairs = merge_pairs([(c, d["pairs"]) for c, d in zip(chunks, done)])
+        result = json.dumps({"pairs": [p.model_dump() for p in pairs]}, ensure_ascii=False)
+    else:
+        result = "\n\n".join(f"=== Lines {c.first}-{c.own_last} ===\n{d['result'].strip()}"
+                             for c, d in zip(chunks, done))
+    return {
+        "result": result,
+        "prompt": done[0]["prompt"],
+        "tokens": total([d["tokens"] for d in done]),
+        "cached": total([d["cached"] for d in done]),
+        "pairs": pairs,
+        "chunks": [{
+            "lines": [c.first, c.last],
+            "own_lines": [c.first, c.own_last],
+            "tokens": d["tokens"],
+            "latency_s": d["latency_s"],
+            **({"pairs": len(d["pairs"])} if d["pairs"] is not None else {}),
+        } for c, d in zip(chunks, done)],
+    }
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Enhanced corpus format: normalized (v2) storage and compatibility reader
+
+v1 entries store the pair lines, a copy of the surrounding context and
+line_indices, so every verse line is repeated across overlapping entries.
+v2 stores each line once, in a per-poet line table (inline "lines" or a
+"line_table" reference to json/lines_<Poet>.json), and entries only keep
+line_indices. Context is rebuilt on access: one line either side of the
+pair, clipped to the segment (poem) the pair belongs to.
+
+    python corpus_format.py convert json/corpus_*_enhanced*.json
+"""
+
+import json
+import time
+import tracemalloc
+from bisect import bisect_right
+from collections.abc import Sequence
+from pathlib import Path
+from typing import Dict, List, Optional
+
+V1_HEADER_KEYS = ("version", "poet", "source", "variant", "total_entries")
+
+
+class LazyEntries(Sequence):
+    """v1-shaped entries materialized on access from a v2 corpus"""
+
+    def __init__(self, entries: List[Dict], lines: List[Optional[str]], segments: List[List[int]]):
+        self._entries = entries
+        self._lines = lines
+        self._segments = segments
+        self._starts = [s[0] for s in segments]
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[k] for k in range(*index.indices(len(self)))]
+        e = self._entries[index]
+        i, j = e["line_indices"]
+        seg_start, seg_end = self._segments[bisect_right(self._starts, i) - 1]
+        start = max(seg_start, i - 1)
+        end = min(seg_end, j + 2)
+        return {
+            "rhyme_pair": [self._lines[i], self._lines[j]],
+            "context": self._lines[start:end],
+            "rhyme_positions": [i - start, j - start],
+            "distance": j - i,
+            "phonetic": e["phonetic"],
+            "classification": e["classification"],
+            "features": e["features"],
+            "line_indices": [i, j]
+        }
+
+
+def is_v2(data: Dict) -> bool:
+    return str(data.get("version", "")).endswith("_v2")
+
+
+def load_enhanced_corpus(path) -> Dict:
+    """
+    Read an enhanced corpus in either format and return the v1 dict shape.
+    For v2 files the "entries" value is a LazyEntries sequence.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if not is_v2(data):
+        return data
+
+    if "line_table" in data:
+        with open(data["line_table"], 'r', encoding='utf-8') as f:
+            table = json.load(f)
+        lines = [row[3] for row in table["lines"]]
+        segments = data.get("segments") or [[p["start"], p["end"]] for p in table["poems"]]
+    else:
+        lines = data["lines"]
+        segments = data.get("segments") or [[0, len(lines)]]
+
+    corpus = {k: data[k] for k in V1_HEADER_KEYS if k in data}
+    corpus["entries"] = LazyEntries(data["entries"], lines, segments)
+    return corpus
+
+
+def to_v2(data: Dict, line_table: Optional[str] = None, segments: Optional[List[List[int]]] = None) -> Dict:
+    """
+    Normalize a v1 enhanced corpus. Without a line_table reference the lines
+    are reconstructed from the entries' contexts (unreferenced lines are null).
+    """
+    compact = {k: data[k] for k in V1_HEADER_KEYS if k in data}
+    compact["version"] = data["version"].replace("_v1", "_v2")
+
+    if line_table:
+        compact["line_table"] = line_table
+    else:
+        lines = {}
+        for e in data["entries"]:
+            start = e["line_indices"][0] - e["rhyme_positions"][0]
+            for k, text in enumerate(e["context"]):
+                lines[start + k] = text
+        n = max(lines) + 1 if lines else 0
+        compact["lines"] = [lines.get(k) for k in range(n)]
+    if segments:
+        compact["segments"] = segments
+
+    compact["entries"] = [{
+        "line_indices": e["line_indices"],
+        "phonetic": e["phonetic"],
+        "classification": e["classification"],
+        "features": e["features"]
+    } for e in data["entries"]]
+    return compact
+
+
+def save_v2(compact: Dict, path):
+    """One entry per line: compact on disk, still diffable"""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("{\n")
+        for key, value in compact.items():
+            if key in ("lines", "entries", "segments"):
+                continue
+            f.write(f"  {json.dumps(key)}: {json.dumps(value, ensure_ascii=False)},\n")
+        for key in ("lines", "segments"):
+            if key in compact:
+                f.write(f'  "{key}": [\n')
+                f.write(",\n".join("    " + json.dumps(v, ensure_ascii=False) for v in compact[key]))
+                f.write("\n  ],\n")
+        f.write('  "entries": [\n')
+        f.write(",\n".join("    " + json.dumps(e, ensure_ascii=False) for e in compact["entries"]))
+        f.write("\n  ]\n}\n")
+
+
+# === MEASUREMENT ===
+
+def measure_load(path, materialize: bool = False) -> Dict:
+    """Load time and retained memory of one file through the compatibility reader"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    corpus = load_enhanced_corpus(path)
+    if materialize:
+        for _ in corpus["entries"]:
+            pass
+    elapsed = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del corpus
+    return {"load_ms": round(elapsed * 1000, 1), "memory_kb": round(current / 1024)}
+
+
+def convert_file(path) -> Dict:
+    """Convert a v1 file in place and return before/after measurements"""
+    path = Path(path)
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if is_v2(data):
+        return None
+
+    before = {"size_kb": round(path.stat().st_size / 1024), **measure_load(path)}
+    original = data["entries"]
+    save_v2(to_v2(data), path)
+
+    converted = load_enhanced_corpus(path)
+    assert list(converted["entries"]) == original, f"{path}: round trip mismatch"
+    after = {"size_kb": round(path.stat().st_size / 1024), **measure_load(path)}
+    after_full = measure_load(path, materialize=True)
+    return {"file": path.name, "entries": len(original), "before": before, "after": after,
+            "iterate_ms": after_full["load_ms"]}
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Enhanced corpus format tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    conv = sub.add_parser("convert", help="Convert v1 enhanced corpora to v2 in place")
+    conv.add_argument("paths", nargs="+")
+    args = parser.parse_args()
+
+    print(f"{'file':50} {'entries':>7} {'size KB':>15} {'load ms':>15} {'memory KB':>17}")
+    for p in args.paths:
+        r = convert_file(p)
+        if r is None:
+            print(f"{Path(p).name:50} already v2")
+            continue
+        b, a = r["before"], r["after"]
+        print(f"{r['file']:50} {r['entries']:>7} {b['size_kb']:>7}→{a['size_kb']:<7} "
+              f"{b['load_ms']:>7}→{a['load_ms']:<7} {b['memory_kb']:>8}→{a['memory_kb']:<8}")
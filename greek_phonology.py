@@ -0,0 +1,584 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Greek phonology engine: grapheme-to-phoneme, syllabification, stress and
+rhyme classification (Topintzi et al. 2019 taxonomy).
+
+Dependency-free and table driven: one compiled regex tokenizes a word into
+graphemes (vowel digraphs αι ει οι ου υι, αυ/ευ/ηυ, consonant digraphs
+μπ ντ γκ γγ τσ τζ, single letters with their stress/diaeresis marks) and
+lookup tables map every grapheme to phonemes. Context rules then apply
+αυ/ευ voicing, synizesis (unstressed ι/υ/ει/οι before a vowel -> glide j),
+σ voicing and degemination.
+
+Phonemes: vowels a e i o u; consonants p t k b d g f v T(θ) D(δ) s z X(χ)
+G(γ) m n l r ts dz j.
+
+    python greek_phonology.py bench      # lines/sec over the line tables
+    python greek_phonology.py validate   # agreement with the enhanced corpora
+"""
+
+import re
+import unicodedata
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+# === TABLES ===
+
+# Polytonic -> monotonic: breathings and iota subscript dropped, every accent becomes tonos,
+# letter variants become the plain letters
+POLYTONIC_MARKS = str.maketrans({
+    "\u0313": None, "\u0314": None, "\u0345": None,
+    "\u0300": "\u0301", "\u0342": "\u0301",
+    "ϑ": "θ", "ϐ": "β", "ϲ": "σ",
+})
+
+# Stand-in characters found in the sources
+CHAR_FIXES = str.maketrans({"µ": "μ", "ς": "σ"})
+
+# Latin look-alikes inside otherwise Greek words (OCR: "aπò", "τηs", "καì")
+CONFUSABLES = str.maketrans({
+    "a": "α", "e": "ε", "i": "ι", "o": "ο", "u": "υ", "s": "σ", "k": "κ", "x": "χ",
+    "n": "ν", "v": "ν", "p": "ρ", "t": "τ", "y": "υ",
+    "á": "ά", "à": "ά", "é": "έ", "è": "έ", "í": "ί", "ì": "ί",
+    "ó": "ό", "ò": "ό", "ú": "ύ", "ù": "ύ", "ũ": "ύ", "ĩ": "ί",
+})
+
+GREEK_LETTER_RE = re.compile(r"[\u0370-\u03ff]")
+
+TOKEN_RE = re.compile(
+    r"[αεη][υύ]"            # αυ ευ ηυ (vowel + v/f)
+    r"|[αεου][ιί]|ο[υύ]"    # αι ει οι υι ου
+    r"|μπ|ντ|γκ|γγ|τσ|τζ"
+    r"|[αεηιουωάέήίόύώϊϋΐΰ]"
+    r"|[βγδζθκλμνξπρστφχψ]"
+)
+
+VOWELS = {
+    "α": "a", "ά": "a", "ε": "e", "έ": "e", "η": "i", "ή": "i",
+    "ι": "i", "ί": "i", "ϊ": "i", "ΐ": "i", "ο": "o", "ό": "o",
+    "υ": "i", "ύ": "i", "ϋ": "i", "ΰ": "i", "ω": "o", "ώ": "o",
+    "αι": "e", "αί": "e", "ει": "i", "εί": "i", "οι": "i", "οί": "i",
+    "υι": "i", "υί": "i", "ου": "u", "ού": "u",
+}
+# αυ/ευ/ηυ: the vowel, then v or f depending on what follows
+VOWEL_FRICATIVE = {
+    "αυ": "a", "αύ": "a", "ευ": "e", "εύ": "e", "ηυ": "i", "ηύ": "i",
+}
+CONSONANTS = {
+    "β": ("v",), "γ": ("G",), "δ": ("D",), "ζ": ("z",), "θ": ("T",), "κ": ("k",),
+    "λ": ("l",), "μ": ("m",), "ν": ("n",), "ξ": ("k", "s"), "π": ("p",), "ρ": ("r",),
+    "σ": ("s",), "τ": ("t",), "φ": ("f",), "χ": ("X",), "ψ": ("p", "s"),
+    "μπ": ("b",), "ντ": ("d",), "γκ": ("g",), "γγ": ("g",), "τσ": ("ts",), "τζ": ("dz",),
+}
+STRESSED = set("άέήίόύώΐΰ") | {"αί", "εί", "οί", "υί", "ού", "αύ", "εύ", "ηύ"}
+# Graphemes that can lose syllabicity before a vowel
+SYNIZESIS = {"ι", "υ", "ει", "οι"}
+
+VOICELESS = {"p", "t", "k", "f", "T", "s", "X", "ts"}
+VOICED = {"v", "G", "D", "z", "m", "n", "l", "r", "b", "d", "g", "dz"}
+
+# Consonant clusters that can open a syllable (a trailing j is always allowed)
+LEGAL_ONSETS = {
+    tuple(c.split()) for c in (
+        "p r", "p l", "t r", "k r", "k l", "b r", "b l", "d r", "g r", "g l",
+        "f r", "f l", "T r", "X r", "X l", "v r", "v l", "D r", "G r", "G l",
+        "s p", "s t", "s k", "s f", "s X", "z m", "z v", "z G", "z b", "z d",
+        "f t", "X t", "f T", "X T", "p t", "k t", "G D", "v D",
+        "p n", "k n", "G n", "m n", "T n", "D n", "t m", "k m", "G m", "D m", "T m",
+        "p s", "k s",
+        "s t r", "s p r", "s k r", "s p l", "s k l", "s f r", "s X r", "z v r",
+    )
+}
+
+# Unstressed pronouns/articles that lean on the preceding word
+ENCLITICS = {"μου", "σου", "του", "της", "τους", "μας", "σας", "τον", "την", "τη",
+             "το", "τα", "τις", "τες", "των", "μ", "σ", "τ"}
+MAX_ENCLITICS = 2
+
+# Mosaic tails span at most the last three words (word + clitics)
+MAX_MOSAIC_WORDS = 3
+TAIL_PUNCTUATION = ".,;:!?·«»\"()[]-–—…'’᾽"
+WORD_SPLIT_RE = re.compile(r"[\s\-–—…'’᾽᾿΄`]+")
+EDGE_PUNCTUATION = TAIL_PUNCTUATION + "᾿΄`•|<>*/\\"
+
+VARIANTS = (None, "topintzi")
+
+# g2p-greek notation, for callers that expect its output (see phonology.py)
+G2P_NOTATION = {"T": "th", "D": "dh", "G": "gh", "X": "h", "dz": "d z"}
+
+# LEGAL_ONSETS in g2p-greek notation: σ stays unvoiced ("s m" for σμ; every z in LEGAL_ONSETS
+# is a voiced σ) and the affricates may be two phones ("t s", "d z")
+G2P_ONSETS = {tuple(" ".join("s" if p == "z" else G2P_NOTATION.get(p, p) for p in onset).split())
+              for onset in LEGAL_ONSETS} | {("t", "s"), ("d", "z")}
+
+
+class Phonemes(NamedTuple):
+    phones: Tuple[str, ...]
+    is_vowel: Tuple[bool, ...]
+    stress: int          # index into phones of the stressed vowel, -1 if no vowel
+    accented: bool       # stress written (False: monosyllable or default penultimate)
+
+
+class Rhyme(NamedTuple):
+    subtype: str                 # M, F2, F3
+    part: Tuple[str, ...]        # stressed vowel to the end
+    vowels: Tuple[str, ...]      # stressed vowel first
+    consonants: Tuple[str, ...]  # post-tonic consonants
+    onset: Tuple[str, ...]       # consonants of the stressed syllable (glides excluded)
+    pre_vowel: Optional[str]     # vowel before the stressed syllable
+
+
+# === GRAPHEME TO PHONEME ===
+
+def normalize(word: str) -> str:
+    """Lowercase monotonic Greek letters only; Latin look-alikes fixed in mixed words"""
+    word = unicodedata.normalize("NFD", word.lower()).translate(POLYTONIC_MARKS)
+    word = unicodedata.normalize("NFC", word).translate(CHAR_FIXES)
+    if GREEK_LETTER_RE.search(word):
+        word = word.translate(CONFUSABLES)
+    return word
+
+
+@lru_cache(maxsize=1 << 17)
+def transcribe(word: str) -> Phonemes:
+    """Phonemes of a word (or of a clitic group written with spaces)"""
+    tokens = TOKEN_RE.findall(normalize(word))
+
+    # Grapheme -> (phoneme, is_vowel, stressed, can_glide)
+    segs: List[list] = []
+    for k, tok in enumerate(tokens):
+        if tok in VOWELS:
+            segs.append([VOWELS[tok], True, tok in STRESSED, tok in SYNIZESIS])
+        elif tok in VOWEL_FRICATIVE:
+            segs.append([VOWEL_FRICATIVE[tok], True, tok in STRESSED, False])
+            nxt = tokens[k + 1] if k + 1 < len(tokens) else None
+            first = CONSONANTS[nxt][0] if nxt in CONSONANTS else None
+            segs.append(["f" if nxt is None or first in VOICELESS else "v", False, False, False])
+        else:
+            for p in CONSONANTS[tok]:
+                segs.append([p, False, False, False])
+
+    # Synizesis: unstressed ι/υ/ει/οι between a consonant and a vowel is a glide
+    for k in range(1, len(segs) - 1):
+        s = segs[k]
+        if s[3] and not s[2] and not segs[k - 1][1] and segs[k + 1][1]:
+            s[0], s[1] = "j", False
+            if segs[k - 1][0] == "G":
+                segs[k - 1][0] = None
+    segs = [s for s in segs if s[0]]
+
+    # σ voicing and degemination
+    phones: List[list] = []
+    for k, s in enumerate(segs):
+        if s[0] == "s" and k + 1 < len(segs) and segs[k + 1][0] in VOICED:
+            s[0] = "z"
+        if phones and not s[1] and phones[-1][0] == s[0]:
+            continue
+        phones.append(s)
+
+    vowel_idx = [k for k, s in enumerate(phones) if s[1]]
+    stressed = [k for k in vowel_idx if phones[k][2]]
+    if stressed:
+        stress, accented = stressed[-1], True
+    elif vowel_idx:
+        stress, accented = vowel_idx[-2] if len(vowel_idx) > 1 else vowel_idx[0], False
+    else:
+        stress, accented = -1, False
+
+    return Phonemes(tuple(s[0] for s in phones), tuple(s[1] for s in phones), stress, accented)
+
+
+def syllable_bounds(phones, nuclei: List[int], onsets=LEGAL_ONSETS, glides=("j",)) -> List[int]:
+    """Start index of every syllable, then len(phones): each cluster gives the next syllable its longest legal onset"""
+    bounds = [0]
+    for a, b in zip(nuclei, nuclei[1:]):
+        cluster = phones[a + 1:b]
+        split = 0
+        while split < len(cluster):
+            core = tuple(p for p in cluster[split:] if p not in glides)
+            if len(core) <= 1 or core in onsets:
+                break
+            split += 1
+        bounds.append(a + 1 + split)
+    bounds.append(len(phones))
+    return bounds
+
+
+def syllabify(word: str) -> Tuple[List[str], int]:
+    """Syllables (maximal legal onset) as phoneme strings and the stressed syllable index"""
+    ph = transcribe(word)
+    nuclei = [k for k, v in enumerate(ph.is_vowel) if v]
+    if not nuclei:
+        return ["".join(ph.phones)] if ph.phones else [], -1
+
+    bounds = syllable_bounds(ph.phones, nuclei)
+    syllables = ["".join(ph.phones[s:e]) for s, e in zip(bounds, bounds[1:])]
+    return syllables, nuclei.index(ph.stress)
+
+
+@lru_cache(maxsize=1 << 16)
+def phonetic(word: str) -> str:
+    """Dotted syllables with the stressed one marked: θάλασσα -> 'Ta.la.sa"""
+    syllables, stress = syllabify(word)
+    if stress >= 0:
+        syllables[stress] = "'" + syllables[stress]
+    return ".".join(syllables)
+
+
+def g2p_phonemes(word: str) -> str:
+    """The same transcription in g2p-greek notation: θάλασσα -> th a1 l a0 s a0"""
+    ph = transcribe(word)
+    out = []
+    for k, (p, v) in enumerate(zip(ph.phones, ph.is_vowel)):
+        if v:
+            out.append(p + ("1" if k == ph.stress and ph.accented else "0"))
+        else:
+            out.append(G2P_NOTATION.get(p, p))
+    return " ".join(out)
+
+
+# === RHYME DOMAIN ===
+
+def split_words(line: str, last: Optional[int] = None) -> List[str]:
+    """Words of a line without edge punctuation; only the final `last` ones if given"""
+    words = []
+    for w in reversed(WORD_SPLIT_RE.split(line)):
+        w = w.strip(EDGE_PUNCTUATION)
+        if w and any(c.isalpha() for c in w):
+            words.append(w)
+            if last and len(words) == last:
+                break
+    words.reverse()
+    return words
+
+
+ENCLITIC_FORMS = frozenset(normalize(w) for w in ENCLITICS)
+
+
+@lru_cache(maxsize=4096)
+def is_enclitic(word: str) -> bool:
+    return normalize(word) in ENCLITIC_FORMS
+
+
+def rhyme_domain(line: str) -> str:
+    """Last word of a line plus trailing enclitics ("πέρασμά σου"), "" if it has no words"""
+    words = split_words(line, MAX_ENCLITICS + 1)
+    k = len(words) - 1
+    while k > 0 and len(words) - 1 - k < MAX_ENCLITICS and is_enclitic(words[k]):
+        k -= 1
+    return " ".join(words[k:]) if words else ""
+
+
+def extract_rhyme_domain(line: str) -> Dict:
+    """Rhyme domain of a verse line (see rhyme_domain) with its phonetic form"""
+    domain = rhyme_domain(line)
+    return {
+        "rhyme_domain": domain,
+        "rhyme_domain_phonetic": phonetic(domain.replace(" ", "")) if domain else "",
+    }
+
+
+@lru_cache(maxsize=1 << 16)
+def get_rhyme(domain: str) -> Optional[Rhyme]:
+    """Rhyme part of a domain, None when it has no Greek vowel"""
+    ph = transcribe(domain.replace(" ", ""))
+    if ph.stress < 0:
+        return None
+    part = ph.phones[ph.stress:]
+    mask = ph.is_vowel[ph.stress:]
+    vowels = tuple(p for p, v in zip(part, mask) if v)
+    consonants = tuple(p for p, v in zip(part, mask) if not v)
+
+    k = ph.stress - 1
+    while k >= 0 and not ph.is_vowel[k]:
+        k -= 1
+    onset = tuple(p for p in ph.phones[k + 1:ph.stress] if p != "j")
+    pre_vowel = ph.phones[k] if k >= 0 else None
+
+    subtype = ("M", "F2", "F3")[min(len(vowels) - 1, 2)]
+    return Rhyme(subtype, part, vowels, consonants, onset, pre_vowel)
+
+
+def extract_pre_rhyme_vowel(word: str) -> Optional[str]:
+    """Vowel before the stressed syllable (for IDV), None if there is none"""
+    rhyme = get_rhyme(word)
+    return rhyme.pre_vowel if rhyme else None
+
+
+# === CLASSIFICATION ===
+
+@lru_cache(maxsize=1 << 16)
+def fold(text: str) -> str:
+    """Accent- and case-insensitive spelling, for COPY"""
+    text = unicodedata.normalize("NFD", normalize(text))
+    return "".join(c for c in text if c.isalpha() and unicodedata.category(c) != "Mn")
+
+
+def is_subsequence(short: Tuple[str, ...], long: Tuple[str, ...]) -> bool:
+    it = iter(long)
+    return all(p in it for p in short)
+
+
+def rich_type(o1: Tuple[str, ...], o2: Tuple[str, ...]) -> Optional[str]:
+    """
+    Onset match of the stressed syllables: total (TR-S single consonant,
+    TR-CC cluster) or partial (PR-C1 first / PR-C2 last consonant shared)
+    """
+    if not o1 or not o2:
+        return None
+    if o1 == o2:
+        return "TR-S" if len(o1) == 1 else "TR-CC"
+    if o1[-1] == o2[-1]:
+        return "PR-C2"
+    if o1[0] == o2[0]:
+        return "PR-C1"
+    return None
+
+
+def could_rhyme(r1: Optional[Rhyme], r2: Optional[Rhyme]) -> bool:
+    """What every rhyming pair shares: stress position (M/F2/F3) and post-tonic vowels"""
+    return r1 is not None and r2 is not None and r1.subtype == r2.subtype and r1.vowels[1:] == r2.vowels[1:]
+
+
+def classify_rhyme_pair(w1: str, w2: str, variant: Optional[str] = None) -> Dict:
+    """
+    Classify two rhyme domains.
+    Returns {"type": NONE|COPY|PURE|RICH|IMPERFECT, "subtype": M|F2|F3,
+    "imperfect_type": IMP-V|IMP-C|IMP-0 (IMP-0F-TOPINTZI), "details": ...};
+    only "type" is present for NONE. details is the rich type for RICH,
+    the differing vowels/consonants for IMPERFECT.
+    variant "topintzi" also accepts zero alternation against an open syllable (IMP-0F).
+    """
+    if variant not in VARIANTS:
+        raise ValueError(f"Unknown variant: {variant}")
+    r1, r2 = get_rhyme(w1), get_rhyme(w2)
+    if r1 is None or r2 is None or r1.subtype != r2.subtype:
+        return {"type": "NONE"}
+
+    if r1.part == r2.part:
+        if fold(w1) == fold(w2):
+            return {"type": "COPY", "subtype": r1.subtype}
+        rich = rich_type(r1.onset, r2.onset)
+        if rich:
+            return {"type": "RICH", "subtype": r1.subtype, "details": rich}
+        return {"type": "PURE", "subtype": r1.subtype}
+
+    if r1.vowels[1:] != r2.vowels[1:]:
+        return {"type": "NONE"}
+
+    c1, c2 = r1.consonants, r2.consonants
+    if r1.vowels[0] != r2.vowels[0]:
+        if c1 != c2:
+            return {"type": "NONE"}
+        imp_type, details = "IMP-V", f"{r1.vowels[0]}-{r2.vowels[0]}"
+    else:
+        if c1 == c2:
+            return {"type": "NONE"}
+        if not c1 or not c2:
+            # Open vs closed (τυχερό / δαρτός) only rhymes under Topintzi's IMP-0F
+            if variant != "topintzi":
+                return {"type": "NONE"}
+            imp_type = "IMP-0F-TOPINTZI"
+        elif len(c1) == len(c2):
+            imp_type = "IMP-C"
+        elif is_subsequence(*sorted((c1, c2), key=len)):
+            imp_type = "IMP-0"
+        else:
+            return {"type": "NONE"}
+        details = f"{list(c1)}-{list(c2)}"
+
+    return {"type": "IMPERFECT", "subtype": r1.subtype, "imperfect_type": imp_type, "details": details}
+
+
+# === MOSAIC ===
+
+def normalize_words(w_list: List[str]) -> str:
+    """Join words, lowercase, drop apostrophes and strip accents"""
+    s = "".join(w_list).lower().replace("'", "").replace("’", "")
+    return ''.join(c for c in unicodedata.normalize('NFD', s) if unicodedata.category(c) != 'Mn')
+
+
+def line_tails(line: str, max_words: int = MAX_MOSAIC_WORDS) -> List[Dict]:
+    """
+    Candidate mosaic tails of a line: its last 1..max_words words read as one
+    prosodic word, with their rhyme domain and its Rhyme (None without a vowel).
+    Multi-word tails are only kept when fusing the words moves the rhyme domain.
+    Tails of enclitics alone ("σου" of "μπροστά σου") carry no stress and are skipped.
+    The phonetic form and normalized spelling are only needed for a matched
+    tail and are added by match_mosaic_tails (see complete_tail).
+    """
+    words = [w for w in (w.strip(TAIL_PUNCTUATION) for w in line.split()) if w]
+    tails = []
+    for k in range(1, min(max_words, len(words)) + 1):
+        tail_words = words[-k:]
+        if all(is_enclitic(w) for w in tail_words):
+            continue
+        domain = rhyme_domain("".join(tail_words))
+        if tails and domain == tails[0]['rhyme_domain']:
+            continue
+        tails.append({
+            "words": tail_words,
+            "rhyme_domain": domain,
+            "rhyme": get_rhyme(domain) if domain else None,
+        })
+    return tails
+
+
+def complete_tail(tail: Dict) -> Dict:
+    """Add the phonetic form and normalized spelling to a tail (once)"""
+    if "normalized" not in tail:
+        domain = tail["rhyme_domain"]
+        tail["rhyme_domain_phonetic"] = phonetic(domain.replace(" ", "")) if domain else ""
+        tail["normalized"] = normalize_words(tail["words"])
+    return tail
+
+
+def match_mosaic_tails(tails1: List[Dict], tails2: List[Dict], variant: Optional[str] = None) -> Dict:
+    """
+    Compare precomputed tails of two lines. A mosaic rhyme needs at least one
+    multi-word tail; shorter tails are tried first. Only pairs that pass
+    could_rhyme reach the classifier.
+    Returns the analyze_mosaic_pattern result shape; "classification" is the
+    classify_rhyme_pair result for the matched tails (subtype, type, details).
+    """
+    candidates = sorted(
+        ((t1, t2) for t1 in tails1 for t2 in tails2
+         if len(t1["words"]) + len(t2["words"]) > 2 and could_rhyme(t1["rhyme"], t2["rhyme"])),
+        key=lambda p: len(p[0]["words"]) + len(p[1]["words"])
+    )
+    for t1, t2 in candidates:
+        res = classify_rhyme_pair(t1["rhyme_domain"], t2["rhyme_domain"], variant)
+        if res['type'] != 'NONE':
+            return {"mosaic_candidate": True, "line1_rhyme": complete_tail(t1), "line2_rhyme": complete_tail(t2),
+                    "classification": res}
+    return {"mosaic_candidate": False}
+
+
+def analyze_mosaic_pattern(line1: str, line2: str, variant: Optional[str] = None) -> Dict:
+    """Mosaic rhyme across word boundaries (e.g. "μαζί της" / "ωραία ζωή της")"""
+    return match_mosaic_tails(line_tails(line1), line_tails(line2), variant)
+
+
+# === BENCHMARK / VALIDATION ===
+
+def _line_table_texts(pattern: str = "json/lines_*.json") -> List[str]:
+    import glob
+    import json
+    texts = []
+    for path in sorted(glob.glob(pattern)):
+        with open(path, "r", encoding="utf-8") as f:
+            texts.extend(row[3] for row in json.load(f)["lines"])
+    return texts
+
+
+def bench(lines: List[str], window: int = 3) -> Dict:
+    """Cold and warm lines/sec of extract_rhyme_domain, and pairs/sec of classify_rhyme_pair"""
+    import time
+    for fn in (transcribe, get_rhyme, phonetic, is_enclitic):
+        fn.cache_clear()
+
+    start = time.perf_counter()
+    domains = [extract_rhyme_domain(line)["rhyme_domain"] for line in lines]
+    cold = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for line in lines:
+        extract_rhyme_domain(line)
+    warm = time.perf_counter() - start
+
+    pairs = 0
+    start = time.perf_counter()
+    for i, d in enumerate(domains):
+        for d2 in domains[i + 1:i + 1 + window]:
+            classify_rhyme_pair(d, d2)
+            pairs += 1
+    pair_time = time.perf_counter() - start
+
+    report = {
+        "lines": len(lines),
+        "lines_per_sec_cold": round(len(lines) / cold),
+        "lines_per_sec_warm": round(len(lines) / warm),
+        "pairs": pairs,
+        "pairs_per_sec": round(pairs / pair_time),
+    }
+
+    try:
+        from g2p_greek.g2p_greek import G2P
+    except ImportError:
+        return report
+    g2p = G2P(test_mode=True, words_txt_path='dummy', lexicon_path='dummy', substitute_words_path='dummy')
+    # Same unit for both: the last word of each line, no caching
+    words = [w[-1] for w in (split_words(line, 1) for line in lines) if w]
+    transcribe.cache_clear()
+    start = time.perf_counter()
+    for w in words:
+        transcribe.__wrapped__(w)
+    report["engine_words_per_sec"] = round(len(words) / (time.perf_counter() - start))
+    start = time.perf_counter()
+    for w in words:
+        g2p.convert_test_word(w)
+    report["g2p_greek_words_per_sec"] = round(len(words) / (time.perf_counter() - start))
+    return report
+
+
+def validate(pattern: str = "json/corpus_*_enhanced*.json") -> Dict:
+    """
+    Agreement of classify_rhyme_pair with the pairs stored in the enhanced corpora.
+    The gold labels have no COPY type, so COPY results are counted apart
+    ("copies") and left out of type_agreement.
+    """
+    import glob
+    from corpus_format import load_enhanced_corpus
+
+    total = found = same_subtype = same_type = copies = 0
+    for path in sorted(glob.glob(pattern)):
+        corpus = load_enhanced_corpus(path)
+        variant = "topintzi" if "topintzi" in path else None
+        for e in corpus["entries"]:
+            gold = e["classification"].split("-")
+            if gold[-1] == "IDV":
+                gold = gold[:-1]
+            if gold[0] not in ("M", "F2", "F3") or gold[-1] == "UNKNOWN":
+                continue
+            d1, d2 = (extract_rhyme_domain(t)["rhyme_domain"] for t in e["rhyme_pair"])
+            res = classify_rhyme_pair(d1, d2, variant)
+            total += 1
+            if res["type"] == "NONE":
+                continue
+            found += 1
+            same_subtype += res["subtype"] == gold[0]
+            if res["type"] == "COPY":
+                copies += 1
+            else:
+                same_type += res["type"] == gold[-1]
+    return {
+        "pairs": total,
+        "recall": round(found / total, 4),
+        "subtype_agreement": round(same_subtype / found, 4),
+        "copies": copies,
+        "type_agreement": round(same_type / (found - copies), 4) if found > copies else 0.0,
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+    parser = argparse.ArgumentParser(description="Greek phonology engine")
+    sub = parser.add_subparsers(dest="command", required=True)
+    b = sub.add_parser("bench", help="Throughput over the line tables")
+    b.add_argument("--lines", default="json/lines_*.json")
+    v = sub.add_parser("validate", help="Agreement with the enhanced corpora")
+    v.add_argument("--corpora", default="json/corpus_*_enhanced*.json")
+    t = sub.add_parser("show", help="Transcribe words or lines")
+    t.add_argument("text", nargs="+")
+    args = parser.parse_args()
+
+    if args.command == "bench":
+        print(json.dumps(bench(_line_table_texts(args.lines)), indent=2))
+    elif args.command == "validate":
+        print(json.dumps(validate(args.corpora), indent=2))
+    else:
+        for text in args.text:
+            rd = extract_rhyme_domain(text)
+            print(f"{text}: {phonetic(text.replace(' ', ''))}  [{g2p_phonemes(text)}]  rhyme domain: {rd}")
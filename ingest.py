@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Raw text ingestion for the poet collections in raw_text/
+Streams a source file with encoding detection and NFC normalization,
+filters headers (author, collection and poem titles, section numerals,
+separators, dedications, epigraphs and their attributions, place/date
+colophons) and segments the verse into poem -> stanza -> line records.
+
+The result is a compact per-poet line table (json/lines_<Poet>.json)
+consumed by the corpus builders:
+
+    python ingest.py raw_text/TellosAgras.txt
+    python ingest.py --all
+"""
+
+import codecs
+import json
+import re
+import sys
+import unicodedata
+from itertools import chain, islice
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+RAW_DIR = Path("raw_text")
+JSON_DIR = Path("json")
+
+CHUNK_SIZE = 1 << 16
+PROBE_LINES = 400
+
+# Characters NFC leaves alone but that stand in for Greek letters in the sources
+CHAR_FIXES = str.maketrans({
+    "\u00b5": "μ",   # MICRO SIGN (NapoleonLapathiotis.txt)
+    "\ufeff": None,  # stray BOMs / zero-width no-break spaces
+    "\u200b": None,  # zero-width spaces
+})
+
+TERMINAL_PUNCTUATION = ".,;:!;·…»\"'’-–—)"
+COLLECTION_PREFIXES = ("Ποιητική συλλογή", "Συλλογή")
+ROMAN_RE = re.compile(r"^[IVXLCΙ]+\.?$")
+GREEK_NUMERAL_RE = re.compile(r"^[Α-Ω]{1,3}['΄ʹ]\.?$")
+PAGE_NUMBER_RE = re.compile(r"^\d+\.?$")
+MAX_TITLE_WORDS = 6
+# Colophons: "1923-1930", "Πάτρα. Γενάρης 1910", "᾿Αθήνα. 1918"
+YEAR_RE = re.compile(r"(?<!\d)(?:1[5-9]\d\d|20\d\d)(?!\d)")
+MAX_COLOPHON_WORDS = 4
+# Author lines: "Δ. Σολωμός", "Δ. Σολωμός («Ο Πόρφυρας»); not "Δ.Α. Πλένεις τ' αχείλι"
+ATTRIBUTION_RE = re.compile(r"^(?:[Α-ΩΆ-ΏA-Z][α-ωά-ώa-z]{0,2}\.\s*)+[Α-ΩΆ-ΏA-Z][α-ωά-ώa-z]+\s*(?:$|[(«,:])")
+# Lowercase abbreviations inside uppercase dedications: "ΣΤΟΝ ΠΟΙΗΤΗΝ κ.ΙΩ.ΠΑΝΑΓΙΩΤΟΠΟΥΛΟΝ"
+LOWER_ABBREVIATION_RE = re.compile(r"(?<![^\W\d_])[α-ωά-ώa-z]{1,2}\.")
+
+
+# === STREAMING DECODE ===
+
+def detect_encoding(head: bytes) -> str:
+    """Pick a codec from the first bytes of a file: BOM, UTF-16 without BOM, UTF-8, else Windows Greek"""
+    if head.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    if head.startswith(codecs.BOM_UTF16_LE) or head.startswith(codecs.BOM_UTF16_BE):
+        return "utf-16"
+    if head and head.count(0) > len(head) // 4:
+        return "utf-16-le" if head[1::2].count(0) > head[0::2].count(0) else "utf-16-be"
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(head, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        return "cp1253"
+
+
+def normalize_line(line: str) -> str:
+    """NFC-normalize, map stand-in characters and trim whitespace"""
+    return unicodedata.normalize("NFC", line.translate(CHAR_FIXES)).strip()
+
+
+def stream_lines(path, encoding: Optional[str] = None) -> Iterator[str]:
+    """Yield normalized lines of a file without reading it into memory"""
+    with open(path, "rb") as f:
+        head = f.read(CHUNK_SIZE)
+        encoding = encoding or detect_encoding(head)
+        decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+        pending = ""
+        chunk = head
+        while chunk:
+            pending += decoder.decode(chunk)
+            *complete, pending = re.split(r"\r\n|\r|\n", pending)
+            for line in complete:
+                yield normalize_line(line)
+            chunk = f.read(CHUNK_SIZE)
+        pending += decoder.decode(b"", final=True)
+        for line in re.split(r"\r\n|\r|\n", pending):
+            yield normalize_line(line)
+
+
+# === HEADER DETECTION ===
+
+def is_separator(text: str) -> bool:
+    return not any(c.isalnum() for c in text)
+
+
+def is_section_marker(text: str) -> bool:
+    return bool(ROMAN_RE.match(text) or GREEK_NUMERAL_RE.match(text) or PAGE_NUMBER_RE.match(text))
+
+
+def is_uppercase_title(text: str) -> bool:
+    letters = [c for c in text if c.isalpha()]
+    return len(letters) >= 2 and all(c.isupper() for c in letters)
+
+
+def is_dedication(text: str) -> bool:
+    """Uppercase but for abbreviations like "κ." (kept apart from titles so the poem keeps its title)"""
+    return bool(LOWER_ABBREVIATION_RE.search(text)) and is_uppercase_title(LOWER_ABBREVIATION_RE.sub("", text))
+
+
+def is_greek(c: str) -> bool:
+    return "Ͱ" <= c <= "Ͽ" or "ἀ" <= c <= "῿"
+
+
+def is_foreign(text: str) -> bool:
+    """Mostly non-Greek letters: a French or Latin epigraph, or its attribution"""
+    letters = [c for c in text if c.isalpha()]
+    return bool(letters) and sum(map(is_greek, letters)) < len(letters) / 2
+
+
+def is_colophon(text: str) -> bool:
+    """A short place/date line closing a poem, or a span of years"""
+    return bool(YEAR_RE.search(text)) and len(text.split()) <= MAX_COLOPHON_WORDS
+
+
+def is_isolated_title(text: str) -> bool:
+    """Short unpunctuated line standing alone between stanza breaks"""
+    return len(text.split()) <= MAX_TITLE_WORDS and text[-1] not in TERMINAL_PUNCTUATION
+
+
+def is_continuation(text: str) -> bool:
+    """A lone lowercase word carried over from a line wrapped by the page layout"""
+    return len(text.split()) == 1 and text[0].islower()
+
+
+def header_kind(text: str, isolated: bool) -> Optional[str]:
+    """Classify a non-blank line as a header ('section', 'title', 'meta') or verse (None)"""
+    if is_separator(text):
+        return "section"
+    if is_section_marker(text):
+        return "section"
+    if text.startswith(COLLECTION_PREFIXES):
+        return "meta"
+    if is_uppercase_title(text):
+        return "title"
+    if is_dedication(text) or is_colophon(text) or ATTRIBUTION_RE.match(text):
+        return "meta"
+    if isolated and is_isolated_title(text):
+        return "title"
+    # After isolated titles, which may be foreign words ("Hidalgo")
+    if is_foreign(text):
+        return "meta"
+    return None
+
+
+# === SEGMENTATION ===
+
+def detect_stanza_gap(probe: List[str]) -> int:
+    """
+    Blank lines that mark a stanza break: 1 normally, 2 for double-spaced
+    sources where every verse line is followed by a blank line.
+    """
+    followed = single = 0
+    for a, b, c in zip(probe, probe[1:], probe[2:]):
+        if a:
+            followed += 1
+            if not b and c:
+                single += 1
+    return 2 if followed and single / followed > 0.6 else 1
+
+
+def with_gaps(lines: Iterator[str]) -> Iterator[tuple]:
+    """Yield (text, blank_lines_before, blank_lines_after) for every non-blank line"""
+    prev_text, gap_before, gap = None, None, 0
+    for line in lines:
+        if not line:
+            gap += 1
+            continue
+        if prev_text is not None:
+            yield prev_text, gap_before, gap
+        prev_text, gap_before, gap = line, gap if prev_text is not None else sys.maxsize, 0
+    if prev_text is not None:
+        yield prev_text, gap_before, sys.maxsize
+
+
+def segment(lines: Iterator[str]) -> Iterator[Dict]:
+    """
+    Segment normalized lines into verse records.
+    Yields {"id", "poem", "stanza", "line", "title", "text"}; poem/stanza/line
+    are 1-based and the id ("P0003.S02.L04") is stable for a given source.
+    """
+    lines = iter(lines)
+    probe = list(islice(lines, PROBE_LINES))
+    stanza_gap = detect_stanza_gap(probe)
+
+    poem = stanza = line_no = 0
+    title = None
+    section = None
+    new_poem = True
+    pending = None
+    epigraph = False
+    for text, before, after in with_gaps(chain(probe, lines)):
+        kind = header_kind(text, before >= stanza_gap and after >= stanza_gap)
+        # An uppercase author under a foreign epigraph ("MALLARMÉ") is not the poem's title
+        if kind == "title" and epigraph and is_foreign(text):
+            kind = "meta"
+        epigraph = kind == "meta" and is_foreign(text)
+        if kind == "title":
+            title, section, new_poem = text, None, True
+            continue
+        if kind == "section":
+            if not is_separator(text):
+                section = text
+            new_poem = True
+            continue
+        if kind == "meta":
+            continue
+
+        if pending and not new_poem and before < stanza_gap and is_continuation(text):
+            pending["text"] += " " + text
+            continue
+
+        if new_poem:
+            poem += 1
+            stanza, line_no = 1, 0
+            new_poem = False
+        elif before >= stanza_gap:
+            stanza += 1
+            line_no = 0
+        line_no += 1
+
+        if pending:
+            yield pending
+        pending = {
+            "id": f"P{poem:04d}.S{stanza:02d}.L{line_no:02d}",
+            "poem": poem,
+            "stanza": stanza,
+            "line": line_no,
+            "title": f"{title} {section}" if title and section else title or section,
+            "text": text,
+        }
+    if pending:
+        yield pending
+
+
+# === LINE TABLE ===
+
+def build_line_table(source, poet: Optional[str] = None) -> Dict:
+    """
+    Ingest one source into a compact line table:
+    poems carry their title and [start, end) row range, rows are
+    [poem, stanza, line, text] so the record id is derivable (see line_id).
+    """
+    source = Path(source)
+    with open(source, "rb") as f:
+        encoding = detect_encoding(f.read(CHUNK_SIZE))
+
+    poems, rows = [], []
+    for rec in segment(stream_lines(source, encoding)):
+        if not poems or poems[-1]["poem"] != rec["poem"]:
+            if poems:
+                poems[-1]["end"] = len(rows)
+            poems.append({"poem": rec["poem"], "title": rec["title"], "start": len(rows)})
+        rows.append([rec["poem"], rec["stanza"], rec["line"], rec["text"]])
+    if poems:
+        poems[-1]["end"] = len(rows)
+
+    return {
+        "version": "line_table_v1",
+        "poet": poet or source.stem,
+        "source": str(source),
+        "encoding": encoding,
+        "total_lines": len(rows),
+        "poems": poems,
+        "lines": rows,
+    }
+
+
+def line_id(row: List) -> str:
+    poem, stanza, line = row[:3]
+    return f"P{poem:04d}.S{stanza:02d}.L{line:02d}"
+
+
+def line_table_path(poet: str) -> Path:
+    return JSON_DIR / f"lines_{poet}.json"
+
+
+def save_line_table(table: Dict, path=None) -> Path:
+    path = Path(path or line_table_path(table["poet"]))
+    with open(path, "w", encoding="utf-8") as f:
+        # One row per line keeps the file compact but diffable
+        f.write("{\n")
+        for key in ("version", "poet", "source", "encoding", "total_lines"):
+            f.write(f"  {json.dumps(key)}: {json.dumps(table[key], ensure_ascii=False)},\n")
+        f.write('  "poems": [\n')
+        f.write(",\n".join("    " + json.dumps(p, ensure_ascii=False) for p in table["poems"]))
+        f.write('\n  ],\n  "lines": [\n')
+        f.write(",\n".join("    " + json.dumps(r, ensure_ascii=False) for r in table["lines"]))
+        f.write("\n  ]\n}\n")
+    return path
+
+
+def load_line_table(poet: str, source=None, rebuild: bool = False) -> Dict:
+    """Load json/lines_<poet>.json, (re)ingesting the source when missing or stale"""
+    path = line_table_path(poet)
+    source = Path(source or RAW_DIR / f"{poet}.txt")
+    if not rebuild and path.exists() and (not source.exists() or path.stat().st_mtime >= source.stat().st_mtime):
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    table = build_line_table(source, poet)
+    save_line_table(table, path)
+    return table
+
+
+def iter_poems(table: Dict) -> Iterator[tuple]:
+    """Yield (poem, first_row_index, texts) per poem of a line table"""
+    for p in table["poems"]:
+        yield p, p["start"], [row[3] for row in table["lines"][p["start"]:p["end"]]]
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Ingest raw poet texts into line tables")
+    parser.add_argument("sources", nargs="*", help="raw_text/*.txt files")
+    parser.add_argument("--all", action="store_true", help="Ingest every file in raw_text/")
+    args = parser.parse_args()
+
+    sources = sorted(p for p in RAW_DIR.glob("*.txt") if p.name != "requirements.txt") if args.all else args.sources
+    for src in sources:
+        table = build_line_table(src)
+        path = save_line_table(table)
+        print(f"  ✓ {table['poet']}: {table['total_lines']} lines in {len(table['poems'])} poems "
+              f"({table['encoding']}) → {path}")
@@ -0,0 +1,465 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Local background jobs for corpus builds and batch analyses
+A SQLite table is the queue (no broker) and a process pool runs the jobs,
+so CPU-bound rhyme detection stays off the API event loop. Every job takes
+one worker process; queued jobs start in submission order as workers free up.
+Workers write their progress (lines processed, pairs found) to the same
+table and pick up cancellation requests from it.
+
+    store = JobStore()
+    job_id = store.submit("build_corpus", {"poets": ["TellosAgras"], "variant": "topintzi"})
+    store.get(job_id)["progress"]    # {"lines_done", "lines_total", "pairs_found", "eta_seconds"}
+
+app.py starts a JobRunner on startup; the job kinds are in JOB_KINDS.
+Any job can set "profile": "cprofile" | "sample" to profile its run; the
+output (profiling.py) is stored as an extra artifact.
+"""
+
+import asyncio
+import json
+import multiprocessing
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional
+
+JOBS_DIR = Path("jobs")
+DB_PATH = JOBS_DIR / "jobs.db"
+
+# One core is left to the API process
+MAX_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+# Seconds between queue polls (runner) and progress writes (workers)
+POLL_INTERVAL = 0.5
+PROGRESS_INTERVAL = 0.5
+
+STATUSES = ("queued", "running", "done", "failed", "cancelled")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    params TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    lines_total INTEGER,
+    lines_done INTEGER NOT NULL DEFAULT 0,
+    pairs_found INTEGER NOT NULL DEFAULT 0,
+    artifacts TEXT NOT NULL DEFAULT '[]',
+    error TEXT,
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, id);
+"""
+REQUEUE = "UPDATE jobs SET status = 'queued', started = NULL, lines_done = 0, pairs_found = 0 "
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class JobStore:
+    """The job table; safe to open from the API process and from every worker"""
+
+    def __init__(self, path=DB_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        db.row_factory = sqlite3.Row
+        try:
+            yield db
+        finally:
+            db.close()
+
+    def workdir(self, job_id: int) -> Path:
+        return self.path.parent / str(job_id)
+
+    def submit(self, kind: str, params: Dict) -> int:
+        if kind not in JOB_KINDS:
+            raise ValueError(f"Unknown job kind {kind!r} (expected one of {', '.join(JOB_KINDS)})")
+        JOB_KINDS[kind]["validate"](params)
+        from profiling import PROFILE_MODES
+        if params.get("profile") not in (None, *PROFILE_MODES):
+            raise ValueError(f"profile must be one of {', '.join(PROFILE_MODES)}")
+        with self._connect() as db:
+            cur = db.execute("INSERT INTO jobs (kind, params, created) VALUES (?, ?, ?)",
+                             (kind, json.dumps(params, ensure_ascii=False), time.time()))
+            return cur.lastrowid
+
+    def get(self, job_id: int) -> Optional[Dict]:
+        with self._connect() as db:
+            row = db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return job_view(row) if row else None
+
+    def list(self, status: Optional[str] = None, limit: int = 50) -> List[Dict]:
+        if status and status not in STATUSES:
+            raise ValueError(f"Unknown status {status!r}")
+        query, args = "SELECT * FROM jobs", ()
+        if status:
+            query, args = query + " WHERE status = ?", (status,)
+        with self._connect() as db:
+            rows = db.execute(query + " ORDER BY id DESC LIMIT ?", args + (limit,)).fetchall()
+        return [job_view(r) for r in rows]
+
+    def claim_next(self) -> Optional[Dict]:
+        """Oldest queued job, marked running"""
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            row = db.execute("SELECT * FROM jobs WHERE status = 'queued' ORDER BY id LIMIT 1").fetchone()
+            if row:
+                db.execute("UPDATE jobs SET status = 'running', started = ? WHERE id = ?", (time.time(), row["id"]))
+            db.execute("COMMIT")
+        return {"id": row["id"], "kind": row["kind"], "params": json.loads(row["params"])} if row else None
+
+    def cancel(self, job_id: int) -> Optional[str]:
+        """Queued jobs are cancelled at once, running ones at their next progress write"""
+        with self._connect() as db:
+            db.execute("UPDATE jobs SET status = 'cancelled', finished = ? WHERE id = ? AND status = 'queued'",
+                       (time.time(), job_id))
+            db.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = 'running'", (job_id,))
+            row = db.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return row["status"] if row else None
+
+    def report(self, job_id: int, lines_done: int, pairs_found: int, lines_total: Optional[int] = None) -> bool:
+        """Store progress; returns whether cancellation was requested"""
+        with self._connect() as db:
+            db.execute("UPDATE jobs SET lines_done = ?, pairs_found = ?, lines_total = COALESCE(?, lines_total) "
+                       "WHERE id = ?", (lines_done, pairs_found, lines_total, job_id))
+            row = db.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return bool(row and row["cancel_requested"])
+
+    def finish(self, job_id: int, status: str, artifacts: List[str] = (), error: Optional[str] = None):
+        with self._connect() as db:
+            db.execute("UPDATE jobs SET status = ?, artifacts = ?, error = ?, finished = ? WHERE id = ?",
+                       (status, json.dumps([str(a) for a in artifacts]), error, time.time(), job_id))
+
+    def artifact(self, job_id: int, name: str) -> Optional[Path]:
+        """Stored artifact of a job by file name"""
+        with self._connect() as db:
+            row = db.execute("SELECT artifacts FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        paths = [Path(a) for a in json.loads(row["artifacts"])] if row else []
+        return next((p for p in paths if p.name == name and p.exists()), None)
+
+    def recover(self) -> int:
+        """Requeue jobs left running by a previous server process"""
+        with self._connect() as db:
+            return db.execute(REQUEUE + "WHERE status = 'running'").rowcount
+
+    def recover_job(self, job_id: int):
+        with self._connect() as db:
+            db.execute(REQUEUE + "WHERE id = ?", (job_id,))
+
+
+def job_view(row: sqlite3.Row) -> Dict:
+    """API shape of a job row, with the ETA extrapolated from the lines done so far"""
+    done, total = row["lines_done"], row["lines_total"]
+    eta = None
+    if row["status"] == "running" and total and done:
+        eta = round((time.time() - row["started"]) * (total - done) / done, 1)
+    return {
+        "id": row["id"],
+        "kind": row["kind"],
+        "params": json.loads(row["params"]),
+        "status": row["status"],
+        "cancel_requested": bool(row["cancel_requested"]),
+        "progress": {"lines_done": done, "lines_total": total, "pairs_found": row["pairs_found"], "eta_seconds": eta},
+        "artifacts": [Path(a).name for a in json.loads(row["artifacts"])],
+        "error": row["error"],
+        "created": row["created"],
+        "started": row["started"],
+        "finished": row["finished"],
+    }
+
+
+class Progress:
+    """Worker-side counters, written to the store at most every PROGRESS_INTERVAL seconds"""
+
+    def __init__(self, store: JobStore, job_id: int):
+        self.store = store
+        self.job_id = job_id
+        self.lines_done = 0
+        self.pairs_found = 0
+        self.lines_total = None
+        self._last = 0.0
+
+    def set_total(self, lines: int):
+        self.lines_total = lines
+        self.flush()
+
+    def advance(self, lines: int = 0, pairs: int = 0):
+        self.lines_done += lines
+        self.pairs_found += pairs
+        if time.monotonic() - self._last >= PROGRESS_INTERVAL:
+            self.flush()
+
+    def flush(self):
+        self._last = time.monotonic()
+        if self.store.report(self.job_id, self.lines_done, self.pairs_found, self.lines_total):
+            raise JobCancelled()
+
+
+# === JOB KINDS ===
+
+def _poets(params: Dict) -> List[str]:
+    from ingest import RAW_DIR
+    if params.get("all"):
+        return sorted(p.stem for p in Path(RAW_DIR).glob("*.txt") if p.name != "requirements.txt")
+    return list(params.get("poets") or [])
+
+
+def _validate_detection(params: Dict):
+    from build_corpus_from_txt import VARIANTS
+    if params.get("variant") not in VARIANTS:
+        raise ValueError(f"Unknown variant {params.get('variant')!r}")
+    if params.get("mode", "window") not in ("window", "bucketed"):
+        raise ValueError("mode must be 'window' or 'bucketed'")
+
+
+def validate_build(params: Dict):
+    if not _poets(params):
+        raise ValueError("build_corpus needs 'poets' or 'all'")
+    _validate_detection(params)
+
+
+def run_build(params: Dict, progress: Progress, workdir: Path) -> List[Path]:
+    """build_corpus_from_txt for each poet; the artifacts are the corpus files it writes"""
+    from build_corpus_from_txt import build_poet_corpus, corpus_paths
+    from ingest import load_line_table
+
+    poets = _poets(params)
+    progress.set_total(sum(load_line_table(p)["total_lines"] for p in poets))
+    artifacts = []
+    for poet in poets:
+        build_poet_corpus(poet, params.get("variant"), params.get("mode", "window"),
+                          params.get("max_distance"), progress=progress)
+        artifacts.extend(corpus_paths(poet, params.get("variant")))
+    return artifacts
+
+
+def validate_analyze(params: Dict):
+    if not params.get("texts") and not _poets(params):
+        raise ValueError("analyze needs 'texts' or 'poets'")
+    _validate_detection(params)
+
+
+def _sources(params: Dict) -> List[tuple]:
+    """(name, poems as line lists) for pasted texts (poems split at blank lines) and line tables"""
+    from ingest import iter_poems, load_line_table
+
+    sources = []
+    for k, text in enumerate(params.get("texts") or []):
+        poems = [p.splitlines() for p in text.replace("\r\n", "\n").split("\n\n") if p.strip()]
+        sources.append((f"text_{k + 1}", poems))
+    for poet in _poets(params):
+        sources.append((poet, [lines for _, _, lines in iter_poems(load_line_table(poet))]))
+    return sources
+
+
+def run_analyze(params: Dict, progress: Progress, workdir: Path) -> List[Path]:
+    """
+    Local rhyme detection over pasted texts (poems separated by blank lines)
+    or whole line tables, written to <workdir>/analysis.json
+    """
+    from rhyme_detection import find_rhymes_bucketed, find_rhymes_windowed
+
+    sources = _sources(params)
+    progress.set_total(sum(len(lines) for _, poems in sources for lines in poems))
+
+    variant = params.get("variant")
+    results = []
+    for name, poems in sources:
+        pairs = []
+        for n, lines in enumerate(poems):
+            if params.get("mode") == "bucketed":
+                found = find_rhymes_bucketed(lines, max_distance=params.get("max_distance"), variant=variant)
+            else:
+                found = find_rhymes_windowed(lines, variant=variant)
+            pairs.extend({"poem": n, "lines": [i, j], "text": [lines[i], lines[j]], **res} for i, j, res in found)
+            progress.advance(lines=len(lines), pairs=len(found))
+        results.append({"source": name, "poems": len(poems), "pairs": pairs})
+
+    workdir.mkdir(parents=True, exist_ok=True)
+    path = workdir / "analysis.json"
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"params": params, "results": results}, f, ensure_ascii=False, indent=2)
+    return [path]
+
+
+def validate_batch_identify(params: Dict):
+    from prompts import IDENTIFICATION_PROMPTS
+    from provider_batch import adapter_for
+    if not params.get("texts") and not _poets(params):
+        raise ValueError("batch_identify needs 'texts' or 'poets'")
+    if params.get("prompt_strategy") not in IDENTIFICATION_PROMPTS:
+        raise ValueError(f"prompt_strategy must be one of {', '.join(IDENTIFICATION_PROMPTS)}")
+    if "base_url" in params:
+        # The adapter would send the server's provider key to a caller-chosen host
+        raise ValueError("base_url is not a job parameter; set ANTHROPIC_BASE_URL / OPENAI_BASE_URL for the worker")
+    adapter_for(params.get("model"))
+
+
+def run_batch_identify(params: Dict, progress: Progress, workdir: Path) -> List[Path]:
+    """
+    Model identification of every poem through the provider's batch API
+    (provider_batch.py), demultiplexed to <workdir>/batch_identify.json
+    """
+    from benchmark_strategies import parse_identification
+    from prompts import get_identification_prompt
+    from provider_batch import BatchRequest, adapter_for, run_batches
+
+    # custom_id must match ^[a-zA-Z0-9_-]{1,64}$ (Anthropic), so poems go by index
+    poems = {}
+    for name, ps in _sources(params):
+        for n, lines in enumerate(ps):
+            poems[f"poem-{len(poems)}"] = (name, n, lines)
+    total_lines = sum(len(lines) for _, _, lines in poems.values())
+    progress.set_total(total_lines)
+
+    # Rate-limited lanes are not involved: batches have their own provider quota
+    adapter = adapter_for(params["model"])
+    requests = [BatchRequest(poem_id, get_identification_prompt("\n".join(lines), params["prompt_strategy"]))
+                for poem_id, (_, _, lines) in poems.items()]
+
+    def on_poll(done: int, total: int):
+        progress.lines_done = round(total_lines * done / total) if total else 0
+        progress.flush()
+
+    results = run_batches(adapter, requests, params.get("poll_interval", 30.0), on_poll)
+
+    records = []
+    for poem_id, (source, n, lines) in poems.items():
+        rec = results.get(poem_id, {"error": "missing from batch results"})
+        pairs = parse_identification(rec["text"]) if "text" in rec else []
+        progress.pairs_found += len(pairs)
+        records.append({"id": poem_id, "source": source, "poem": n, "lines": lines,
+                        "result": rec.get("text"), "pairs": pairs, "error": rec.get("error"),
+                        "input_tokens": rec.get("input_tokens"), "output_tokens": rec.get("output_tokens")})
+    progress.lines_done = total_lines
+
+    workdir.mkdir(parents=True, exist_ok=True)
+    path = workdir / "batch_identify.json"
+    summary = {
+        "poems": len(records),
+        "failed": sum(1 for r in records if r["error"]),
+        "input_tokens": sum(r["input_tokens"] or 0 for r in records),
+        "output_tokens": sum(r["output_tokens"] or 0 for r in records),
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"params": params, "summary": summary, "results": records}, f, ensure_ascii=False, indent=2)
+    return [path]
+
+
+JOB_KINDS: Dict[str, Dict[str, Callable]] = {
+    "build_corpus": {"run": run_build, "validate": validate_build},
+    "analyze": {"run": run_analyze, "validate": validate_analyze},
+    "batch_identify": {"run": run_batch_identify, "validate": validate_batch_identify},
+}
+
+
+def run_job(job_id: int, kind: str, params: Dict, db_path: str):
+    """Worker process entry point"""
+    from profiling import Profiler
+
+    store = JobStore(db_path)
+    progress = Progress(store, job_id)
+    profiler = Profiler(params["profile"]) if params.get("profile") else None
+    try:
+        with profiler or nullcontext():
+            artifacts = JOB_KINDS[kind]["run"](params, progress, store.workdir(job_id))
+        if profiler:
+            artifacts = [*artifacts, profiler.save(store.workdir(job_id), "profile")]
+        progress.flush()
+    except JobCancelled:
+        store.finish(job_id, "cancelled")
+        return
+    except Exception as e:
+        store.finish(job_id, "failed", error=f"{type(e).__name__}: {e}")
+        return
+    store.finish(job_id, "done", artifacts)
+
+
+class JobRunner:
+    """Feeds queued jobs to the process pool; runs as a task on the API event loop"""
+
+    def __init__(self, store: JobStore, max_workers: int = MAX_WORKERS):
+        self.store = store
+        self.max_workers = max_workers
+        self.pool = self._new_pool()
+        self.running: Dict[int, asyncio.Future] = {}
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        # spawn: workers must not inherit the server's event loop and sockets
+        return ProcessPoolExecutor(self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+
+    async def run(self):
+        self.store.recover()
+        loop = asyncio.get_running_loop()
+        while True:
+            while len(self.running) < self.max_workers:
+                job = self.store.claim_next()
+                if job is None:
+                    break
+                try:
+                    fut = loop.run_in_executor(self.pool, run_job, job["id"], job["kind"], job["params"],
+                                               str(self.store.path))
+                except BrokenProcessPool:
+                    self.pool = self._new_pool()
+                    self.store.recover_job(job["id"])
+                    continue
+                self.running[job["id"]] = fut
+                fut.add_done_callback(lambda f, job_id=job["id"]: self._done(job_id, f))
+            await asyncio.sleep(POLL_INTERVAL)
+
+    def _done(self, job_id: int, fut: asyncio.Future):
+        self.running.pop(job_id, None)
+        if fut.cancelled() or fut.exception() is None:
+            return
+        # The worker process died before it could record the outcome; a dead
+        # worker breaks the whole pool, so the next jobs get a fresh one
+        error = fut.exception()
+        self.store.finish(job_id, "failed", error=f"{type(error).__name__}: {error}")
+        if isinstance(error, BrokenProcessPool):
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = self._new_pool()
+
+    def shutdown(self):
+        """Running jobs are requeued by recover() on the next start"""
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Inspect or run the local job queue")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list", help="Recent jobs")
+    s = sub.add_parser("submit", help="Queue a job")
+    s.add_argument("kind", choices=list(JOB_KINDS))
+    s.add_argument("params", help='JSON, e.g. \'{"poets": ["TellosAgras"]}\'')
+    sub.add_parser("work", help="Run queued jobs without the API server")
+    args = parser.parse_args()
+
+    store = JobStore()
+    if args.command == "list":
+        for job in store.list():
+            p = job["progress"]
+            print(f"{job['id']:>5} {job['kind']:<13} {job['status']:<10} "
+                  f"{p['lines_done']}/{p['lines_total']} lines, {p['pairs_found']} pairs")
+    elif args.command == "submit":
+        print(store.submit(args.kind, json.loads(args.params)))
+    else:
+        while (job := store.claim_next()) is not None:
+            run_job(job["id"], job["kind"], job["params"], str(store.path))
+            print(json.dumps(store.get(job["id"]), ensure_ascii=False))
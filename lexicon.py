@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Precomputed Greek pronunciation lexicon
+Collects the vocabulary of raw_text/ (through the line tables, see ingest.py)
+and the rhyme corpora in json/, converts it once with g2p-greek and stores
+word -> phonemes, syllables, stress index in json/lexicon.tsv:
+
+    θάλασσα\tth a1 l a0 s a0\tth a1|l a0|s a0\t0
+
+Syllables are "|"-separated groups of phonemes, the stress index is the
+0-based syllable counted from the start (-1 when g2p marks no stress).
+PhoneticAnalyzer looks words up here first. Words it has to convert live
+are appended to json/lexicon_learned.tsv (untracked, loaded on top), so
+json/lexicon.tsv only changes when it is rebuilt.
+
+    python lexicon.py build
+    python lexicon.py bench
+"""
+
+import json
+import re
+import threading
+import time
+import unicodedata
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from corpus_format import load_enhanced_corpus
+from greek_phonology import G2P_ONSETS, POLYTONIC_MARKS, syllable_bounds
+from ingest import JSON_DIR, RAW_DIR, CHAR_FIXES, load_line_table
+
+LEXICON_PATH = JSON_DIR / "lexicon.tsv"
+BATCH_SIZE = 2000
+
+WORD_RE = re.compile(r"[^\W\d_]+")
+GREEK_WORD_RE = re.compile(r"^[\u0370-\u03ff]+$")
+
+# Spellings g2p-greek gets wrong, replaced by ones it reads the same way
+# (its rule table maps stressed "αί" to an unstressed e)
+G2P_SPELLING_FIXES = (("αί", "έ"),)
+
+# Glides go with the following vowel and never block an onset
+GLIDES = ("i", "j")
+
+
+class Pronunciation(NamedTuple):
+    phonemes: str
+    syllables: Tuple[str, ...]
+    stress: int
+
+
+@lru_cache(maxsize=1 << 16)
+def normalize_word(word: str) -> str:
+    """Lexicon key: lowercase monotonic letters only, the way g2p-greek expects its input"""
+    word = unicodedata.normalize("NFD", word.translate(CHAR_FIXES).lower()).translate(POLYTONIC_MARKS)
+    return "".join(WORD_RE.findall(unicodedata.normalize("NFC", word)))
+
+
+def g2p_spelling(word: str) -> str:
+    for old, new in G2P_SPELLING_FIXES:
+        word = word.replace(old, new)
+    return word
+
+
+def is_nucleus(phone: str) -> bool:
+    return phone[-1] in "01"
+
+
+def syllabify(phonemes: str) -> Tuple[Tuple[str, ...], int]:
+    """Group g2p-greek phonemes into syllables (greek_phonology.syllable_bounds) and find the stressed one"""
+    phones = phonemes.split()
+    nuclei = [k for k, p in enumerate(phones) if is_nucleus(p)]
+    if not nuclei:
+        return (phonemes,), -1
+
+    bounds = syllable_bounds(phones, nuclei, G2P_ONSETS, GLIDES)
+    syllables = tuple(" ".join(phones[s:e]) for s, e in zip(bounds, bounds[1:]))
+    stress = next((k for k, n in enumerate(nuclei) if phones[n].endswith("1")), -1)
+    return syllables, stress
+
+
+def parse_g2p_line(line: str) -> Optional[Tuple[str, str]]:
+    """'θάλασσα th a1 l a0 s a0' -> ('θάλασσα', 'th a1 l a0 s a0')"""
+    parts = line.strip().split(" ", 1)
+    if len(parts) < 2:
+        return None
+    return parts[0], parts[1]
+
+
+def learned_path(path) -> Path:
+    """Where words added at run time go: json/lexicon.tsv -> json/lexicon_learned.tsv"""
+    path = Path(path)
+    return path.with_name(f"{path.stem}_learned{path.suffix}")
+
+
+class Lexicon:
+    """In-memory word -> Pronunciation map backed by a TSV file and its learned-words file"""
+
+    def __init__(self, path=LEXICON_PATH, load: bool = True):
+        self.path = Path(path)
+        self.learned_path = learned_path(path)
+        self.entries: Dict[str, Pronunciation] = {}
+        self._lock = threading.Lock()
+        if load:
+            self.load()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, word):
+        return normalize_word(word) in self.entries
+
+    def load(self):
+        for path in (self.path, self.learned_path):
+            if not path.exists():
+                continue
+            with open(path, "r", encoding="utf-8") as f:
+                for row in f:
+                    word, phonemes, syllables, stress = row.rstrip("\n").split("\t")
+                    self.entries[word] = Pronunciation(phonemes, tuple(syllables.split("|")), int(stress))
+
+    def get(self, word: str) -> Optional[Pronunciation]:
+        return self.entries.get(normalize_word(word))
+
+    def add(self, word: str, phonemes: str) -> Pronunciation:
+        """Store a converted word and append it to the learned-words file"""
+        key = normalize_word(word)
+        syllables, stress = syllabify(phonemes)
+        entry = Pronunciation(phonemes, syllables, stress)
+        with self._lock:
+            if key not in self.entries:
+                self.entries[key] = entry
+                with open(self.learned_path, "a", encoding="utf-8") as f:
+                    f.write(format_row(key, entry))
+        return entry
+
+    def save(self):
+        with open(self.path, "w", encoding="utf-8") as f:
+            for word in sorted(self.entries):
+                f.write(format_row(word, self.entries[word]))
+
+
+def format_row(word: str, entry: Pronunciation) -> str:
+    return f"{word}\t{entry.phonemes}\t{'|'.join(entry.syllables)}\t{entry.stress}\n"
+
+
+# === VOCABULARY ===
+
+def corpus_texts(json_dir=JSON_DIR, exclude: Iterable[str] = ()) -> Iterator[str]:
+    """Every verse line of the line tables and rhyme corpora (duplicates included)"""
+    exclude = set(exclude)
+    for source in sorted(Path(RAW_DIR).glob("*.txt")):
+        if source.name == "requirements.txt" or source.stem in exclude:
+            continue
+        for row in load_line_table(source.stem, source)["lines"]:
+            yield row[3]
+
+    for path in sorted(Path(json_dir).glob("corpus_*.json")):
+        if any(p in path.stem for p in exclude):
+            continue
+        if "_enhanced" in path.stem:
+            for e in load_enhanced_corpus(path)["entries"]:
+                yield from (t for t in e["context"] if t)
+            continue
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        for corpus in data.values():
+            for ex in corpus.get("examples", []):
+                yield from ex["lines"]
+
+
+def collect_vocabulary(texts: Iterable[str]) -> List[str]:
+    """Distinct Greek words (lexicon keys); Latin-script quotations are left out"""
+    vocab = set()
+    for text in texts:
+        vocab.update(normalize_word(w) for w in WORD_RE.findall(text))
+    return sorted(w for w in vocab if GREEK_WORD_RE.match(w))
+
+
+def convert_batch(g2p, words: List[str]) -> Dict[str, str]:
+    """One g2p-greek call for many words (convert_test_word splits on a literal '\\n')"""
+    spellings = {g2p_spelling(w): w for w in words}
+    converted = {}
+    for line in g2p.convert_test_word("\\n".join(spellings)):
+        parsed = parse_g2p_line(line)
+        if parsed and parsed[0] in spellings:
+            converted[spellings[parsed[0]]] = parsed[1]
+    return converted
+
+
+def build_lexicon(g2p, path=LEXICON_PATH, exclude: Iterable[str] = ()) -> Dict:
+    """Batch-convert the corpus vocabulary into a fresh lexicon file"""
+    vocab = collect_vocabulary(corpus_texts(exclude=exclude))
+    lexicon = Lexicon(path, load=False)
+
+    start = time.perf_counter()
+    failed = 0
+    for k in range(0, len(vocab), BATCH_SIZE):
+        batch = vocab[k:k + BATCH_SIZE]
+        converted = convert_batch(g2p, batch)
+        for word in batch:
+            if word in converted:
+                syllables, stress = syllabify(converted[word])
+                lexicon.entries[word] = Pronunciation(converted[word], syllables, stress)
+            else:
+                failed += 1
+    elapsed = time.perf_counter() - start
+    lexicon.save()
+
+    return {
+        "words": len(vocab),
+        "entries": len(lexicon),
+        "failed": failed,
+        "unstressed": sum(1 for e in lexicon.entries.values() if e.stress < 0),
+        "seconds": round(elapsed, 2),
+        "size_kb": round(Path(path).stat().st_size / 1024),
+    }
+
+
+# === BENCHMARK ===
+
+def bench(texts: List[str], lexicon_path=LEXICON_PATH) -> Dict:
+    """
+    Words per second of PhoneticAnalyzer.get_phonetic over a token stream,
+    live G2P only vs lexicon first, and the lexicon hit rate on that stream.
+    """
+    from phonology import PhoneticAnalyzer
+
+    tokens = [w for text in texts for w in WORD_RE.findall(text)]
+    report = {"tokens": len(tokens), "types": len({normalize_word(w) for w in tokens})}
+
+    live = PhoneticAnalyzer(lexicon_path=None)
+    if live.g2p:
+        sample = tokens[:20000]
+        start = time.perf_counter()
+        for w in sample:
+            live.get_phonetic(w)
+        report["live_words_per_sec"] = round(len(sample) / (time.perf_counter() - start))
+
+    analyzer = PhoneticAnalyzer(lexicon_path=lexicon_path, learn=False)
+    hits = sum(1 for w in tokens if w in analyzer.lexicon)
+    start = time.perf_counter()
+    for w in tokens:
+        analyzer.get_phonetic(w)
+    report["lexicon_words_per_sec"] = round(len(tokens) / (time.perf_counter() - start))
+    report["hit_rate"] = round(hits / len(tokens), 4) if tokens else 0.0
+    if "live_words_per_sec" in report:
+        report["speedup"] = round(report["lexicon_words_per_sec"] / report["live_words_per_sec"], 1)
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Greek pronunciation lexicon")
+    sub = parser.add_subparsers(dest="command", required=True)
+    b = sub.add_parser("build", help="Convert the corpus vocabulary into json/lexicon.tsv")
+    b.add_argument("--output", default=str(LEXICON_PATH))
+    b.add_argument("--exclude", nargs="*", default=[], help="Poets to leave out (for hit-rate tests)")
+    t = sub.add_parser("bench", help="Hit rate and words/sec of the lexicon vs live G2P")
+    t.add_argument("--lexicon", default=str(LEXICON_PATH))
+    t.add_argument("--poets", nargs="*", help="Benchmark on these poets' line tables only")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        from phonology import PhoneticAnalyzer
+        g2p = PhoneticAnalyzer(lexicon_path=None).g2p
+        if g2p is None:
+            raise SystemExit("g2p-greek is required to build the lexicon (pip install g2p-greek)")
+        stats = build_lexicon(g2p, args.output, args.exclude)
+        print(f"  ✓ {stats['entries']} of {stats['words']} words in {stats['seconds']}s "
+              f"({stats['failed']} failed, {stats['unstressed']} without stress) → {args.output} "
+              f"({stats['size_kb']} KB)")
+    else:
+        if args.poets:
+            texts = [row[3] for p in args.poets for row in load_line_table(p)["lines"]]
+        else:
+            texts = list(corpus_texts())
+        print(json.dumps(bench(texts, args.lexicon), indent=2))
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Incremental rhyme analysis of a poem being edited
+A LiveSession holds the lines of one editor session, their prepared rhyme
+domains (rhyme_detection.prepare_line) and the current window-mode rhyme
+pairs. An edit re-prepares only the lines it changes and re-classifies only
+the pairs whose window touches them, then reports the annotations that were
+added, removed or changed.
+
+Lines keep a stable id across inserts and deletes, and pairs are keyed by
+the ids of their two lines, so annotations outside the edit never move:
+
+    session = LiveSession()
+    session.reset("Πάνω στην άμμο την ξανθή\\n...")
+    session.apply([{"op": "set", "line": 3, "text": "και σβήστηκε η γραφή."}])
+    # {"added": [...], "removed": [[id1, id2]], "changed": [...], "line_ids": None}
+
+app.py serves one session per WebSocket connection at /ws/live.
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+from greek_phonology import VARIANTS
+from rhyme_detection import DEFAULT_WINDOW, MIN_LINE_LENGTH, classify_prepared, prepare_line
+
+# Editor sessions past this size should use a job (see jobs.py)
+MAX_LINES = 5000
+
+
+class LiveSession:
+    def __init__(self, window: int = DEFAULT_WINDOW, variant: Optional[str] = None):
+        if variant not in VARIANTS:
+            raise ValueError(f"Unknown variant {variant!r}")
+        self.window = window
+        self.variant = variant
+        self.ids: List[int] = []
+        self.lines: List[str] = []
+        self.prepared: List[Optional[Dict]] = []
+        self.pairs: Dict[Tuple[int, int], Dict] = {}
+        self._next_id = 0
+
+    def _new_ids(self, n: int) -> List[int]:
+        ids = list(range(self._next_id, self._next_id + n))
+        self._next_id += n
+        return ids
+
+    @staticmethod
+    def _prepare(text: str) -> Optional[Dict]:
+        return prepare_line(text) if len(text) >= MIN_LINE_LENGTH else None
+
+    def reset(self, text: str) -> Dict:
+        """Replace the whole text; returns every pair as added"""
+        lines = text.replace("\r\n", "\n").split("\n")
+        self._check_size(len(lines))
+        self.ids = self._new_ids(len(lines))
+        self.lines = lines
+        self.prepared = [self._prepare(t) for t in lines]
+        self.pairs = {}
+        self._reclassify(0, len(lines))
+        return {"added": self.annotations(self.pairs), "removed": [], "changed": [], "line_ids": self.ids}
+
+    def apply(self, edits: List[Dict]) -> Dict:
+        """
+        Apply line edits in order (indices refer to the text as left by the previous edit):
+            {"op": "set", "line": i, "text": ...}
+            {"op": "insert", "line": i, "lines": [...]}
+            {"op": "delete", "line": i, "count": n}
+        Returns the annotation diff; line_ids is only sent when lines were inserted or deleted.
+        """
+        before = dict(self.pairs)
+        touched = set()
+        moved = False
+        for edit in edits:
+            op, at = edit.get("op"), edit.get("line")
+            if not isinstance(at, int) or not 0 <= at <= len(self.lines):
+                raise ValueError(f"Line {at!r} out of range (0-{len(self.lines)})")
+            if op == "set":
+                if at == len(self.lines):
+                    raise ValueError(f"Line {at} out of range (0-{len(self.lines) - 1})")
+                self.lines[at] = edit["text"]
+                self.prepared[at] = self._prepare(edit["text"])
+                lo, hi = at, at + 1
+            elif op == "insert":
+                new = list(edit["lines"])
+                self._check_size(len(self.lines) + len(new))
+                self.ids[at:at] = self._new_ids(len(new))
+                self.lines[at:at] = new
+                self.prepared[at:at] = [self._prepare(t) for t in new]
+                lo, hi = at, at + len(new)
+                moved = True
+            elif op == "delete":
+                count = edit.get("count", 1)
+                dropped = set(self.ids[at:at + count])
+                del self.ids[at:at + count], self.lines[at:at + count], self.prepared[at:at + count]
+                for key in [k for k in self.pairs if k[0] in dropped or k[1] in dropped]:
+                    touched.add(key)
+                    del self.pairs[key]
+                lo = hi = at
+                moved = True
+            else:
+                raise ValueError(f"Unknown edit op {op!r}")
+            touched.update(self._reclassify(lo, hi))
+
+        added, removed, changed = [], [], []
+        for key in touched:
+            old, new = before.get(key), self.pairs.get(key)
+            if old is None and new is not None:
+                added.append(key)
+            elif old is not None and new is None:
+                removed.append(list(key))
+            elif old != new:
+                changed.append(key)
+        return {
+            "added": self.annotations({k: self.pairs[k] for k in sorted(added)}),
+            "removed": sorted(removed),
+            "changed": self.annotations({k: self.pairs[k] for k in sorted(changed)}),
+            "line_ids": self.ids if moved else None,
+        }
+
+    def _reclassify(self, lo: int, hi: int) -> set:
+        """
+        Redo the pairs of lines [lo, hi) and the pairs spanning that span (or the
+        gap a deletion left at lo). Every such pair lies within `window` lines
+        of the span; pairs further out keep their distance and result.
+        """
+        start, end = max(0, lo - self.window), min(len(self.lines), hi + self.window)
+        region = set(self.ids[start:end])
+        stale = [k for k in self.pairs if k[0] in region and k[1] in region]
+        for key in stale:
+            del self.pairs[key]
+
+        touched = set(stale)
+        for i in range(start, end):
+            if self.prepared[i] is None:
+                continue
+            for j in range(i + 1, min(i + 1 + self.window, end)):
+                if self.prepared[j] is None:
+                    continue
+                res = classify_prepared(self.prepared[i], self.prepared[j], self.variant)
+                if res:
+                    key = (self.ids[i], self.ids[j])
+                    self.pairs[key] = res
+                    touched.add(key)
+        return touched
+
+    def annotations(self, pairs: Dict[Tuple[int, int], Dict]) -> List[Dict]:
+        """API shape of rhyme pairs, with their current line numbers"""
+        index = {line_id: k for k, line_id in enumerate(self.ids)}
+        return [{"ids": list(key), "lines": [index[key[0]], index[key[1]]], **res} for key, res in pairs.items()]
+
+    def _check_size(self, n: int):
+        if n > MAX_LINES:
+            raise ValueError(f"Live analysis is limited to {MAX_LINES} lines; submit an analyze job instead")
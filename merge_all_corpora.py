@@ -7,6 +7,8 @@ Merge all individual poet corpora into unified files
 import json
 from pathlib import Path
 
+from corpus_format import load_enhanced_corpus
+
 # List of poets
 poets = [
     "FotosGiofyllis",
@@ -56,17 +58,18 @@ for poet in poets:
         print(f"  ⚠ Skipping {poet} - file not found")
         continue
     
-    with open(corpus_file, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    # Reads both the v1 and the normalized v2 enhanced format
+    data = load_enhanced_corpus(corpus_file)
     
     if 'entries' in data:
+        entries = list(data['entries'])
         # Add poet metadata to each entry
-        for entry in data['entries']:
+        for entry in entries:
             entry['poet'] = poet
         
-        all_enhanced_entries.extend(data['entries'])
-        poet_stats[poet] = len(data['entries'])
-        print(f"  ✓ {poet}: {len(data['entries'])} pairs")
+        all_enhanced_entries.extend(entries)
+        poet_stats[poet] = len(entries)
+        print(f"  ✓ {poet}: {len(entries)} pairs")
 
 # Save unified enhanced corpus
 unified_enhanced = {
@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Per-line meter: syllable count, stress positions and a meter label
+Each verse line is scanned once, at corpus build time, from the phonology
+engine's transcription: word-internal synizesis is already resolved there
+(ήλιος = 2 syllables), written elision (τ', σ') leaves consonant-only words
+with no syllable, and across word boundaries a final vowel meeting an
+initial vowel may merge (synaloepha, "να έρθει"). Every merge pattern is
+tried; the reading that fits a foot best wins, fewer merges first.
+
+A line fits a foot when its last stress falls on a beat and at most one
+other polysyllable is stressed off the beat (monosyllables are neutral).
+Labels are "<foot>-<syllables>", e.g. "iambic-15" (the fifteen-syllable
+political verse), "iambic-11" (hendecasyllable), "trochaic-8"; lines that
+fit no foot are "free", lines without Greek text "none". When a line has
+several equally good readings, the meter its poem uses most is taken.
+
+The scans of a poet's line table are kept in a compact array-backed index,
+json/meter_<Poet>.bin, next to the corpora: one byte each for syllables,
+merges and meter code and a 32-bit stress mask per line.
+
+    scan_line("Σε γνωρίζω από την κόψη")      # Scan(syllables=8, stresses=(3, 5, 7), merges=1, meter="trochaic-8")
+    index = meter_index("TellosAgras")
+    index.meter(120), index.counts()
+
+    python meter.py build --all
+    python meter.py stats TellosAgras
+"""
+
+import json
+import re
+import sys
+import time
+from array import array
+from collections import Counter
+from functools import lru_cache
+from itertools import combinations
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from greek_phonology import GREEK_LETTER_RE, normalize, split_words, transcribe
+from ingest import JSON_DIR, iter_poems, line_table_path, load_line_table
+
+INDEX_VERSION = 1
+# Beat positions (1-based syllables) per foot, in order of preference on ties
+FEET = {
+    "iambic": lambda p: p % 2 == 0,
+    "trochaic": lambda p: p % 2 == 1,
+    "anapestic": lambda p: p % 3 == 0,
+    "dactylic": lambda p: p % 3 == 1,
+    "amphibrach": lambda p: p % 3 == 2,
+}
+# Off-beat stresses a line may have and still fit a foot
+MAX_OFFBEAT = 1
+# Word junctions tried for synaloepha (2^n readings)
+MAX_JUNCTIONS = 6
+MAX_SYLLABLES = 32
+MAX_PAGE_SIZE = 200
+ACCENT_RE = re.compile("[άέήίόύώΐΰ]")
+
+
+class Word(NamedTuple):
+    vowels: int
+    stresses: Tuple[int, ...]    # 0-based vowel indices; empty for monosyllables
+    initial_vowel: bool
+    final_vowel: bool
+
+
+class Scan(NamedTuple):
+    syllables: int
+    stresses: Tuple[int, ...]    # 1-based syllable positions
+    merges: int                  # synaloephas in the chosen reading
+    meter: str
+
+
+@lru_cache(maxsize=1 << 16)
+def scan_word(word: str) -> Word:
+    ph = transcribe(word)
+    vowels = [k for k, v in enumerate(ph.is_vowel) if v]
+    stresses = ()
+    if len(vowels) > 1:
+        last = vowels.index(ph.stress)
+        # Enclitic accent (όνομά του): the word keeps its own stress two syllables earlier
+        stresses = (last - 2, last) if len(ACCENT_RE.findall(normalize(word))) > 1 and last >= 2 else (last,)
+    return Word(len(vowels), stresses, bool(vowels) and vowels[0] == 0,
+                bool(vowels) and vowels[-1] == len(ph.phones) - 1)
+
+
+def reading(words: List[Word], merged: frozenset) -> Tuple[int, Tuple[int, ...]]:
+    """Syllable count and stress positions with the given word junctions merged"""
+    count, stresses = 0, []
+    for k, w in enumerate(words):
+        start = count - 1 if k in merged else count
+        stresses += [start + s + 1 for s in w.stresses]
+        count = start + w.vowels
+    return count, tuple(sorted(set(stresses)))
+
+
+def fit(syllables: int, stresses: Tuple[int, ...]) -> Tuple[int, str]:
+    """(off-beat stresses, foot) of the best foot; (inf, "free") if none fits"""
+    best = (float("inf"), "free")
+    if not stresses:
+        return best
+    for foot, on_beat in FEET.items():
+        if not on_beat(stresses[-1]):
+            continue
+        offbeat = sum(1 for p in stresses[:-1] if not on_beat(p))
+        if offbeat <= MAX_OFFBEAT and offbeat < best[0]:
+            best = (offbeat, foot)
+    return best
+
+
+def line_words(line: str) -> List[Word]:
+    """Words with at least one vowel; empty for lines without Greek text"""
+    if not GREEK_LETTER_RE.search(normalize(line)):
+        return []
+    return [w for w in map(scan_word, split_words(line)) if w.vowels]
+
+
+def readings(words: List[Word]):
+    """(syllables, stresses, merges) for every synaloepha pattern, fewer merges first"""
+    junctions = [k for k in range(1, len(words)) if words[k - 1].final_vowel and words[k].initial_vowel]
+    junctions = junctions[:MAX_JUNCTIONS]
+    for n in range(len(junctions) + 1):
+        for merged in combinations(junctions, n):
+            yield (*reading(words, frozenset(merged)), n)
+
+
+def candidates(line: str) -> List[Scan]:
+    """
+    The best-fitting readings of a line (fewest off-beat stresses), fewer merges first;
+    a single "free" or "none" scan when no reading fits a foot
+    """
+    words = line_words(line)
+    if not words:
+        return [Scan(0, (), 0, "none")]
+    best, fits = float("inf"), []
+    for syllables, stresses, merges in readings(words):
+        offbeat, foot = fit(syllables, stresses)
+        if offbeat < best:
+            best, fits = offbeat, []
+        if offbeat == best and foot != "free":
+            fits.append(Scan(syllables, stresses, merges, f"{foot}-{syllables}"))
+    if not fits:
+        syllables, stresses = reading(words, frozenset())
+        return [Scan(syllables, stresses, 0, "free")]
+    return fits
+
+
+@lru_cache(maxsize=1 << 16)
+def fits_meter(line: str, label: str) -> bool:
+    """Whether some reading of the line scans as the meter ("iambic-15"), not only its best one"""
+    foot, count = meter_spec(label)
+    on_beat = FEET[foot]
+    for syllables, stresses, _ in readings(line_words(line)):
+        if (syllables == count and stresses and on_beat(stresses[-1])
+                and sum(1 for p in stresses[:-1] if not on_beat(p)) <= MAX_OFFBEAT):
+            return True
+    return False
+
+
+def choose(fits: List[Scan], common: Optional[Dict[str, int]] = None) -> Scan:
+    """The reading whose meter is most common around it (e.g. in the same poem), else the first"""
+    if not common:
+        return fits[0]
+    return max(fits, key=lambda s: common.get(s.meter, 0))
+
+
+def scan_line(line: str) -> Scan:
+    return candidates(line)[0]
+
+
+def scan_poem(lines: List[str]) -> List[Scan]:
+    """
+    Scan the lines of one poem: where a line has several equally good readings
+    ("iambic-15" with a synaloepha, "trochaic-16" without), take the meter the
+    poem's other lines use most
+    """
+    fits = [candidates(line) for line in lines]
+    common = Counter(s.meter for f in fits for s in f if s.meter not in ("free", "none"))
+    return [choose(f, common) for f in fits]
+
+
+def ending(scan: Scan) -> Optional[str]:
+    """M / F2 / F3 from the distance of the last stress to the line end"""
+    if not scan.stresses:
+        return None
+    return {0: "M", 1: "F2", 2: "F3"}.get(scan.syllables - scan.stresses[-1])
+
+
+def meter_spec(label: str) -> Optional[Tuple[str, int]]:
+    """"iambic-15" -> ("iambic", 15); None for labels that are not <foot>-<syllables>"""
+    foot, _, n = label.partition("-")
+    return (foot, int(n)) if foot in FEET and n.isdigit() else None
+
+
+# === INDEX ===
+
+class MeterIndex:
+    """Scans of one poet's line table, one array slot per line (line numbers 1-based)"""
+
+    def __init__(self, poet: str, meters: List[str], syllables: array, merges: array, codes: array,
+                 stress_masks: array):
+        self.poet = poet
+        self.meters = meters
+        self.syllables = syllables
+        self.merges = merges
+        self.codes = codes
+        self.stress_masks = stress_masks
+
+    @classmethod
+    def build(cls, poet: str, table: Dict) -> "MeterIndex":
+        """Scan a line table poem by poem (lines outside poems on their own)"""
+        scans = [None] * len(table["lines"])
+        for _, offset, lines in iter_poems(table):
+            scans[offset:offset + len(lines)] = scan_poem(lines)
+        meters: Dict[str, int] = {}
+        syllables, merges, codes, masks = array("B"), array("B"), array("B"), array("I")
+        for row, scan in zip(table["lines"], scans):
+            scan = scan or scan_line(row[3])
+            syllables.append(min(scan.syllables, 255))
+            merges.append(scan.merges)
+            codes.append(meters.setdefault(scan.meter, len(meters)))
+            masks.append(sum(1 << (p - 1) for p in scan.stresses if p <= MAX_SYLLABLES))
+        return cls(poet, list(meters), syllables, merges, codes, masks)
+
+    def __len__(self) -> int:
+        return len(self.syllables)
+
+    def meter(self, line: int) -> str:
+        return self.meters[self.codes[line - 1]]
+
+    def stresses(self, line: int) -> List[int]:
+        mask = self.stress_masks[line - 1]
+        return [p + 1 for p in range(MAX_SYLLABLES) if mask >> p & 1]
+
+    def ending(self, line: int) -> Optional[str]:
+        return ending(self.scan(line))
+
+    def scan(self, line: int) -> Scan:
+        return Scan(self.syllables[line - 1], tuple(self.stresses(line)), self.merges[line - 1], self.meter(line))
+
+    def counts(self) -> Dict[str, int]:
+        counts = [0] * len(self.meters)
+        for code in self.codes:
+            counts[code] += 1
+        return {m: c for m, c in sorted(zip(self.meters, counts), key=lambda mc: -mc[1]) if c}
+
+    # Header line (JSON), then the arrays little-endian in a fixed order
+    def save(self, path: Path):
+        arrays = [self.syllables, self.merges, self.codes, self.stress_masks]
+        header = {"version": INDEX_VERSION, "poet": self.poet, "lines": len(self), "meters": self.meters}
+        with open(path, "wb") as f:
+            f.write(json.dumps(header, ensure_ascii=False).encode("utf-8") + b"\n")
+            for a in arrays:
+                if sys.byteorder == "big":
+                    a = array(a.typecode, a)
+                    a.byteswap()
+                a.tofile(f)
+
+    @classmethod
+    def load(cls, path: Path) -> "MeterIndex":
+        with open(path, "rb") as f:
+            header = json.loads(f.readline())
+            if header["version"] != INDEX_VERSION:
+                raise ValueError(f"{path}: meter index version {header['version']}, expected {INDEX_VERSION}")
+            arrays = []
+            for typecode in ("B", "B", "B", "I"):
+                a = array(typecode)
+                a.fromfile(f, header["lines"])
+                if sys.byteorder == "big":
+                    a.byteswap()
+                arrays.append(a)
+        return cls(header["poet"], header["meters"], *arrays)
+
+
+def meter_index_path(poet: str) -> Path:
+    return JSON_DIR / f"meter_{poet}.bin"
+
+
+def meter_index_stale(poet: str) -> bool:
+    path, table = meter_index_path(poet), line_table_path(poet)
+    return not path.exists() or (table.exists() and path.stat().st_mtime < table.stat().st_mtime)
+
+
+def write_meter_index(poet: str, table: Optional[Dict] = None) -> MeterIndex:
+    """Scan every line of the poet's line table and save the index (called by the corpus build)"""
+    index = MeterIndex.build(poet, table or load_line_table(poet))
+    index.save(meter_index_path(poet))
+    return index
+
+
+# Loaded indexes and line texts by poet, with the mtime of the file they came from
+_indexes: Dict[str, Tuple[int, MeterIndex]] = {}
+_texts: Dict[str, Tuple[int, List[str]]] = {}
+
+
+def meter_index(poet: str) -> MeterIndex:
+    """
+    The saved index, reloaded when a build rewrote it and rebuilt when
+    missing or older than the line table
+    """
+    path = meter_index_path(poet)
+    if meter_index_stale(poet):
+        write_meter_index(poet)
+    mtime = path.stat().st_mtime_ns
+    if poet not in _indexes or _indexes[poet][0] != mtime:
+        _indexes[poet] = (mtime, MeterIndex.load(path))
+    return _indexes[poet][1]
+
+
+def line_texts(poet: str) -> List[str]:
+    mtime = line_table_path(poet).stat().st_mtime_ns
+    if poet not in _texts or _texts[poet][0] != mtime:
+        _texts[poet] = (mtime, [row[3] for row in load_line_table(poet)["lines"]])
+    return _texts[poet][1]
+
+
+def query(poets: List[str], meter: Optional[str] = None, syllables: Optional[int] = None,
+          ending_type: Optional[str] = None, page: int = 1, page_size: int = 50) -> Dict:
+    """
+    Lines matching every given filter, from the indexes alone (texts only for the page),
+    with counts per meter, syllable count and ending over the whole match
+    """
+    if page < 1 or not 1 <= page_size <= MAX_PAGE_SIZE:
+        raise ValueError(f"page must be >= 1 and page_size between 1 and {MAX_PAGE_SIZE}")
+    start = time.perf_counter()
+    matches, by_meter, by_syllables, by_ending = [], Counter(), Counter(), Counter()
+    for poet in poets:
+        index = meter_index(poet)
+        code = index.meters.index(meter) if meter in index.meters else None
+        if meter and code is None:
+            continue
+        for k, (n, c, mask) in enumerate(zip(index.syllables, index.codes, index.stress_masks)):
+            if (code is not None and c != code) or (syllables and n != syllables):
+                continue
+            end = {0: "M", 1: "F2", 2: "F3"}.get(n - mask.bit_length()) if mask else None
+            if ending_type and end != ending_type:
+                continue
+            matches.append((poet, k + 1))
+            by_meter[index.meters[c]] += 1
+            by_syllables[n] += 1
+            by_ending[end] += 1
+
+    lines = []
+    for poet, line in matches[(page - 1) * page_size:page * page_size]:
+        index = meter_index(poet)
+        lines.append({"poet": poet, "line": line, "text": line_texts(poet)[line - 1],
+                      "syllables": index.syllables[line - 1], "stresses": index.stresses(line),
+                      "merges": index.merges[line - 1], "meter": index.meter(line), "ending": index.ending(line)})
+    return {
+        "total": len(matches),
+        "page": page,
+        "page_size": page_size,
+        "lines": lines,
+        "aggregates": {
+            "meter": dict(by_meter.most_common()),
+            "syllables": dict(sorted(by_syllables.items())),
+            "ending": {str(k): v for k, v in by_ending.most_common()},
+        },
+        "elapsed_ms": round((time.perf_counter() - start) * 1000, 2),
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+    from records import POETS
+    parser = argparse.ArgumentParser(description="Per-line meter index")
+    sub = parser.add_subparsers(dest="command", required=True)
+    b = sub.add_parser("build", help="Scan line tables into json/meter_<Poet>.bin")
+    b.add_argument("poets", nargs="*")
+    b.add_argument("--all", action="store_true")
+    s = sub.add_parser("stats", help="Most common meters of a poet")
+    s.add_argument("poet")
+    s.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        for poet in (POETS if args.all or not args.poets else args.poets):
+            start = time.perf_counter()
+            index = write_meter_index(poet)
+            print(f"{meter_index_path(poet)}: {len(index)} lines, {len(index.meters)} meters "
+                  f"in {time.perf_counter() - start:.1f}s")
+    else:
+        index = meter_index(args.poet)
+        for m, c in list(index.counts().items())[:args.top]:
+            print(f"{m:16} {c:6} {c / len(index):6.1%}")
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Multi-poem prompt packing for identification
+The strategy templates in prompts.py are mostly fixed taxonomy text, so on
+a quatrain the poem is a small fraction of the input tokens. Packing puts
+several short poems, each under a "=== POEM <id> ===" header, into one
+prompt of the same strategy and asks for one JSON object keyed by poem id,
+each value constrained to structured.PAIRS_SCHEMA (packed_schema). A poem
+whose entry is missing or does not validate is re-run on its own. Poems
+sent alone get the same JSON output (structured.structured_prompt), so
+packed and single results and token counts compare directly.
+
+    results, stats = await identify_packed(["poem 1 ...", "poem 2 ..."], "gemini-2.5-flash", "few_shot", key)
+
+    python packing.py bench --estimate              # prompt tokens per poem, no API calls
+    python packing.py bench --model gemini-2.5-flash --samples 24
+"""
+
+import asyncio
+import json
+import time
+from typing import Dict, List, Optional, Tuple
+
+from pydantic import ValidationError
+
+from prompts import IDENTIFICATION_PROMPTS, get_identification_prompt
+from scheduler import estimate_tokens
+from structured import (EXPLANATION_LIMIT, FEATURE_CODES, FENCE_RE, MAX_OUTPUT_TOKENS, PAIR_FIELDS, PAIRS_SCHEMA,
+                        StructuredIdentification, StructuredOutputError, parse_structured, structured_prompt,
+                        valid_pairs)
+
+# Poems longer than this are always sent alone
+SHORT_POEM_LINES = 16
+# Poems and verse lines per packed prompt
+PACK_SIZE = 8
+PACK_MAX_LINES = 64
+# Output cap of a packed call: MAX_OUTPUT_TOKENS per poem, up to this
+PACK_MAX_OUTPUT_TOKENS = 8000
+
+PACKED_INSTRUCTIONS = """The input below contains {count} separate poems, each under a "=== POEM <id> ===" header.
+Analyze every poem on its own: number its lines from 1 and only pair lines of the same poem.
+
+{poems}"""
+
+# Appended after the poems, like structured.JSON_INSTRUCTIONS
+PACKED_JSON_INSTRUCTIONS = """
+OUTPUT FORMAT: answer only with one JSON object with a key per poem id ({ids}), each of the
+form {{"pairs": [...]}} with one object per rhyme pair of that poem:
+""" + PAIR_FIELDS
+
+POEM_HEADER = "=== POEM {id} ==="
+
+
+def pack(poems: List[str], size: int = PACK_SIZE, max_lines: int = PACK_MAX_LINES) -> List[List[int]]:
+    """Group poem indices into packs in input order; long poems get a pack of their own"""
+    packs, current, lines = [], [], 0
+    for k, text in enumerate(poems):
+        n = len(text.strip().splitlines())
+        if n > SHORT_POEM_LINES:
+            packs.append([k])
+            continue
+        if current and (len(current) >= size or lines + n > max_lines):
+            packs.append(current)
+            current, lines = [], 0
+        current.append(k)
+        lines += n
+    if current:
+        packs.append(current)
+    return packs
+
+
+def packed_prompt(poems: Dict[str, str], strategy: str, rag_context: str = "") -> str:
+    blocks = "\n\n".join(f"{POEM_HEADER.format(id=pid)}\n{text.strip()}" for pid, text in poems.items())
+    prompt = get_identification_prompt(PACKED_INSTRUCTIONS.format(count=len(poems), poems=blocks), strategy, rag_context)
+    return prompt + PACKED_JSON_INSTRUCTIONS.format(ids=", ".join(poems), codes=", ".join(FEATURE_CODES),
+                                                    limit=EXPLANATION_LIMIT.get(strategy, "one sentence"))
+
+
+def packed_schema(ids: List[str]) -> dict:
+    """structured.PAIRS_SCHEMA per poem, keyed by poem id"""
+    return {"type": "object", "properties": {pid: PAIRS_SCHEMA for pid in ids},
+            "required": list(ids), "additionalProperties": False}
+
+
+def parse_packed(output: str, num_lines: Dict[str, int]) -> Dict[str, Optional[List[Dict]]]:
+    """Pairs per poem id; None for ids whose entry is missing or does not match PAIRS_SCHEMA"""
+    try:
+        parsed = json.loads(FENCE_RE.sub("", output.strip()))
+    except ValueError:
+        parsed = None
+    if not isinstance(parsed, dict):
+        return {pid: None for pid in num_lines}
+    sections = {}
+    for pid, n in num_lines.items():
+        try:
+            pairs = StructuredIdentification.model_validate(parsed[pid]).pairs
+        except (KeyError, ValidationError):
+            sections[pid] = None
+            continue
+        sections[pid] = [p.model_dump() for p in valid_pairs(pairs, n)]
+    return sections
+
+
+def num_lines(text: str) -> int:
+    return len(text.strip().splitlines())
+
+
+async def identify_single(text: str, model: str, strategy: str, api_key: str,
+                          priority: str = "interactive", rag_context: str = "") -> Dict:
+    from app import call_model
+    prompt = structured_prompt(text, strategy, rag_context)
+    start = time.perf_counter()
+    result, out_tokens, cached = await call_model(model, prompt, api_key, priority,
+                                                  MAX_OUTPUT_TOKENS[strategy], PAIRS_SCHEMA)
+    res = {
+        "result": result,
+        "pairs": None,
+        "packed": False,
+        "input_tokens": estimate_tokens(prompt),
+        "output_tokens": out_tokens if out_tokens is not None else estimate_tokens(result),
+        "cached_tokens": cached or 0,
+        "latency_s": round(time.perf_counter() - start, 3),
+    }
+    try:
+        res["pairs"] = [p.model_dump() for p in parse_structured(result, num_lines(text))]
+    except StructuredOutputError as e:
+        res["error"] = str(e)
+    return res
+
+
+async def identify_pack(texts: List[str], model: str, strategy: str, api_key: str,
+                        priority: str = "interactive", rag_context: str = "") -> List[Dict]:
+    """
+    One call for a pack of poems. Input tokens are split as an equal share of the
+    template plus each poem's own text, output tokens and latency by the length of
+    each poem's JSON; cached tokens (all template prefix) equally.
+    Poems whose entry does not come back valid are re-run with identify_single.
+    """
+    from app import call_model
+    if len(texts) == 1:
+        return [await identify_single(texts[0], model, strategy, api_key, priority, rag_context)]
+
+    poems = {f"P{k + 1}": t for k, t in enumerate(texts)}
+    prompt = packed_prompt(poems, strategy, rag_context)
+    max_tokens = min(MAX_OUTPUT_TOKENS[strategy] * len(poems), PACK_MAX_OUTPUT_TOKENS)
+    start = time.perf_counter()
+    output, out_tokens, cached = await call_model(model, prompt, api_key, priority, max_tokens,
+                                                  packed_schema(list(poems)))
+    latency = time.perf_counter() - start
+    out_tokens = out_tokens if out_tokens is not None else estimate_tokens(output)
+
+    sections = parse_packed(output, {pid: num_lines(t) for pid, t in poems.items()})
+    texts_out = {pid: json.dumps({"pairs": pairs}, ensure_ascii=False)
+                 for pid, pairs in sections.items() if pairs is not None}
+    own = {pid: estimate_tokens(t) for pid, t in poems.items()}
+    shared = (estimate_tokens(prompt) - sum(own.values())) / len(poems)
+    parsed_chars = sum(len(t) for t in texts_out.values()) or 1
+
+    results = []
+    fallback = []
+    for k, (pid, pairs) in enumerate(sections.items()):
+        if pairs is None:
+            fallback.append(k)
+            results.append(None)
+            continue
+        share = len(texts_out[pid]) / parsed_chars
+        results.append({
+            "result": texts_out[pid],
+            "pairs": pairs,
+            "packed": True,
+            "input_tokens": round(shared + own[pid]),
+            "output_tokens": round(out_tokens * share),
+            "cached_tokens": round((cached or 0) / len(poems)),
+            "latency_s": round(latency * share, 3),
+        })
+
+    singles = await asyncio.gather(*(identify_single(texts[k], model, strategy, api_key, priority, rag_context)
+                                     for k in fallback))
+    for k, res in zip(fallback, singles):
+        res["fallback"] = True
+        results[k] = res
+    return results
+
+
+async def identify_packed(texts: List[str], model: str, strategy: str, api_key: str,
+                          priority: str = "interactive", rag_context: str = "") -> Tuple[List[Dict], Dict]:
+    """Identify many poems with packed prompts; per-poem results in input order and totals"""
+    packs = pack(texts)
+    per_pack = await asyncio.gather(*(identify_pack([texts[k] for k in p], model, strategy, api_key,
+                                                    priority, rag_context) for p in packs))
+    results = [None] * len(texts)
+    for p, res in zip(packs, per_pack):
+        for k, r in zip(p, res):
+            results[k] = r
+    stats = {
+        "poems": len(texts),
+        "calls": len(packs) + sum(1 for r in results if r.get("fallback")),
+        "fallbacks": sum(1 for r in results if r.get("fallback")),
+        "input_tokens": sum(r["input_tokens"] for r in results),
+        "output_tokens": sum(r["output_tokens"] for r in results),
+        "cached_tokens": sum(r["cached_tokens"] for r in results),
+    }
+    return results, stats
+
+
+# === BENCHMARK ===
+
+def sample_poems(n: int, seed: int = 13) -> List[str]:
+    """Short poems (<= SHORT_POEM_LINES lines) from the line tables"""
+    import glob
+    import random
+    poems = []
+    for path in sorted(glob.glob("json/lines_*.json")):
+        with open(path, "r", encoding="utf-8") as f:
+            table = json.load(f)
+        for p in table["poems"]:
+            lines = [row[3] for row in table["lines"][p["start"]:p["end"]]]
+            if 2 <= len(lines) <= SHORT_POEM_LINES:
+                poems.append("\n".join(lines))
+    random.Random(seed).shuffle(poems)
+    return poems[:n]
+
+
+def estimate_report(poems: List[str], strategy: str) -> Dict:
+    """Input tokens per poem from prompt sizes alone"""
+    single = sum(estimate_tokens(structured_prompt(t, strategy)) for t in poems)
+    packed = sum(estimate_tokens(packed_prompt({f"P{k + 1}": poems[i] for k, i in enumerate(p)}, strategy))
+                 if len(p) > 1 else estimate_tokens(structured_prompt(poems[p[0]], strategy))
+                 for p in pack(poems))
+    return {
+        "strategy": strategy,
+        "poems": len(poems),
+        "calls": {"unpacked": len(poems), "packed": len(pack(poems))},
+        "input_tokens_per_poem": {"unpacked": round(single / len(poems)), "packed": round(packed / len(poems))},
+        "saving": round(1 - packed / single, 3),
+    }
+
+
+async def live_report(poems: List[str], model: str, strategy: str, api_key: str) -> Dict:
+    def per_poem(results, wall):
+        n = len(results)
+        return {
+            "input_tokens": round(sum(r["input_tokens"] for r in results) / n),
+            "output_tokens": round(sum(r["output_tokens"] for r in results) / n),
+            "latency_s": round(sum(r["latency_s"] for r in results) / n, 3),
+            "wall_s": round(wall, 2),
+            "invalid_json": sum(1 for r in results if r["pairs"] is None),
+        }
+
+    start = time.perf_counter()
+    single = [await identify_single(t, model, strategy, api_key, "batch") for t in poems]
+    single_wall = time.perf_counter() - start
+    start = time.perf_counter()
+    packed, stats = await identify_packed(poems, model, strategy, api_key, "batch")
+    packed_wall = time.perf_counter() - start
+    return {
+        "model": model,
+        "strategy": strategy,
+        "poems": len(poems),
+        "unpacked": per_poem(single, single_wall),
+        "packed": {**per_poem(packed, packed_wall), "calls": stats["calls"], "fallbacks": stats["fallbacks"]},
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Packed vs single-poem identification")
+    sub = parser.add_subparsers(dest="command", required=True)
+    b = sub.add_parser("bench", help="Tokens and latency per poem, packed vs unpacked")
+    b.add_argument("--model", default="gemini-2.5-flash")
+    b.add_argument("--strategy", default="few_shot")
+    b.add_argument("--samples", type=int, default=24)
+    b.add_argument("--estimate", action="store_true", help="Prompt token estimate only, no API calls")
+    args = parser.parse_args()
+
+    poems = sample_poems(args.samples)
+    if args.estimate:
+        print(json.dumps([estimate_report(poems, s) for s in IDENTIFICATION_PROMPTS], indent=2))
+    else:
+        from benchmark_strategies import api_key_for
+        print(json.dumps(asyncio.run(live_report(poems, args.model, args.strategy, api_key_for(args.model))), indent=2))
@@ -0,0 +1,86 @@
+import logging
+
+try:
+    from g2p_greek.g2p_greek import G2P
+except ImportError:
+    G2P = None
+
+from greek_phonology import g2p_phonemes
+from lexicon import LEXICON_PATH, Lexicon, g2p_spelling
+
+logger = logging.getLogger(__name__)
+
+
+class PhoneticAnalyzer:
+    def __init__(self, lexicon_path=LEXICON_PATH, learn: bool = True):
+        """
+        lexicon_path: precomputed pronunciations (see lexicon.py), None for live G2P only
+        learn: append words converted live to the lexicon's learned-words file
+        """
+        self.lexicon = Lexicon(lexicon_path) if lexicon_path else None
+        self.learn = learn
+        if G2P:
+            # test_mode skips the output checks; the paths are never read
+            self.g2p = G2P(
+                test_mode=True,
+                words_txt_path='dummy',
+                lexicon_path='dummy',
+                substitute_words_path='dummy'
+            )
+        else:
+            # Unseen words go through greek_phonology's rule tables instead
+            self.g2p = None
+
+    def get_phonetic(self, text: str) -> str:
+        """
+        Phonemes of a word ("θάλασσα" -> "th a1 l a0 s a0").
+        Lexicon first; unseen words go through g2p-greek and are added to it.
+        Without g2p-greek, or when it fails on a word (logged), the built-in
+        engine converts them (not learned). Falls back to the text itself when
+        neither can convert it.
+        """
+        if self.lexicon is not None:
+            entry = self.lexicon.get(text)
+            if entry:
+                return entry.phonemes
+
+        if not self.g2p:
+            return g2p_phonemes(text) or text
+
+        try:
+            # Returns a list like ['θάλασσα th a1 l a0 s a0\n']
+            results = self.g2p.convert_test_word(g2p_spelling(text))
+            if results and isinstance(results, list) and len(results) > 0:
+                raw_line = results[0].strip()
+                # Format is "word phonemes..."
+                parts = raw_line.split(' ', 1)
+                if len(parts) > 1:
+                    if self.lexicon is not None and self.learn:
+                        self.lexicon.add(text, parts[1])
+                    return parts[1]
+                return raw_line
+            return str(results)
+        except Exception:
+            logger.warning("g2p-greek failed on %r, using the built-in engine", text, exc_info=True)
+            return g2p_phonemes(text) or text
+
+    def extract_rime(self, word: str) -> str:
+        """
+        Extract the rime (stressed vowel + following segments).
+        This is a simplified heuristic based on the G2P output.
+        """
+        phonetic = self.get_phonetic(word)
+        # For now, return the full phonetic string as the "rime" for comparison
+        # In a real system, we'd parse syllables and stress markers
+        return phonetic
+
+    def are_rhyming(self, word1: str, word2: str) -> bool:
+        """
+        Check if two words rhyme based on their phonetic ending.
+        """
+        p1 = self.get_phonetic(word1)
+        p2 = self.get_phonetic(word2)
+
+        # Compare the last 3 characters of the phonetic string as a heuristic
+        # This is a placeholder for more complex logic
+        return p1[-3:] == p2[-3:] if len(p1) >= 3 and len(p2) >= 3 else p1 == p2
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Request timings and on-demand profiling
+Timings: every HTTP request gets a Timings object (a context variable set by
+the app middleware). Code marks stages with `with span("rag"):`, and the
+provider call is split into queue / connect / tls / upstream / download
+through an httpx trace hook. The middleware sends the spans as a
+Server-Timing header; /identify and /generate also return them in
+`timings` when the request sets include_timings.
+
+Profiling: POST /admin/profile arms a ProfileSession for the next N
+requests under a path, or submits a corpus build job with "profile" set
+(jobs.py). Two modes:
+    cprofile  deterministic cProfile, written as <name>.prof (snakeviz, flameprof)
+    sample    stack sampling of the profiled thread, written as <name>.folded,
+              collapsed stacks for flamegraph.pl or speedscope
+Output goes to PROFILE_DIR (jobs write into their own workdir).
+"""
+
+import cProfile
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Dict, List, Optional
+
+PROFILE_DIR = Path("profiles")
+PROFILE_MODES = ("cprofile", "sample")
+# Seconds between stack samples in sample mode
+SAMPLE_INTERVAL = 0.005
+# Largest number of requests one /admin/profile call may arm
+MAX_PROFILED_REQUESTS = 100
+
+
+# === TIMINGS ===
+
+class Timings:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.spans: Dict[str, float] = {}
+
+    def add(self, name: str, ms: float):
+        """Repeated stages (e.g. two model calls) add up"""
+        self.spans[name] = self.spans.get(name, 0.0) + ms
+
+    def as_dict(self) -> Dict[str, float]:
+        return {name: round(ms, 2) for name, ms in self.spans.items()}
+
+    def header(self) -> str:
+        """Server-Timing value, stages in the order they first ran, then the total"""
+        total = (time.perf_counter() - self.start) * 1000
+        return ", ".join(f"{name};dur={ms:.1f}" for name, ms in [*self.spans.items(), ("total", total)])
+
+
+current_timings: ContextVar[Optional[Timings]] = ContextVar("current_timings", default=None)
+
+
+@contextmanager
+def span(name: str):
+    """Time a stage of the current request; a no-op outside requests (jobs, CLI)"""
+    timings = current_timings.get()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if timings is not None:
+            timings.add(name, (time.perf_counter() - start) * 1000)
+
+
+# httpcore trace events -> stage; "upstream" runs from sending the request to the response headers
+TRACE_STAGES = {
+    "connection.connect_tcp": "connect",
+    "connection.start_tls": "tls",
+    "http11.receive_response_body": "download",
+    "http2.receive_response_body": "download",
+}
+
+
+def http_trace():
+    """httpx trace extension recording the connection and upstream stages: extensions={"trace": http_trace()}"""
+    timings = current_timings.get()
+    started = {}
+
+    async def trace(event: str, info: dict):
+        if timings is None:
+            return
+        stem, _, phase = event.rpartition(".")
+        if stem.endswith(".send_request_headers") and phase == "started":
+            started["upstream"] = time.perf_counter()
+        elif stem.endswith(".receive_response_headers") and phase == "complete" and "upstream" in started:
+            timings.add("upstream", (time.perf_counter() - started.pop("upstream")) * 1000)
+        elif stem in TRACE_STAGES and phase == "started":
+            started[stem] = time.perf_counter()
+        elif stem in TRACE_STAGES and phase in ("complete", "failed") and stem in started:
+            timings.add(TRACE_STAGES[stem], (time.perf_counter() - started.pop(stem)) * 1000)
+
+    return trace
+
+
+# === PROFILERS ===
+
+class StackSampler:
+    """Samples one thread's Python stack every `interval` seconds from a helper thread"""
+
+    def __init__(self, thread_id: Optional[int] = None, interval: float = SAMPLE_INTERVAL):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def enable(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def disable(self):
+        self._stop.set()
+        self._thread.join()
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class Profiler:
+    """cProfile or stack sampling around a block of work; save() writes the output file"""
+
+    def __init__(self, mode: str):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode {mode!r} (expected one of {', '.join(PROFILE_MODES)})")
+        self.mode = mode
+        self.impl = cProfile.Profile() if mode == "cprofile" else StackSampler()
+
+    def __enter__(self):
+        self.impl.enable()
+        return self
+
+    def __exit__(self, *exc):
+        self.impl.disable()
+
+    def save(self, directory: Path, name: str) -> Path:
+        directory.mkdir(parents=True, exist_ok=True)
+        if self.mode == "cprofile":
+            path = directory / f"{name}.prof"
+            self.impl.dump_stats(path)
+        else:
+            path = directory / f"{name}.folded"
+            path.write_text(self.impl.folded(), encoding="utf-8")
+        return path
+
+
+class ProfileSession:
+    """
+    Profiles the next `count` requests whose path starts with `path`. The
+    profilers see the whole event loop thread, so concurrent requests show
+    up in each other's profiles; one request is profiled at a time.
+    """
+
+    def __init__(self):
+        self.mode: Optional[str] = None
+        self.path = ""
+        self.remaining = 0
+        self.written: List[str] = []
+        self._active = False
+
+    def arm(self, mode: str, count: int, path: str = "/"):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode {mode!r} (expected one of {', '.join(PROFILE_MODES)})")
+        if not 1 <= count <= MAX_PROFILED_REQUESTS:
+            raise ValueError(f"requests must be between 1 and {MAX_PROFILED_REQUESTS}")
+        self.mode, self.remaining, self.path = mode, count, path
+
+    def claim(self, path: str) -> Optional[Profiler]:
+        """A profiler for this request, or None"""
+        if self.remaining <= 0 or self._active or not path.startswith(self.path):
+            return None
+        self.remaining -= 1
+        self._active = True
+        return Profiler(self.mode)
+
+    def release(self, profiler: Profiler, path: str):
+        self._active = False
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{path.strip('/').replace('/', '_') or 'root'}-{len(self.written) + 1}"
+        self.written.append(profiler.save(PROFILE_DIR, name).name)
+
+    def status(self) -> Dict:
+        return {"mode": self.mode, "path": self.path, "remaining": self.remaining, "written": self.written}
@@ -50,9 +50,7 @@ For each rhyme pair, provide:
 - Rhyme domain in phonetic transcription
 - Classification (e.g., M-TR-S-IDV, F2-MOS-IDV-2W, F3-IMP-V-PR-C1)
 - Brief explanation
-
 {rag_context}
-
 POEM TO ANALYZE:
 {text}
 """
@@ -89,10 +87,9 @@ Then: Check special features
 
 COMPARISON WINDOW: Default 4 lines, but scan entire stanza for patterns
 
+Apply this algorithmic method step-by-step to identify all rhymes in the poem below.
 {rag_context}
-
-Apply this algorithmic method step-by-step to identify all rhymes in:
-
+POEM:
 {text}
 """
 
@@ -162,15 +159,13 @@ Reasoning:
 
 ═══════════════════════════════════════════════════
 
-{rag_context}
-
-Now analyze the following Greek poem using the same systematic approach. For each rhyme pair:
+Now analyze the Greek poem below using the same systematic approach. For each rhyme pair:
 1. Identify line numbers
 2. Show phonetic transcription
 3. Determine position classification (M/F2/F3)
 4. Check for all features (RICH, IDV, MOS, IMP, COPY)
 5. Provide final classification code
-
+{rag_context}
 POEM:
 {text}
 """
@@ -210,10 +205,9 @@ Check each feature systematically:
 - Format: POSITION-FEATURE1-FEATURE2-...
 - Example: M-TR-S-IDV or F2-MOS-IDV-2W-IMP-C
 
+Now analyze the poem below, showing explicit reasoning for each rhyme.
 {rag_context}
-
-Now analyze this poem, showing explicit reasoning for each rhyme:
-
+POEM:
 {text}
 """
 
@@ -323,20 +317,13 @@ Step 5 - Feature Analysis:
 
 ═══════════════════════════════════════════════════
 
+Now analyze the poem below using the same detailed five-step reasoning. Show your work for each rhyme pair.
 {rag_context}
-
-Now analyze the following poem using the same detailed five-step reasoning. Show your work for each rhyme pair:
-
+POEM:
 {text}
 """
 
-GENERATION_PROMPT_TEMPLATE = """Generate Greek poetry lines with specific rhyme patterns.
-
-TARGET SPECIFICATIONS:
-- Rhyme type: {rhyme_type}
-- Features: {features}
-- Theme: {theme}
-- Number of lines: {num_lines}
+GENERATION_PROMPT_TEMPLATE = """Generate Greek poetry lines with specific rhyme patterns. The target specifications are given at the end.
 
 GENERATION CONSTRAINTS:
 
@@ -378,8 +365,6 @@ GENERATION CONSTRAINTS:
    - Avoid forced or awkward phrasing for rhyme
    - For MOSAIC: Use natural two-word combinations at line end
 
-{rag_context}
-
 IMPORTANT FOR MOSAIC RHYMES:
 If MOS is requested, you MUST create rhymes that span word boundaries. Examples:
 - "στο χέρι μου" [sto XÉ-ri mu] ~ "φέρε μου" [FÉ-re mu] (rhyme: "έ-ρι μου" / "έ-ρε μου")
@@ -387,32 +372,60 @@ If MOS is requested, you MUST create rhymes that span word boundaries. Examples:
 - "δίνει φως μου" [Dí-ni fos mu] ~ "κι είναι δικό σου" [ki Í-ne di-KÓ su] (rhyme crosses words)
 
 Generate the poem with phonetic annotations showing the rhyme pattern.
+{rag_context}
+TARGET SPECIFICATIONS:
+- Rhyme type: {rhyme_type}
+- Features: {features}
+- Theme: {theme}
+- Number of lines: {num_lines}
 """
 
+IDENTIFICATION_PROMPTS = {
+    "zero_shot_structured": ZERO_SHOT_STRUCTURED,
+    "zero_shot_algorithm": ZERO_SHOT_ALGORITHM,
+    "few_shot": FEW_SHOT,
+    "zero_shot_cot": ZERO_SHOT_COT,
+    "few_shot_cot": FEW_SHOT_COT
+}
+
+# Everything before {rag_context} is fixed per template, so providers can cache it
+# across calls: the RAG examples and the poem (or generation target) come last
+CACHEABLE_PREFIXES = [template.split("{rag_context}")[0]
+                      for template in [*IDENTIFICATION_PROMPTS.values(), GENERATION_PROMPT_TEMPLATE]]
+
+def split_cacheable(prompt: str) -> tuple[str, str]:
+    """(static prefix, rest) of a prompt built from these templates; ("", prompt) otherwise"""
+    for prefix in CACHEABLE_PREFIXES:
+        if prompt.startswith(prefix):
+            return prefix, prompt[len(prefix):]
+    return "", prompt
+
 def get_identification_prompt(text: str, strategy: str, rag_context: str = "") -> str:
     """Get prompt for rhyme identification"""
-    prompts = {
-        "zero_shot_structured": ZERO_SHOT_STRUCTURED,
-        "zero_shot_algorithm": ZERO_SHOT_ALGORITHM,
-        "few_shot": FEW_SHOT,
-        "zero_shot_cot": ZERO_SHOT_COT,
-        "few_shot_cot": FEW_SHOT_COT
-    }
-    
-    rag_section = f"\n\nRELEVANT EXAMPLES FROM CORPUS:\n{rag_context}\n" if rag_context else ""
+    rag_section = f"\nRELEVANT EXAMPLES FROM CORPUS:\n{rag_context}\n" if rag_context else ""
     
-    return prompts[strategy].format(text=text, rag_context=rag_section)
+    return IDENTIFICATION_PROMPTS[strategy].format(text=text, rag_context=rag_section)
 
 def get_generation_prompt(theme: str, rhyme_type: str, features: list, 
-                         num_lines: int, rag_context: str = "") -> str:
-    """Get prompt for rhyme generation"""
+                         num_lines: int, rag_context: str = "", meter: str = None, style: str = None) -> str:
+    """
+    Get prompt for rhyme generation; meter is a meter.py label such as "iambic-15",
+    style a poet's fingerprint summary (style.describe)
+    """
     features_str = ", ".join(features) if features else "pure"
-    rag_section = f"\n\nEXAMPLES FROM CORPUS WITH SIMILAR PATTERNS:\n{rag_context}\n" if rag_context else ""
+    rag_section = f"\nEXAMPLES FROM CORPUS WITH SIMILAR PATTERNS:\n{rag_context}\n" if rag_context else ""
     
-    return GENERATION_PROMPT_TEMPLATE.format(
+    prompt = GENERATION_PROMPT_TEMPLATE.format(
         rhyme_type=rhyme_type,
         features=features_str,
         theme=theme,
         num_lines=num_lines,
         rag_context=rag_section
-    )
\ No newline at end of file
+    )
+    if meter:
+        foot, syllables = meter.split("-")
+        prompt += (f"- Meter: {foot}, {syllables} syllables per line (count synizesis and elision "
+                   f"as pronounced; the last stress of the line falls on a {foot} beat)\n")
+    if style:
+        prompt += f"- Style: write in the manner of {style}\n"
+    return prompt
\ No newline at end of file
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Provider batch APIs for bulk identification
+Identification prompts for many poems go to the provider as one batch
+submission: Anthropic Message Batches, or the OpenAI Batch API (a JSONL
+file upload). The batch is polled until it ends and the results are matched
+back to the poems by custom_id. Batches are billed at a discount and use
+their own quota, so nightly corpus annotation stays out of the interactive
+lanes (see scheduler.py).
+
+Runs as the "batch_identify" job kind (jobs.py). ANTHROPIC_BASE_URL /
+OPENAI_BASE_URL point the adapters at another server, such as the local
+stand-in in batch_standin.py. The server is never taken from job params:
+the adapters send the provider key to it.
+
+    python batch_standin.py 8070 &
+    export OPENAI_BASE_URL=http://localhost:8070 OPENAI_API_KEY=standin
+    python jobs.py submit batch_identify '{"model": "gpt-4o", "prompt_strategy": "few_shot",
+        "poets": ["TellosAgras"]}'
+    python jobs.py work
+"""
+
+import io
+import json
+import os
+import time
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional
+
+import httpx
+
+# Largest batch sent in one submission; bigger runs are split
+MAX_BATCH_REQUESTS = 10000
+MAX_TOKENS = 4000
+POLL_INTERVAL = 30.0
+TIMEOUT = 120.0
+
+
+class BatchRequest(NamedTuple):
+    custom_id: str
+    prompt: str
+
+
+def base_url_of(endpoint: str) -> str:
+    """'https://api.openai.com/v1/chat/completions' -> 'https://api.openai.com'"""
+    scheme, _, rest = endpoint.partition("://")
+    return f"{scheme}://{rest.split('/', 1)[0]}"
+
+
+class AnthropicBatch:
+    """POST /v1/messages/batches, poll until processing_status is "ended", read results_url"""
+
+    def __init__(self, model_name: str, api_key: str, base_url: str):
+        self.model_name = model_name
+        self.client = httpx.Client(base_url=base_url, timeout=TIMEOUT, headers={
+            "x-api-key": api_key,
+            "anthropic-version": "2023-06-01",
+            "content-type": "application/json",
+        })
+
+    def submit(self, requests: List[BatchRequest]) -> str:
+        from app import anthropic_content
+        body = {"requests": [{
+            "custom_id": r.custom_id,
+            "params": {
+                "model": self.model_name,
+                "max_tokens": MAX_TOKENS,
+                "messages": [{"role": "user", "content": anthropic_content(r.prompt)}],
+            },
+        } for r in requests]}
+        response = self.client.post("/v1/messages/batches", json=body)
+        response.raise_for_status()
+        return response.json()["id"]
+
+    def poll(self, batch_id: str) -> Dict:
+        """{"ended": bool, "done": n, "total": n}"""
+        response = self.client.get(f"/v1/messages/batches/{batch_id}")
+        response.raise_for_status()
+        batch = response.json()
+        counts = batch["request_counts"]
+        total = sum(counts.values())
+        return {"ended": batch["processing_status"] == "ended", "done": total - counts["processing"], "total": total}
+
+    def results(self, batch_id: str) -> Iterator[Dict]:
+        response = self.client.get(f"/v1/messages/batches/{batch_id}")
+        response.raise_for_status()
+        results = self.client.get(response.json()["results_url"])
+        results.raise_for_status()
+        for line in results.text.splitlines():
+            if not line.strip():
+                continue
+            rec = json.loads(line)
+            result = rec["result"]
+            if result["type"] != "succeeded":
+                yield {"custom_id": rec["custom_id"], "error": result.get("error", {}).get("message", result["type"])}
+                continue
+            message = result["message"]
+            yield {
+                "custom_id": rec["custom_id"],
+                "text": message["content"][0]["text"],
+                "input_tokens": message["usage"]["input_tokens"],
+                "output_tokens": message["usage"]["output_tokens"],
+            }
+
+    def cancel(self, batch_id: str):
+        self.client.post(f"/v1/messages/batches/{batch_id}/cancel")
+
+
+class OpenAIBatch:
+    """Upload a JSONL file (purpose=batch), POST /v1/batches, read output_file_id when completed"""
+
+    FINAL = ("completed", "failed", "expired", "cancelled")
+
+    def __init__(self, model_name: str, api_key: str, base_url: str):
+        self.model_name = model_name
+        self.client = httpx.Client(base_url=base_url, timeout=TIMEOUT,
+                                   headers={"Authorization": f"Bearer {api_key}"})
+
+    def submit(self, requests: List[BatchRequest]) -> str:
+        lines = (json.dumps({
+            "custom_id": r.custom_id,
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": {
+                "model": self.model_name,
+                "messages": [{"role": "user", "content": r.prompt}],
+                "max_tokens": MAX_TOKENS,
+            },
+        }, ensure_ascii=False) for r in requests)
+        upload = self.client.post("/v1/files", data={"purpose": "batch"}, files={
+            "file": ("batch.jsonl", io.BytesIO("\n".join(lines).encode("utf-8")), "application/jsonl")
+        })
+        upload.raise_for_status()
+        response = self.client.post("/v1/batches", json={
+            "input_file_id": upload.json()["id"],
+            "endpoint": "/v1/chat/completions",
+            "completion_window": "24h",
+        })
+        response.raise_for_status()
+        return response.json()["id"]
+
+    def poll(self, batch_id: str) -> Dict:
+        response = self.client.get(f"/v1/batches/{batch_id}")
+        response.raise_for_status()
+        batch = response.json()
+        counts = batch.get("request_counts") or {}
+        return {
+            "ended": batch["status"] in self.FINAL,
+            "done": counts.get("completed", 0) + counts.get("failed", 0),
+            "total": counts.get("total", 0),
+        }
+
+    def results(self, batch_id: str) -> Iterator[Dict]:
+        response = self.client.get(f"/v1/batches/{batch_id}")
+        response.raise_for_status()
+        batch = response.json()
+        for file_key in ("output_file_id", "error_file_id"):
+            if not batch.get(file_key):
+                continue
+            content = self.client.get(f"/v1/files/{batch[file_key]}/content")
+            content.raise_for_status()
+            for line in content.text.splitlines():
+                if not line.strip():
+                    continue
+                rec = json.loads(line)
+                reply = rec.get("response") or {}
+                if rec.get("error") or reply.get("status_code") != 200:
+                    error = rec.get("error") or reply.get("body", {}).get("error") or {}
+                    yield {"custom_id": rec["custom_id"], "error": error.get("message", "request failed")}
+                    continue
+                body = reply["body"]
+                yield {
+                    "custom_id": rec["custom_id"],
+                    "text": body["choices"][0]["message"]["content"],
+                    "input_tokens": body["usage"]["prompt_tokens"],
+                    "output_tokens": body["usage"]["completion_tokens"],
+                }
+
+    def cancel(self, batch_id: str):
+        self.client.post(f"/v1/batches/{batch_id}/cancel")
+
+
+ADAPTERS = {"anthropic": AnthropicBatch, "openai": OpenAIBatch}
+BASE_URL_ENV = {"anthropic": "ANTHROPIC_BASE_URL", "openai": "OPENAI_BASE_URL"}
+KEY_ENV = {"anthropic": "ANTHROPIC_API_KEY", "openai": "OPENAI_API_KEY"}
+
+
+def batch_models() -> List[str]:
+    from app import MODEL_CONFIGS
+    return [m for m, c in MODEL_CONFIGS.items() if c["provider"] in ADAPTERS]
+
+
+def adapter_for(model: str, api_key: Optional[str] = None):
+    """
+    Batch adapter for a MODEL_CONFIGS entry; the key defaults to the provider's env variable.
+    The server comes from BASE_URL_ENV or the model's endpoint only, so the key goes nowhere else.
+    """
+    from app import MODEL_CONFIGS
+    if model not in MODEL_CONFIGS:
+        raise ValueError(f"Model {model} not supported")
+    config = MODEL_CONFIGS[model]
+    provider = config["provider"]
+    if provider not in ADAPTERS:
+        raise ValueError(f"{provider} has no batch API (batch models: {', '.join(batch_models())})")
+    base_url = os.getenv(BASE_URL_ENV[provider]) or base_url_of(config["endpoint"])
+    api_key = api_key or config.get("key") or os.getenv(KEY_ENV[provider], "")
+    if not api_key:
+        raise ValueError(f"No API key for {provider} batches (set {KEY_ENV[provider]})")
+    return ADAPTERS[provider](config.get("model_name", model), api_key, base_url)
+
+
+def run_batches(adapter, requests: List[BatchRequest], poll_interval: float = POLL_INTERVAL,
+                on_poll: Optional[Callable[[int, int], None]] = None) -> Dict[str, Dict]:
+    """
+    Submit the requests (split at MAX_BATCH_REQUESTS), wait for every batch to end
+    and return the results by custom_id. on_poll(done, total) is called after each
+    poll; an exception from it cancels the open batches and propagates.
+    """
+    batch_ids = [adapter.submit(requests[k:k + MAX_BATCH_REQUESTS])
+                 for k in range(0, len(requests), MAX_BATCH_REQUESTS)]
+    open_ids = set(batch_ids)
+    done_by_batch = {}
+    try:
+        while True:
+            for batch_id in list(open_ids):
+                state = adapter.poll(batch_id)
+                done_by_batch[batch_id] = state["done"]
+                if state["ended"]:
+                    open_ids.discard(batch_id)
+            if on_poll:
+                on_poll(sum(done_by_batch.values()), len(requests))
+            if not open_ids:
+                break
+            time.sleep(poll_interval)
+    except BaseException:
+        for batch_id in open_ids:
+            adapter.cancel(batch_id)
+        raise
+
+    results = {}
+    for batch_id in batch_ids:
+        for rec in adapter.results(batch_id):
+            results[rec["custom_id"]] = rec
+    return results
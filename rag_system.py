@@ -1,11 +1,21 @@
 """
 RAG System for Greek Rhyme Examples
 Retrieves relevant examples from Greek Rhyme corpus
+Curated examples come first; generation examples are topped up from the
+built poet corpora, held as compact records (records.py), optionally
+leaving out lines the poets repeat (COPY annotations, repetition.py) or
+keeping only lines in a requested meter (meter.py)
 """
+import asyncio
 import json
-from typing import List, Dict
+from typing import List, Dict, FrozenSet, Tuple
 import re
 
+from meter import meter_index
+from records import corpus_records, record_stats
+from repetition import copied_lines
+from style import fingerprints, neighbours, typicality
+
 # Sample rhyme corpus (in production, this would be loaded from database/vector store)
 RHYME_CORPUS = {
     "solomos_imnos": {
@@ -171,9 +181,13 @@ async def get_relevant_examples(query_text: str, top_k: int = 3) -> str:
     return formatted
 
 async def get_generation_examples(rhyme_type: str, features: List[str], 
-                                 theme: str, top_k: int = 2) -> str:
+                                 theme: str, top_k: int = 2, exclude_copies: bool = False,
+                                 meter: str = None, poet: str = None) -> str:
     """
     Retrieve examples for generation task based on desired rhyme pattern
+    exclude_copies: skip corpus pairs with a line that recurs elsewhere (refrains, reused lines)
+    meter: only corpus pairs whose lines both scan in this meter ("iambic-15"), per the meter index
+    poet: style-matched corpus pairs (style_matched_records) come first, curated examples fill up
     """
     relevant_examples = []
     
@@ -198,7 +212,25 @@ async def get_generation_examples(rhyme_type: str, features: List[str],
                 })
     
     relevant_examples.sort(key=lambda x: x["score"], reverse=True)
-    top_examples = relevant_examples[:top_k]
+    
+    # Curated examples with the full pattern first, then corpus pairs with exactly
+    # the requested pattern, then partial curated matches; for a poet, the style-matched
+    # pairs go first. The first call loads the poet corpora off the event loop; the
+    # statistics below use them too.
+    full_score = 5 + 3 * len(features)
+    top_examples = [] if poet else [x for x in relevant_examples if x["score"] >= full_score][:top_k]
+    records = await asyncio.to_thread(corpus_records)
+    exclude = await asyncio.to_thread(copied_lines) if exclude_copies else frozenset()
+    if meter:
+        records = await asyncio.to_thread(in_meter, records, meter)
+    if poet:
+        picked = await asyncio.to_thread(style_matched_records, records, poet, rhyme_type, features, top_k, exclude)
+    else:
+        picked = matching_records(records, rhyme_type, features, top_k - len(top_examples), exclude)
+    for record in picked:
+        top_examples.append({"example": record.to_dict(), "poet": record.poet, "poem": None, "score": 0})
+    rest = relevant_examples if poet else [x for x in relevant_examples if x["score"] < full_score]
+    top_examples += rest[:top_k - len(top_examples)]
     
     if not top_examples:
         return format_generic_generation_examples(rhyme_type, features)
@@ -213,15 +245,71 @@ async def get_generation_examples(rhyme_type: str, features: List[str],
     
     # Add relevant statistics
     formatted += "\nRELEVANT CORPUS STATISTICS:\n"
-    for corpus_key, corpus_data in RHYME_CORPUS.items():
-        if any(e["poet"] == corpus_data["poet"] for e in top_examples):
-            formatted += f"\n{corpus_data['poet']} ({corpus_data['poem']}):\n"
-            for stat_key, stat_val in corpus_data["stats"].items():
+    poets = {item["poet"] for item in top_examples}
+    for poet, stats in get_corpus_stats().items():
+        if poet in poets:
+            source = next((c["poem"] for c in RHYME_CORPUS.values() if c["poet"] == poet), "corpus")
+            formatted += f"\n{poet} ({source}):\n"
+            for stat_key, stat_val in stats.items():
                 if rhyme_type.lower() in stat_key.lower() or any(f.lower() in stat_key.lower() for f in features):
                     formatted += f"  - {stat_key}: {stat_val}%\n"
     
     return formatted
 
+def pattern_records(records, rhyme_type: str, features: List[str],
+                    exclude: FrozenSet[Tuple[str, int]] = frozenset()) -> Dict[str, List]:
+    """
+    Corpus pairs with the stress type and all requested features, by poet;
+    pairs with a line in exclude ((poet, line number), e.g. repetition.copied_lines()) are skipped
+    """
+    wanted = {rhyme_type, *features} - {"PURE"}
+    by_poet = {}
+    for record in records:
+        if (record.poet, record.line1) in exclude or (record.poet, record.line2) in exclude:
+            continue
+        tags = record.tags
+        if wanted <= tags and ("PURE" not in features or "PURE" in tags):
+            by_poet.setdefault(record.poet, []).append(record)
+    return by_poet
+
+def matching_records(records, rhyme_type: str, features: List[str], k: int,
+                     exclude: FrozenSet[Tuple[str, int]] = frozenset()) -> List:
+    """Up to k pattern_records, one per poet in turn"""
+    by_poet = pattern_records(records, rhyme_type, features, exclude)
+    picked = []
+    for depth in range(k):
+        for poet_records in by_poet.values():
+            if len(picked) < k and depth < len(poet_records):
+                picked.append(poet_records[depth])
+    return picked
+
+def style_matched_records(records, poet: str, rhyme_type: str, features: List[str], k: int,
+                          exclude: FrozenSet[Tuple[str, int]] = frozenset()) -> List:
+    """
+    Up to k pattern_records in the style of poet (a records.POETS id): the poet's own
+    pairs, then those of the poets with the nearest fingerprints, each poet's pairs
+    most typical of the requested poet's fingerprint first (see style.py)
+    """
+    by_poet = pattern_records(records, rhyme_type, features, exclude)
+    fp = fingerprints()[poet]
+    picked = []
+    for name in [poet, *neighbours(poet)]:
+        if len(picked) >= k:
+            break
+        index = meter_index(name)
+        ranked = sorted(by_poet.get(name, []), key=lambda r: -typicality(r, fp, index))
+        picked += ranked[:k - len(picked)]
+    return picked
+
+def in_meter(records, meter: str) -> List:
+    """Records whose two lines have this meter label in their poet's meter index"""
+    indexes = {}
+    for record in records:
+        if record.poet not in indexes:
+            indexes[record.poet] = meter_index(record.poet)
+    return [r for r in records
+            if indexes[r.poet].meter(r.line1) == meter and indexes[r.poet].meter(r.line2) == meter]
+
 def format_generic_examples() -> str:
     """Return generic examples when no specific match found"""
     return """GENERAL RHYME EXAMPLES:
@@ -267,4 +355,13 @@ def get_corpus_stats(poet: str = None, rhyme_type: str = None) -> Dict:
         
         stats[corpus_data["poet"]] = corpus_data["stats"]
     
+    # Percentages of pairs (not lines) computed from the poet corpora
+    by_poet = {}
+    for record in corpus_records():
+        if poet and poet.lower() not in record.poet.lower():
+            continue
+        by_poet.setdefault(record.poet, []).append(record)
+    for name, records in by_poet.items():
+        stats[name] = record_stats(records)["percent"]
+    
     return stats
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Compact in-memory rhyme pair records
+The regular corpora (json/corpus_<Poet>[_topintzi].json) hold one dict per
+pair with the same keys, tags and detail strings repeated thousands of
+times. RhymeRecord keeps a pair in slots: the stress and rhyme types as
+enums, the IMP/RICH detail parsed into a shared tuple (or rich type)
+instead of its stringified list, and every text field interned, so a line
+that takes part in several pairs is stored once.
+
+classification, features and to_dict() rebuild the on-disk shape exactly:
+
+    records = load_records("TellosAgras", "topintzi")
+    records[0].stress, records[0].rhyme_type, records[0].detail   # Stress.F2, RhymeType.IMPERFECT, (('n',), ('s',))
+    record_stats(records)["percent"]["pure_F2"]
+
+    python records.py measure        # resident memory, dicts vs records, every poet and variant
+"""
+
+import ast
+import json
+import sys
+import time
+import tracemalloc
+from enum import Enum
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple, Union
+
+from build_corpus_from_txt import VARIANTS, corpus_paths
+
+# The six poets of the published corpora (raw_text also has a utf8 copy of Papanikolaou)
+POETS = ["FotosGiofyllis", "KostasOuranis", "MitsosPapanikolaou", "NapoleonLapathiotis",
+         "RomosFiliras", "TellosAgras"]
+
+
+class Stress(str, Enum):
+    M = "M"
+    F2 = "F2"
+    F3 = "F3"
+
+
+class RhymeType(str, Enum):
+    PURE = "PURE"
+    RICH = "RICH"
+    IMPERFECT = "IMPERFECT"
+    COPY = "COPY"
+    MOSAIC = "MOSAIC"
+    UNKNOWN = "UNKNOWN"
+
+
+class ImpType(str, Enum):
+    V = "IMP-V"
+    C = "IMP-C"
+    ZERO = "IMP-0"
+    ZERO_FINAL = "IMP-0F-TOPINTZI"
+
+
+# IMP-V: (vowel1, vowel2); IMP-C / IMP-0: (codas1, codas2); RICH: rich type ("TR-S", ...)
+Detail = Union[Tuple[str, str], Tuple[Tuple[str, ...], Tuple[str, ...]], str]
+
+# Parsed details by their string form, so equal details share one object
+_details: Dict[str, Detail] = {}
+
+
+def parse_detail(text: str, imp_type: Optional[ImpType]) -> Detail:
+    if text in _details:
+        return _details[text]
+    if imp_type is None:
+        detail = sys.intern(text)
+    elif imp_type is ImpType.V:
+        a, _, b = text.partition("-")
+        detail = (sys.intern(a), sys.intern(b))
+    else:
+        # "['n', 's']-['n']" as written by greek_phonology.classify_rhyme_pair
+        left, _, right = text.partition("]-[")
+        detail = tuple(tuple(sys.intern(c) for c in ast.literal_eval(side))
+                       for side in (left + "]", "[" + right))
+    _details[text] = detail
+    return detail
+
+
+def format_detail(detail: Detail, imp_type: Optional[ImpType]) -> str:
+    if imp_type is None:
+        return detail
+    if imp_type is ImpType.V:
+        return f"{detail[0]}-{detail[1]}"
+    return f"{list(detail[0])}-{list(detail[1])}"
+
+
+class RhymeRecord:
+    """One rhyme pair; line numbers are 1-based as in the corpus files"""
+
+    __slots__ = ("poet", "line1", "line2", "text1", "text2", "phonetic1", "phonetic2",
+                 "stress", "rhyme_type", "imp_type", "detail", "idv", "tail_type")
+
+    def __init__(self, poet: str, line_numbers, lines, phonetic, stress: Stress, rhyme_type: RhymeType,
+                 imp_type: Optional[ImpType] = None, detail: Optional[Detail] = None, idv: bool = False,
+                 tail_type: Optional[RhymeType] = None):
+        self.poet = sys.intern(poet)
+        self.line1, self.line2 = line_numbers
+        self.text1, self.text2 = sys.intern(lines[0]), sys.intern(lines[1])
+        self.phonetic1, self.phonetic2 = sys.intern(phonetic[0]), sys.intern(phonetic[1])
+        self.stress = stress
+        self.rhyme_type = rhyme_type
+        self.imp_type = imp_type
+        self.detail = detail
+        self.idv = idv
+        # MOSAIC only: how the matched tails rhyme (PURE, RICH, IMPERFECT, COPY)
+        self.tail_type = tail_type
+
+    @classmethod
+    def from_dict(cls, poet: str, ex: Dict) -> "RhymeRecord":
+        """Parse a corpus example; raises ValueError for shapes it cannot rebuild exactly"""
+        features = ex["features"]
+        mosaic = ex["classification"] == "MOSAIC"
+        # A mosaic's features are "MOS" and then the matched tails' features
+        rest = list(features[1:] if mosaic else features)
+        imp_type = ImpType(rest.pop(0)) if rest[0].startswith("IMP") else None
+        stress, rhyme_type = Stress(rest[0]), RhymeType(rest[1])
+        rest = rest[2:]
+        idv = bool(rest) and rest[-1] == "IDV"
+        if idv:
+            rest.pop()
+        detail = parse_detail(rest.pop(), imp_type) if rest else None
+        if rest:
+            raise ValueError(f"Unexpected features {features}")
+        tail_type = None
+        if mosaic:
+            rhyme_type, tail_type = RhymeType.MOSAIC, rhyme_type
+        record = cls(poet, ex["line_numbers"], ex["lines"], ex["phonetic"], stress, rhyme_type,
+                     imp_type, detail, idv, tail_type)
+        if record.classification != ex["classification"] or record.features != features:
+            raise ValueError(f"Cannot represent {ex['classification']} {features}")
+        return record
+
+    @property
+    def line_numbers(self) -> List[int]:
+        return [self.line1, self.line2]
+
+    @property
+    def lines(self) -> List[str]:
+        return [self.text1, self.text2]
+
+    @property
+    def phonetic(self) -> List[str]:
+        return [self.phonetic1, self.phonetic2]
+
+    @property
+    def classification(self) -> str:
+        if self.rhyme_type is RhymeType.MOSAIC:
+            return "MOSAIC"
+        parts = [self.stress.value]
+        if self.imp_type:
+            parts.append(self.imp_type.value)
+        parts.append(self.rhyme_type.value)
+        if self.idv:
+            parts.append("IDV")
+        return "-".join(parts)
+
+    @property
+    def features(self) -> List[str]:
+        features = ["MOS"] if self.rhyme_type is RhymeType.MOSAIC else []
+        if self.imp_type:
+            features.append(self.imp_type.value)
+        features += [self.stress.value, (self.tail_type or self.rhyme_type).value]
+        if self.detail is not None:
+            features.append(format_detail(self.detail, self.imp_type))
+        if self.idv:
+            features.append("IDV")
+        return features
+
+    @property
+    def tags(self) -> set:
+        """Taxonomy tags for matching (stress, type, IMP subtype, rich type, IDV, MOS)"""
+        tags = {self.stress.value, self.rhyme_type.value}
+        if self.rhyme_type is RhymeType.MOSAIC:
+            tags.update(("MOS", self.tail_type.value))
+        if self.imp_type:
+            tags.update(("IMP", self.imp_type.value))
+        if RhymeType.RICH in (self.rhyme_type, self.tail_type) and isinstance(self.detail, str):
+            tags.add(self.detail)
+        if self.idv:
+            tags.add("IDV")
+        return tags
+
+    def to_dict(self) -> Dict:
+        return {
+            "lines": self.lines,
+            "line_numbers": self.line_numbers,
+            "classification": self.classification,
+            "phonetic": self.phonetic,
+            "features": self.features,
+        }
+
+
+def records_from_corpus(data: Dict, poet: str) -> List[RhymeRecord]:
+    """
+    Records of a loaded regular corpus file ({name: {"examples": [...]}}) of poet,
+    a POETS id; the file's own key may differ (MitsosPapanikolaou_utf8)
+    """
+    return [RhymeRecord.from_dict(poet, ex) for corpus in data.values() for ex in corpus["examples"]]
+
+
+def load_records(poet: str, variant: Optional[str] = None) -> List[RhymeRecord]:
+    with open(corpus_paths(poet, variant)[0], "r", encoding="utf-8") as f:
+        return records_from_corpus(json.load(f), poet)
+
+
+@lru_cache(maxsize=None)
+def corpus_records(variant: Optional[str] = None) -> Tuple[RhymeRecord, ...]:
+    """Every poet's records for a variant, loaded once per process"""
+    return tuple(r for poet in POETS if corpus_paths(poet, variant)[0].exists()
+                 for r in load_records(poet, variant))
+
+
+def record_stats(records) -> Dict:
+    """Pair counts and percentages by stress, rhyme type, IMP subtype and IDV"""
+    counts = {}
+    for r in records:
+        keys = [f"{r.rhyme_type.value.lower()}_{r.stress.value}", r.rhyme_type.value.lower()]
+        if r.imp_type:
+            keys.append(r.imp_type.value)
+        if r.idv:
+            keys.append("idv")
+        for k in keys:
+            counts[k] = counts.get(k, 0) + 1
+    total = len(records)
+    return {
+        "pairs": total,
+        "counts": counts,
+        "percent": {k: round(100 * v / total, 2) for k, v in counts.items()} if total else {},
+    }
+
+
+# === MEASUREMENT ===
+
+def measure(poet: str, variant: Optional[str]) -> Dict:
+    """Retained memory of one corpus as loaded dicts vs records (records parsed from the same file)"""
+    path = corpus_paths(poet, variant)[0]
+    with open(path, "r", encoding="utf-8") as f:
+        raw = f.read()
+
+    tracemalloc.start()
+    data = json.loads(raw)
+    dict_bytes, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    _details.clear()
+    tracemalloc.start()
+    start = time.perf_counter()
+    records = records_from_corpus(json.loads(raw), poet)
+    elapsed = time.perf_counter() - start
+    record_bytes, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    assert [r.to_dict() for r in records] == [ex for c in data.values() for ex in c["examples"]], \
+        f"{path.name}: round trip mismatch"
+    return {"file": path.name, "pairs": len(records), "dicts_kb": round(dict_bytes / 1024),
+            "records_kb": round(record_bytes / 1024), "load_ms": round(elapsed * 1000, 1)}
+
+
+def measure_all() -> Dict:
+    """Every poet in every variant held at once; interning also shares lines across variants"""
+    raws = [(poet, corpus_paths(poet, variant)[0].read_text(encoding="utf-8"))
+            for variant in VARIANTS for poet in POETS]
+
+    tracemalloc.start()
+    data = [json.loads(raw) for _, raw in raws]
+    dict_bytes, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del data
+
+    _details.clear()
+    tracemalloc.start()
+    records = [records_from_corpus(json.loads(raw), poet) for poet, raw in raws]
+    record_bytes, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"files": len(raws), "pairs": sum(len(r) for r in records),
+            "dicts_kb": round(dict_bytes / 1024), "records_kb": round(record_bytes / 1024)}
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Compact rhyme pair records")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("measure", help="Resident memory of the corpora as dicts vs records")
+    args = parser.parse_args()
+
+    print(f"{'file':42} {'pairs':>6} {'dicts KB':>9} {'records KB':>11} {'saved':>6} {'load ms':>8}")
+    totals = [0, 0]
+    for variant in VARIANTS:
+        for poet in POETS:
+            m = measure(poet, variant)
+            totals[0] += m["dicts_kb"]
+            totals[1] += m["records_kb"]
+            print(f"{m['file']:42} {m['pairs']:>6} {m['dicts_kb']:>9} {m['records_kb']:>11} "
+                  f"{1 - m['records_kb'] / m['dicts_kb']:>6.0%} {m['load_ms']:>8}")
+    print(f"{'sum of files':42} {'':>6} {totals[0]:>9} {totals[1]:>11} {1 - totals[1] / totals[0]:>6.0%}")
+    m = measure_all()
+    print(f"{'all files loaded together':42} {m['pairs']:>6} {m['dicts_kb']:>9} {m['records_kb']:>11} "
+          f"{1 - m['records_kb'] / m['dicts_kb']:>6.0%}")
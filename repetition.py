@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Corpus-wide COPY (repetition) detection with MinHash LSH
+The builders only see pairs inside a poem's window, so refrains and lines a
+poet reuses across poems are never annotated. Here every line of a poet
+(or of all six poets) is folded like the search index (search.fold_text),
+cut into character shingles and summarised by a MinHash signature. LSH
+banding puts lines whose signatures agree on a whole band in the same
+bucket; only those candidate pairs are compared, by exact Jaccard
+similarity of their shingle sets, so the cost grows with the number of
+lines and repeats instead of with every pair of lines.
+
+Each pair at or above COPY_THRESHOLD is a COPY annotation; runs of
+consecutive copied lines are reported as passages (repeated stanzas and
+multi-line refrains), and copies of the same line are grouped.
+
+    report = find_copies(["TellosAgras"])
+    report["examples"][0]      # {"lines", "line_numbers", "poets", "classification": "COPY", ...}
+    copied_lines()             # {(poet, line number)} for filtering RAG examples
+
+    python repetition.py find TellosAgras      # -> json/copies_TellosAgras.json
+    python repetition.py find --all            # -> json/copies_all.json, across poets
+"""
+
+import hashlib
+import json
+import struct
+import time
+from collections import defaultdict
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+from ingest import JSON_DIR, line_table_path, load_line_table
+from records import POETS
+from search import fold_text
+
+SHINGLE_SIZE = 4
+# Folded lines shorter than this (interjections, "—", single words) are not indexed
+MIN_CHARS = 12
+# 64 hash functions in 16 bands of 4: a pair at Jaccard 0.7 becomes a candidate with p ~ 0.99
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+COPY_THRESHOLD = 0.7
+
+_HASH_FORMAT = f"<{NUM_PERM}I"
+
+
+def shingles(text: str) -> FrozenSet[str]:
+    folded = f" {fold_text(text)} "
+    if len(folded) - 2 < MIN_CHARS:
+        return frozenset()
+    return frozenset(folded[k:k + SHINGLE_SIZE] for k in range(len(folded) - SHINGLE_SIZE + 1))
+
+
+def minhash(shingle_set: FrozenSet[str]) -> Tuple[int, ...]:
+    """
+    NUM_PERM minimum hash values; the k-th hash function is the k-th 32-bit
+    word of the shingle's SHAKE-128 output, so one digest feeds all of them
+    """
+    rows = (struct.unpack(_HASH_FORMAT, hashlib.shake_128(s.encode("utf-8")).digest(4 * NUM_PERM))
+            for s in shingle_set)
+    return tuple(map(min, zip(*rows)))
+
+
+def jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    return len(a & b) / len(a | b)
+
+
+def candidate_pairs(signatures: Dict[int, Tuple[int, ...]]) -> set:
+    """Line id pairs (i < j) sharing at least one LSH band"""
+    candidates = set()
+    for band in range(BANDS):
+        buckets = defaultdict(list)
+        lo = band * ROWS
+        for line_id, sig in signatures.items():
+            buckets[sig[lo:lo + ROWS]].append(line_id)
+        for ids in buckets.values():
+            for x in range(len(ids)):
+                for y in range(x + 1, len(ids)):
+                    candidates.add((ids[x], ids[y]))
+    return candidates
+
+
+def find_copies(poets: List[str], threshold: float = COPY_THRESHOLD) -> Dict:
+    """COPY annotations, passages and line groups over the given poets' line tables"""
+    start = time.perf_counter()
+    lines: List[Tuple[str, int, str]] = []
+    for poet in poets:
+        table = load_line_table(poet)
+        lines += [(poet, k, row[3]) for k, row in enumerate(table["lines"])]
+
+    sets = {}
+    signatures = {}
+    for line_id, (_, _, text) in enumerate(lines):
+        s = shingles(text)
+        if s:
+            sets[line_id] = s
+            signatures[line_id] = minhash(s)
+
+    candidates = candidate_pairs(signatures)
+    pairs = {}
+    for i, j in candidates:
+        similarity = jaccard(sets[i], sets[j])
+        if similarity >= threshold:
+            pairs[(i, j)] = similarity
+
+    def annotation(i: int, j: int) -> Dict:
+        (p1, k1, t1), (p2, k2, t2) = lines[i], lines[j]
+        return {
+            "lines": [t1, t2],
+            "line_numbers": [k1 + 1, k2 + 1],
+            "poets": [p1, p2],
+            "classification": "COPY",
+            "features": ["COPY"],
+            "similarity": round(pairs[(i, j)], 3),
+        }
+
+    # Runs (i, j), (i+1, j+1), ... of the same poets' lines
+    passages = []
+    for i, j in sorted(pairs):
+        if (i - 1, j - 1) in pairs and lines[i - 1][0] == lines[i][0] and lines[j - 1][0] == lines[j][0]:
+            continue
+        length = 1
+        while ((i + length, j + length) in pairs and lines[i + length][0] == lines[i][0]
+               and lines[j + length][0] == lines[j][0]):
+            length += 1
+        if length > 1:
+            passages.append({
+                "poets": [lines[i][0], lines[j][0]],
+                "line_numbers": [lines[i][1] + 1, lines[j][1] + 1],
+                "length": length,
+                "lines": [lines[i + k][2] for k in range(length)],
+            })
+
+    # Connected copies of one line (a refrain used n times is one group of n)
+    parent = {}
+
+    def root(x: int) -> int:
+        parent.setdefault(x, x)
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for i, j in pairs:
+        parent[root(i)] = root(j)
+    groups = defaultdict(list)
+    for line_id in parent:
+        groups[root(line_id)].append(line_id)
+
+    n = len(signatures)
+    return {
+        "poets": poets,
+        "params": {"shingle_size": SHINGLE_SIZE, "num_perm": NUM_PERM, "bands": BANDS, "threshold": threshold},
+        "lines_indexed": n,
+        "candidate_pairs": len(candidates),
+        "all_pairs": n * (n - 1) // 2,
+        "total_copies": len(pairs),
+        "elapsed_s": round(time.perf_counter() - start, 2),
+        "examples": [annotation(i, j) for i, j in sorted(pairs)],
+        "passages": sorted(passages, key=lambda p: -p["length"]),
+        "groups": sorted(([{"poet": lines[k][0], "line": lines[k][1] + 1, "text": lines[k][2]}
+                           for k in sorted(ids)] for ids in groups.values()), key=len, reverse=True),
+    }
+
+
+# === ANNOTATION FILES ===
+
+def copies_path(poet: Optional[str] = None):
+    """json/copies_<Poet>.json, or json/copies_all.json across all poets"""
+    return JSON_DIR / f"copies_{poet or 'all'}.json"
+
+
+def write_copies(poet: Optional[str] = None) -> Dict:
+    report = find_copies([poet] if poet else POETS)
+    with open(copies_path(poet), "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    return report
+
+
+def load_copies(poet: Optional[str] = None) -> Dict:
+    """The annotation file, recomputed (in memory) when missing or older than a line table"""
+    path = copies_path(poet)
+    tables = [line_table_path(p) for p in ([poet] if poet else POETS)]
+    if path.exists() and all(path.stat().st_mtime >= t.stat().st_mtime for t in tables if t.exists()):
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return find_copies([poet] if poet else POETS)
+
+
+@lru_cache(maxsize=None)
+def copied_lines(poet: Optional[str] = None) -> FrozenSet[Tuple[str, int]]:
+    """(poet, 1-based line number) of every line with a COPY partner, loaded once per process"""
+    return frozenset((p, n) for ex in load_copies(poet)["examples"]
+                     for p, n in zip(ex["poets"], ex["line_numbers"]))
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Corpus-wide COPY detection (MinHash LSH)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    f = sub.add_parser("find", help="Write COPY annotations to json/copies_<Poet|all>.json")
+    f.add_argument("poets", nargs="*", help="One file per poet")
+    f.add_argument("--all", action="store_true", help="All six poets together (cross-poet copies)")
+    args = parser.parse_args()
+
+    for poet in ([None] if args.all or not args.poets else args.poets):
+        report = write_copies(poet)
+        print(f"{copies_path(poet)}: {report['total_copies']} copies, {len(report['passages'])} passages, "
+              f"{len(report['groups'])} groups from {report['lines_indexed']} lines "
+              f"({report['candidate_pairs']} of {report['all_pairs']} pairs compared, {report['elapsed_s']}s)")
@@ -0,0 +1,218 @@
+"""
+Rhyme pair detection over a sequence of verse lines
+Shared by the corpus builders. Two detection modes:
+- window: compare each line with the next few lines (the original behaviour)
+- bucketed: group lines by a rhyme key every rhyming pair shares and only
+  classify pairs inside a bucket, so long-distance rhymes (ABBA across
+  quatrains, refrains) are found without comparing every pair of lines;
+  within max_distance it finds exactly the pairs the window mode finds
+"""
+from bisect import bisect_right
+from collections import defaultdict
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from greek_phonology import (
+    classify_rhyme_pair, extract_pre_rhyme_vowel, extract_rhyme_domain, get_rhyme, line_tails, match_mosaic_tails
+)
+
+# Skip short lines or headers
+MIN_LINE_LENGTH = 4
+
+# Default look-ahead of the window mode (check i against i+1, i+2, i+3)
+DEFAULT_WINDOW = 3
+
+
+@lru_cache(maxsize=65536)
+def _classify_domains(w1: str, w2: str, variant: Optional[str] = None) -> Dict:
+    """classify_rhyme_pair is pure; rhyme domains repeat heavily across a poet's lines"""
+    if variant:
+        return classify_rhyme_pair(w1, w2, variant=variant)
+    return classify_rhyme_pair(w1, w2)
+
+
+# === PER-LINE PRECOMPUTATION ===
+
+def prepare_line(line: str) -> Dict:
+    """
+    Per-line analysis reused by every pair the line takes part in:
+    the rhyme domain now, the mosaic tails on first use.
+    """
+    # Use extract_rhyme_domain to handle clitics (e.g. "kalivi mas")
+    return {"text": line, "rd": extract_rhyme_domain(line), "tails": None}
+
+
+def get_tails(info: Dict) -> List[Dict]:
+    if info["tails"] is None:
+        info["tails"] = line_tails(info["text"])
+    return info["tails"]
+
+
+# === PAIR CLASSIFICATION ===
+
+def result_features(res: Dict) -> Tuple[str, List[str]]:
+    """Classification and features of a classify_rhyme_pair result (e.g. F2-IMP-C-IMPERFECT)"""
+    stress_type = res.get('subtype', 'M')
+    rhyme_type = res['type']
+
+    # Construct classification: STRESS-TYPE (e.g. F2-PURE or F2-IMP-C-IMPERFECT)
+    features = []
+    if 'imperfect_type' in res:
+        imp_type = res['imperfect_type']
+        classification = f"{stress_type}-{imp_type}-{rhyme_type}"
+        features.append(imp_type)
+    else:
+        classification = f"{stress_type}-{rhyme_type}"
+
+    features.append(stress_type)
+    features.append(rhyme_type)  # PURE, RICH, IMPERFECT
+
+    if 'details' in res:
+        features.append(res['details'])
+    return classification, features
+
+
+def classify_prepared(p1: Dict, p2: Dict, variant: Optional[str] = None) -> Optional[Dict]:
+    """
+    Classify a pair of prepared lines (see prepare_line).
+    Returns {"classification", "features", "phonetic"} or None if they do not rhyme.
+    variant selects classifier rules (e.g. "topintzi" allows IMP-0F).
+    """
+    rd1, rd2 = p1["rd"], p2["rd"]
+    w1 = rd1['rhyme_domain']
+    w2 = rd2['rhyme_domain']
+
+    # 1. Standard Check
+    res = _classify_domains(w1, w2, variant)
+
+    if res['type'] != 'NONE':
+        classification, features = result_features(res)
+
+        # Check for IDV (Pre-rhyme Identical Vowel)
+        idv1 = extract_pre_rhyme_vowel(w1)
+        idv2 = extract_pre_rhyme_vowel(w2)
+        if idv1 and idv2 and idv1 == idv2:
+            features.append("IDV")
+            classification += "-IDV"
+
+        phonetic = [rd1.get('rhyme_domain_phonetic', ''), rd2.get('rhyme_domain_phonetic', '')]
+        return {"classification": classification, "features": features, "phonetic": phonetic}
+
+    # 2. Mosaic Check (only when the standard check failed), over cached tails
+    mosaic_res = match_mosaic_tails(get_tails(p1), get_tails(p2), variant)
+    if not mosaic_res['mosaic_candidate']:
+        return None
+
+    t1, t2 = mosaic_res['line1_rhyme'], mosaic_res['line2_rhyme']
+    phonetic = [t1['rhyme_domain_phonetic'], t2['rhyme_domain_phonetic']]
+
+    # Filter out IDENTICAL rhymes (Repetition), e.g. "to Dromo" vs "to Dromo".
+    # Reject if one is contained in the other (e.g. "luludi" in "menaluludi") or identical.
+    if phonetic[0] == phonetic[1]:
+        w1_norm, w2_norm = t1['normalized'], t2['normalized']
+        if w1_norm == w2_norm or w1_norm.endswith(w2_norm) or w2_norm.endswith(w1_norm):
+            return None
+
+    # Stress, type and details are the matched tails' (usually F2, but M and F3 occur)
+    _, features = result_features(mosaic_res['classification'])
+    return {"classification": "MOSAIC", "features": ["MOS", *features], "phonetic": phonetic}
+
+
+def classify_lines(line1: str, line2: str, variant: Optional[str] = None) -> Optional[Dict]:
+    """Classify a single pair of lines (see classify_prepared)"""
+    return classify_prepared(prepare_line(line1), prepare_line(line2), variant)
+
+
+def prepare_lines(lines: List[str]) -> List[Optional[Dict]]:
+    """prepare_line for every line long enough to be verse; None for short lines and headers"""
+    return [prepare_line(line) if len(line) >= MIN_LINE_LENGTH else None for line in lines]
+
+
+def find_rhymes_windowed(lines: List[str], window: int = DEFAULT_WINDOW,
+                         stats: Optional[Dict] = None, variant: Optional[str] = None) -> List[tuple]:
+    """
+    Compare each line with the next `window` lines.
+    Only looks forward to avoid duplicates (A~B and B~A). Returns (i, j, result) tuples.
+    """
+    prepared = prepare_lines(lines)
+    found = []
+    for i in range(len(lines)):
+        if prepared[i] is None:
+            continue
+        for j in range(i + 1, min(i + 1 + window, len(lines))):
+            if prepared[j] is None:
+                continue
+            if stats is not None:
+                stats['examined'] += 1
+            res = classify_prepared(prepared[i], prepared[j], variant)
+            if res:
+                found.append((i, j, res))
+    return found
+
+
+# === BUCKETED MODE ===
+
+def rhyme_bucket_keys(rd: Dict) -> Tuple[tuple, ...]:
+    """
+    Keys of a rhyme domain (a prepared line's "rd" or a mosaic tail). classify_rhyme_pair
+    only accepts domains with the same stress position (M/F2/F3) and post-tonic vowels,
+    and then either the same stressed vowel too (PURE, RICH, COPY, IMP-C, IMP-0, IMP-0F)
+    or the same post-tonic consonants (IMP-V). So every rhyming pair shares one of
+      ("V", stress, all vowels)                       stressed vowel kept, consonants free
+      ("C", stress, post-tonic vowels, consonants)    stressed vowel free (IMP-V)
+    """
+    rhyme = get_rhyme(rd["rhyme_domain"]) if rd["rhyme_domain"] else None
+    if rhyme is None:
+        return ()
+    return ("V", rhyme.subtype, rhyme.vowels), ("C", rhyme.subtype, rhyme.vowels[1:], rhyme.consonants)
+
+
+def line_bucket_keys(info: Dict) -> set:
+    """Keys of a prepared line: its rhyme domain's and its mosaic tails' (a mosaic pair shares a tail key)"""
+    return {key for rd in (info["rd"], *get_tails(info)) for key in rhyme_bucket_keys(rd)}
+
+
+def find_rhymes_bucketed(lines: List[str], max_distance: Optional[int] = None,
+                         stats: Optional[Dict] = None, variant: Optional[str] = None) -> List[tuple]:
+    """
+    Detect rhymes at any distance up to `max_distance` lines (None = whole input).
+    Lines are bucketed by line_bucket_keys and the full classifier only runs
+    on pairs sharing a bucket, each pair once. Returns (i, j, result) tuples
+    sorted by (i, j). `stats` receives candidate_pairs (all pairs within the
+    distance limit), examined and pruned counts.
+    """
+    prepared = prepare_lines(lines)
+    buckets = defaultdict(list)
+    for i, info in enumerate(prepared):
+        if info is None:
+            continue
+        for key in line_bucket_keys(info):
+            buckets[key].append(i)
+
+    found = []
+    seen = set()
+    for indices in buckets.values():
+        for a, i in enumerate(indices):
+            stop = len(indices) if max_distance is None else bisect_right(indices, i + max_distance)
+            for j in indices[a + 1:stop]:
+                if (i, j) in seen:
+                    continue
+                seen.add((i, j))
+                res = classify_prepared(prepared[i], prepared[j], variant)
+                if res:
+                    found.append((i, j, res))
+    found.sort(key=lambda t: (t[0], t[1]))
+    examined = len(seen)
+
+    if stats is not None:
+        valid = [i for i, info in enumerate(prepared) if info is not None]
+        if max_distance is None:
+            candidates = len(valid) * (len(valid) - 1) // 2
+        else:
+            candidates = sum(bisect_right(valid, i + max_distance) - a - 1 for a, i in enumerate(valid))
+        stats['candidate_pairs'] += candidates
+        stats['examined'] += examined
+        stats['pruned'] += candidates - examined
+        stats['buckets'] += len(buckets)
+
+    return found
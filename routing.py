@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Latency- and cost-aware model routing for model "auto"
+Latencies differ a lot between models (Flash-Lite, 2.5 Pro, a 70B model
+through OpenRouter) and drift over the day, so a fixed model is either
+slow or expensive. call_model records every provider call here: an
+exponential moving average of latency, error rate and output tokens per
+model and strategy ("few_shot", "few_shot+json", "generate"), and per
+model over all strategies.
+
+A request with model "auto" goes to the cheapest model (MODEL_PRICES,
+for its prompt and the expected output) that
+  - has a key: api_keys[provider], or api_key when its prefix is the provider's
+  - is healthy: error rate below MAX_ERROR_RATE (errors decay over ERROR_HALF_LIFE_S)
+  - meets min_accuracy: macro-F1 in the offline benchmark report
+    (benchmark_strategies.py) of at least ACCURACY_TIERS[tier]
+  - meets deadline_s: predicted latency plus the scheduler's expected queue wait
+If no model meets the deadline, the fastest is used; ties go to the cheaper.
+Predicted latency is the live average for the model and strategy, else for
+the model, else the report's p50. A model with none of these has an unknown
+latency (latency_s None, source "unknown"): it is never predicted to meet a
+deadline and is only picked as "fastest" when no latency is known at all.
+The decision, with every candidate and why it was or was not chosen, is
+returned as RhymeResponse.routing.
+
+    decision = router.choose("few_shot", 900, {"gemini-2.5-flash": "google", ...},
+                             {"google": key}, deadline_s=5, min_accuracy="medium")
+"""
+
+import json
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+from benchmark_strategies import DEFAULT_REPORT, JSON_SUFFIX, MODEL_PRICES
+
+AUTO = "auto"
+# Weight of the newest call in the moving averages
+ALPHA = 0.2
+# Output tokens assumed before a model has reported any
+DEFAULT_OUTPUT_TOKENS = 800
+MAX_ERROR_RATE = 0.5
+ERROR_HALF_LIFE_S = 300.0
+# Minimum offline macro-F1 per tier
+ACCURACY_TIERS = {"low": 0.0, "medium": 0.6, "high": 0.8}
+# Strategy key of generation calls
+GENERATE = "generate"
+ANY_STRATEGY = "*"
+
+KEY_PREFIXES = [("sk-ant-", "anthropic"), ("sk-or-", "openrouter"), ("AIza", "google"), ("sk-", "openai")]
+
+
+def strategy_key(prompt_strategy: str, output_format: str = "text") -> str:
+    """Identification strategy as the benchmark report names it: few_shot, few_shot+json"""
+    return prompt_strategy + JSON_SUFFIX if output_format == "json" else prompt_strategy
+
+
+def provider_of_key(api_key: str) -> Optional[str]:
+    for prefix, provider in KEY_PREFIXES:
+        if api_key.startswith(prefix):
+            return provider
+    return None
+
+
+class ModelStats:
+    def __init__(self):
+        self.latency_s: Optional[float] = None
+        self.output_tokens: Optional[float] = None
+        self.error_rate = 0.0
+        self.calls = 0
+        self.errors = 0
+        self.updated = time.monotonic()
+
+    def errors_now(self) -> float:
+        """Error rate decayed since the last call, so an excluded model is tried again"""
+        return self.error_rate * 0.5 ** ((time.monotonic() - self.updated) / ERROR_HALF_LIFE_S)
+
+    def record(self, latency_s: float, ok: bool, output_tokens: Optional[int]):
+        self.error_rate = (1 - ALPHA) * self.errors_now() + ALPHA * (0.0 if ok else 1.0)
+        self.updated = time.monotonic()
+        self.calls += 1
+        if not ok:
+            self.errors += 1
+            return
+        # Failed calls say nothing about the latency of a successful one
+        self.latency_s = latency_s if self.latency_s is None else (1 - ALPHA) * self.latency_s + ALPHA * latency_s
+        if output_tokens is not None:
+            self.output_tokens = (output_tokens if self.output_tokens is None
+                                  else (1 - ALPHA) * self.output_tokens + ALPHA * output_tokens)
+
+    def snapshot(self) -> Dict:
+        return {
+            "latency_s": round(self.latency_s, 3) if self.latency_s is not None else None,
+            "error_rate": round(self.errors_now(), 3),
+            "output_tokens": round(self.output_tokens) if self.output_tokens is not None else None,
+            "calls": self.calls,
+            "errors": self.errors,
+        }
+
+
+class Router:
+    def __init__(self, report_path: str = DEFAULT_REPORT):
+        self.stats: Dict[tuple, ModelStats] = {}
+        self.report_path = Path(report_path)
+        self._report = {}
+        self._report_mtime = None
+
+    def record(self, model: str, strategy: Optional[str], latency_s: float, ok: bool,
+               output_tokens: Optional[int] = None):
+        for key in {(model, strategy or ANY_STRATEGY), (model, ANY_STRATEGY)}:
+            self.stats.setdefault(key, ModelStats()).record(latency_s, ok, output_tokens)
+
+    def report(self) -> Dict:
+        """Results of the offline benchmark report, reloaded when the file changes"""
+        try:
+            mtime = self.report_path.stat().st_mtime
+        except OSError:
+            return {}
+        if mtime != self._report_mtime:
+            try:
+                self._report = json.loads(self.report_path.read_text(encoding="utf-8")).get("results", {})
+            except (OSError, ValueError):
+                self._report = {}
+            self._report_mtime = mtime
+        return self._report
+
+    def accuracy(self, model: str, strategy: str) -> Optional[float]:
+        """Offline macro-F1; generation has no benchmark, the model's mean over strategies stands in"""
+        report = self.report()
+        if strategy != GENERATE:
+            r = report.get(f"{model}/{strategy}")
+            return r["macro_f1"] if r and r["samples"] else None
+        scores = [r["macro_f1"] for r in report.values() if r["model"] == model and r["samples"]]
+        return sum(scores) / len(scores) if scores else None
+
+    def estimate(self, model: str, strategy: str) -> Dict:
+        """Predicted latency (None if unknown) and output tokens, and where the latency comes from"""
+        live = self.stats.get((model, strategy))
+        overall = self.stats.get((model, ANY_STRATEGY))
+        offline = self.report().get(f"{model}/{strategy}")
+        tokens = next((s.output_tokens for s in (live, overall) if s and s.output_tokens is not None),
+                      offline["output_tokens_mean"] if offline and offline["samples"] else DEFAULT_OUTPUT_TOKENS)
+        if live and live.latency_s is not None:
+            return {"latency_s": live.latency_s, "output_tokens": tokens, "source": "live"}
+        if overall and overall.latency_s is not None:
+            return {"latency_s": overall.latency_s, "output_tokens": tokens, "source": "live (all strategies)"}
+        if offline and offline["samples"]:
+            return {"latency_s": offline["latency_p50_s"], "output_tokens": tokens, "source": "benchmark"}
+        return {"latency_s": None, "output_tokens": tokens, "source": "unknown"}
+
+    def error_rate(self, model: str) -> float:
+        overall = self.stats.get((model, ANY_STRATEGY))
+        return overall.errors_now() if overall else 0.0
+
+    def choose(self, strategy: str, input_tokens: int, models: Dict[str, str], keys: Dict[str, str],
+               deadline_s: Optional[float] = None, min_accuracy: Optional[str] = None,
+               waits: Optional[Dict[str, float]] = None) -> Dict:
+        """
+        Route one request. models maps model -> provider, keys provider -> API key,
+        waits model -> expected scheduler wait in seconds. Raises ValueError when no
+        model has a key, is healthy and meets the accuracy tier, and when min_accuracy
+        is set before any benchmark report exists.
+        """
+        waits = waits or {}
+        floor = ACCURACY_TIERS[min_accuracy] if min_accuracy else None
+        if floor is not None and not self.report():
+            raise ValueError(f"min_accuracy needs the offline benchmark report {self.report_path}, which has no "
+                             "results yet: run benchmark_strategies.py with API keys once, or leave min_accuracy unset")
+        candidates, eligible = [], []
+        for model, provider in models.items():
+            est = self.estimate(model, strategy)
+            prices = MODEL_PRICES.get(model)
+            accuracy = self.accuracy(model, strategy)
+            entry = {
+                "model": model,
+                "cost_usd": (input_tokens * prices[0] + est["output_tokens"] * prices[1]) / 1e6 if prices else None,
+                "latency_s": est["latency_s"] + waits.get(model, 0.0) if est["latency_s"] is not None else None,
+                "latency_source": est["source"],
+                "error_rate": round(self.error_rate(model), 3),
+                "accuracy": round(accuracy, 3) if accuracy is not None else None,
+            }
+            if provider not in keys:
+                entry["excluded"] = "no API key"
+            elif entry["error_rate"] >= MAX_ERROR_RATE:
+                entry["excluded"] = "error rate"
+            elif floor is not None and (accuracy is None or accuracy < floor):
+                entry["excluded"] = "not benchmarked" if accuracy is None else "below accuracy tier"
+            elif prices is None:
+                entry["excluded"] = "no price"
+            else:
+                eligible.append(entry)
+            candidates.append(entry)
+        if not eligible:
+            raise ValueError("No model available for auto routing: " +
+                             ", ".join(f"{c['model']} ({c['excluded']})" for c in candidates))
+
+        def latency(c):
+            return c["latency_s"] if c["latency_s"] is not None else float("inf")
+
+        in_time = [c for c in eligible if deadline_s is None or latency(c) <= deadline_s]
+        if in_time:
+            chosen = min(in_time, key=lambda c: (c["cost_usd"], latency(c)))
+            reason = "cheapest" if deadline_s is None else f"cheapest within {deadline_s:g}s"
+        else:
+            chosen = min(eligible, key=lambda c: (latency(c), c["cost_usd"]))
+            reason = (f"fastest (none predicted within {deadline_s:g}s)" if chosen["latency_s"] is not None
+                      else f"cheapest (no latency known, none predicted within {deadline_s:g}s)")
+        candidates.sort(key=lambda c: ("excluded" in c, c["cost_usd"] or 0.0))
+        for c in candidates:
+            c["cost_usd"] = round(c["cost_usd"], 6) if c["cost_usd"] is not None else None
+            c["latency_s"] = round(c["latency_s"], 3) if c["latency_s"] is not None else None
+        return {
+            "chosen": chosen["model"],
+            "reason": reason,
+            "strategy": strategy,
+            "deadline_s": deadline_s,
+            "min_accuracy": min_accuracy,
+            "candidates": candidates,
+        }
+
+    def snapshot(self) -> Dict:
+        by_model = {}
+        for (model, strategy), s in sorted(self.stats.items()):
+            by_model.setdefault(model, {})[strategy] = s.snapshot()
+        return {"models": by_model, "benchmark_report": str(self.report_path) if self.report() else None}
+
+
+router = Router()
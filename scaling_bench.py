@@ -0,0 +1,413 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Synthetic large-corpus scaling benchmark for the phonology and pairing engine
+The real corpora stop at ~12k lines per poet. To see how detection scales
+towards whole national collections, a generator builds synthetic line
+tables (ingest.py format) of any size by resampling real lines: every
+line of json/lines_*.json is cut into a head and an ending (last word plus
+trailing enclitics), and synthetic quatrains join random heads to endings
+drawn by rhyme scheme (ABAB, ABBA, ...). Endings whose letters repeat share
+their full rhyme part (greek_phonology.get_rhyme: stressed vowel to the
+end), so every scheme pair is a real rhyme (PURE, RICH or COPY) to
+classify_rhyme_pair. The generator does not use the detector's bucket key,
+so window and bucketed mode are measured on an unbiased corpus; the report
+sets their pairs_found side by side (mode_comparison).
+
+Each configuration (size x mode x window x workers) runs in fresh spawned
+processes, so the engine's caches start cold as in a corpus build; poems
+are split over the workers by line count. Per run: lines/sec, examined and
+found pairs/sec, peak RSS of the workers and the time spent in
+extract_rhyme_domain, classify_rhyme_pair and the two halves of
+analyze_mosaic_pattern (line_tails, match_mosaic_tails), timed where
+rhyme_detection calls them.
+
+    python scaling_bench.py run                                 # 1k, 10k, 100k lines
+    python scaling_bench.py run --sizes 1000000 --modes bucketed --windows 12
+    python scaling_bench.py compare benchmarks/scaling_before.json benchmarks/scaling_report.json
+    python scaling_bench.py generate 200000 --output json/lines_Synthetic.json
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from greek_phonology import EDGE_PUNCTUATION, MAX_ENCLITICS, extract_rhyme_domain, get_rhyme, is_enclitic
+from ingest import load_line_table, save_line_table
+from records import POETS
+from rhyme_detection import MIN_LINE_LENGTH
+
+DEFAULT_REPORT = "benchmarks/scaling_report.json"
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+MODES = ["window", "bucketed"]
+DEFAULT_WINDOWS = [3, 6, 12]
+
+# Rhyme schemes of the synthetic quatrains; letters that repeat share a rhyme part
+SCHEMES = ["ABAB", "ABBA", "AABB", "ABCB", "ABCD"]
+POEM_STANZAS = (2, 8)
+
+# Functions timed inside the workers, by the name rhyme_detection imports them under
+TIMED = ["extract_rhyme_domain", "classify_rhyme_pair", "line_tails", "match_mosaic_tails"]
+
+
+# === GENERATOR ===
+
+def split_ending(line: str) -> Tuple[str, str]:
+    """(head, ending): the ending is the last word and up to MAX_ENCLITICS enclitics after it"""
+    tokens = line.split()
+    k = 1
+    while k < len(tokens) and k <= MAX_ENCLITICS and is_enclitic(tokens[-k].strip(EDGE_PUNCTUATION)):
+        k += 1
+    return " ".join(tokens[:-k]), " ".join(tokens[-k:])
+
+
+def rhyme_part(ending: str) -> Optional[tuple]:
+    """Phones from the stressed vowel to the end; endings sharing it always rhyme"""
+    domain = extract_rhyme_domain(ending)["rhyme_domain"]
+    rhyme = get_rhyme(domain) if domain else None
+    return rhyme.part if rhyme else None
+
+
+class LinePool:
+    """Heads and endings (grouped by rhyme part) of the real lines, the material of the synthetic corpora"""
+
+    def __init__(self, texts: List[str]):
+        self.heads: List[str] = []
+        self.buckets: Dict[tuple, List[str]] = defaultdict(list)
+        for text in texts:
+            if len(text) < MIN_LINE_LENGTH:
+                continue
+            head, ending = split_ending(text)
+            if head:
+                self.heads.append(head)
+            part = rhyme_part(ending)
+            if part is not None:
+                self.buckets[part].append(ending)
+        # Rhyme part of each ending occurrence, so a random draw follows the real frequencies;
+        # a repeated scheme letter needs a part with two different words
+        self.keys = [part for part, endings in self.buckets.items() for _ in endings]
+        self.rhyming_keys = [part for part, endings in self.buckets.items() if len(set(endings)) > 1
+                             for _ in endings]
+
+    def endings(self, rng: random.Random, n: int) -> List[str]:
+        """n endings of one rhyme part, different words where the part has them"""
+        if n == 1:
+            return [rng.choice(self.buckets[rng.choice(self.keys)])]
+        bucket = self.buckets[rng.choice(self.rhyming_keys)]
+        distinct = len(set(bucket))
+        picked = [rng.choice(bucket)]
+        while len(picked) < n:
+            ending = rng.choice(bucket)
+            if ending not in picked or len(set(picked)) == distinct:
+                picked.append(ending)
+        return picked
+
+    @classmethod
+    def from_line_tables(cls, poets: List[str] = POETS) -> "LinePool":
+        return cls([row[3] for poet in poets for row in load_line_table(poet)["lines"]])
+
+
+def synthesize(n_lines: int, pool: LinePool, seed: int = 13) -> Dict:
+    """A line table (line_table_v1) of n_lines synthetic verse lines in quatrain poems"""
+    rng = random.Random(seed)
+    poems, rows = [], []
+    while len(rows) < n_lines:
+        number = len(poems) + 1
+        poems.append({"poem": number, "title": f"Synthetic {number}", "start": len(rows)})
+        for stanza in range(1, rng.randint(*POEM_STANZAS) + 1):
+            scheme = rng.choice(SCHEMES)
+            endings = {letter: pool.endings(rng, scheme.count(letter)) for letter in dict.fromkeys(scheme)}
+            for k, letter in enumerate(scheme[:n_lines - len(rows)], 1):
+                rows.append([number, stanza, k, f"{rng.choice(pool.heads)} {endings[letter].pop()}"])
+            if len(rows) == n_lines:
+                break
+        poems[-1]["end"] = len(rows)
+    return {
+        "version": "line_table_v1",
+        "poet": "Synthetic",
+        "source": f"synthetic:{n_lines}:{seed}",
+        "encoding": "utf-8",
+        "total_lines": len(rows),
+        "poems": poems,
+        "lines": rows,
+    }
+
+
+def shard_poems(table: Dict, workers: int) -> List[List[List[str]]]:
+    """The poems' lines split into `workers` contiguous shards of about equal line count"""
+    shards = [[] for _ in range(workers)]
+    per_shard = table["total_lines"] / workers
+    for p in table["poems"]:
+        k = min(int(p["start"] / per_shard), workers - 1)
+        shards[k].append([row[3] for row in table["lines"][p["start"]:p["end"]]])
+    return [s for s in shards if s]
+
+
+# === WORKERS ===
+
+def peak_rss_mb() -> float:
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kB on Linux, bytes on macOS
+    return round(peak / (2 ** 20 if sys.platform == "darwin" else 2 ** 10), 1)
+
+
+def _timed(fn, totals: Dict[str, List[float]], name: str):
+    entry = totals[name]
+
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            entry[0] += 1
+            entry[1] += time.perf_counter() - start
+    return wrapper
+
+
+def _timer_overhead() -> float:
+    """Seconds a timing wrapper adds per call (the reported wall times include it)"""
+    def noop():
+        return None
+    wrapped = _timed(noop, defaultdict(lambda: [0, 0.0]), "noop")
+    n = 100_000
+    start = time.perf_counter()
+    for _ in range(n):
+        noop()
+    bare = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(n):
+        wrapped()
+    return max(0.0, (time.perf_counter() - start - bare) / n)
+
+
+def _started(_) -> int:
+    return os.getpid()
+
+
+def detect_shard(poems: List[List[str]], mode: str, window: int) -> Dict:
+    """Run detection over a shard of poems in this (fresh) process, with per-function timers"""
+    import rhyme_detection as rd
+
+    overhead = _timer_overhead()
+    baseline = peak_rss_mb()
+    totals = defaultdict(lambda: [0, 0.0])
+    for name in TIMED:
+        setattr(rd, name, _timed(getattr(rd, name), totals, name))
+
+    stats = defaultdict(int)
+    found = 0
+    start = time.perf_counter()
+    for lines in poems:
+        if mode == "window":
+            found += len(rd.find_rhymes_windowed(lines, window=window, stats=stats))
+        else:
+            found += len(rd.find_rhymes_bucketed(lines, max_distance=window, stats=stats))
+    seconds = time.perf_counter() - start
+
+    cache = rd._classify_domains.cache_info()
+    return {
+        "lines": sum(map(len, poems)),
+        "examined": stats["examined"],
+        "found": found,
+        "seconds": seconds,
+        "baseline_rss_mb": baseline,
+        "peak_rss_mb": peak_rss_mb(),
+        "timer_overhead_s": overhead * sum(calls for calls, _ in totals.values()),
+        "functions": {name: totals[name] for name in TIMED},
+        "pair_cache": {"hits": cache.hits, "misses": cache.misses, "maxsize": cache.maxsize},
+    }
+
+
+# === RUNNER ===
+
+def run_config(table: Dict, mode: str, window: int, workers: int) -> Dict:
+    """One measurement: a new spawned pool (cold caches), one shard per worker"""
+    shards = shard_poems(table, workers)
+    with ProcessPoolExecutor(len(shards), mp_context=multiprocessing.get_context("spawn")) as pool:
+        # The processes start (and import the engine) before the clock does
+        list(pool.map(_started, range(len(shards))))
+        start = time.perf_counter()
+        parts = list(pool.map(detect_shard, shards, [mode] * len(shards), [window] * len(shards)))
+        wall = time.perf_counter() - start
+
+    lines = sum(p["lines"] for p in parts)
+    examined = sum(p["examined"] for p in parts)
+    found = sum(p["found"] for p in parts)
+    detect = sum(p["seconds"] for p in parts)
+    functions = {}
+    for name in TIMED:
+        calls = sum(p["functions"][name][0] for p in parts)
+        seconds = sum(p["functions"][name][1] for p in parts)
+        functions[name] = {
+            "calls": calls,
+            "seconds": round(seconds, 3),
+            "us_per_call": round(seconds / calls * 1e6, 2) if calls else None,
+            "share": round(seconds / detect, 3) if detect else None,
+        }
+    hits = sum(p["pair_cache"]["hits"] for p in parts)
+    misses = sum(p["pair_cache"]["misses"] for p in parts)
+    return {
+        "key": f"lines={table['total_lines']} mode={mode} window={window} workers={workers}",
+        "lines": lines,
+        "poems": len(table["poems"]),
+        "mode": mode,
+        "window": window,
+        "workers": len(shards),
+        "seconds": round(wall, 3),
+        "lines_per_sec": round(lines / wall),
+        "pairs_examined": examined,
+        "pairs_per_sec": round(examined / wall),
+        "pairs_found": found,
+        "found_per_line": round(found / lines, 3),
+        "peak_rss_mb": max(p["peak_rss_mb"] for p in parts),
+        "rss_growth_mb": round(max(p["peak_rss_mb"] - p["baseline_rss_mb"] for p in parts), 1),
+        "timer_overhead_s": round(sum(p["timer_overhead_s"] for p in parts), 3),
+        "functions": functions,
+        "pair_cache": {"hit_rate": round(hits / (hits + misses), 3) if hits + misses else None,
+                       "maxsize": parts[0]["pair_cache"]["maxsize"]},
+    }
+
+
+def environment() -> Dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=Path(__file__).parent, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "commit": commit,
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def run(sizes: List[int], modes: List[str], windows: List[int], workers: List[int], seed: int = 13) -> Dict:
+    start = time.perf_counter()
+    pool = LinePool.from_line_tables()
+    print(f"Line pool: {len(pool.heads)} heads, {len(pool.keys)} endings in {len(pool.buckets)} rhyme parts "
+          f"({time.perf_counter() - start:.1f}s)")
+    report = {
+        "benchmark": "scaling",
+        "environment": environment(),
+        "params": {"sizes": sizes, "modes": modes, "windows": windows, "workers": workers, "seed": seed},
+        "corpora": [],
+        "results": [],
+    }
+    for size in sizes:
+        start = time.perf_counter()
+        table = synthesize(size, pool, seed)
+        report["corpora"].append({"lines": size, "poems": len(table["poems"]),
+                                  "generate_s": round(time.perf_counter() - start, 2)})
+        for mode in modes:
+            for window in windows:
+                for n in workers:
+                    result = run_config(table, mode, window, n)
+                    report["results"].append(result)
+                    f = result["functions"]
+                    print(f"{result['key']:52} {result['lines_per_sec']:>9,} lines/s "
+                          f"{result['pairs_per_sec']:>10,} pairs/s {result['peak_rss_mb']:>7.1f} MB  "
+                          + " ".join(f"{name}={f[name]['share']:.0%}" for name in TIMED if f[name]["share"]))
+    report["mode_comparison"] = mode_comparison(report["results"])
+    for row in report["mode_comparison"]:
+        print(f"{row['key']:40} found window {row['pairs_found']['window']:>9,} "
+              f"bucketed {row['pairs_found']['bucketed']:>9,}  examined x{row['examined_ratio']}")
+    return report
+
+
+def mode_comparison(results: List[Dict]) -> List[Dict]:
+    """
+    Window against bucketed mode on the same corpus, window and workers: pairs found
+    by each (bucketed should find every window pair) and bucketed/window pairs examined
+    """
+    by_key = {(r["lines"], r["window"], r["workers"], r["mode"]): r for r in results}
+    rows = []
+    for (lines, window, workers, mode), r in by_key.items():
+        other = by_key.get((lines, window, workers, "bucketed"))
+        if mode != "window" or other is None:
+            continue
+        rows.append({
+            "key": f"lines={lines} window={window} workers={workers}",
+            "pairs_found": {"window": r["pairs_found"], "bucketed": other["pairs_found"]},
+            "pairs_examined": {"window": r["pairs_examined"], "bucketed": other["pairs_examined"]},
+            "examined_ratio": round(other["pairs_examined"] / r["pairs_examined"], 3) if r["pairs_examined"] else None,
+        })
+    return rows
+
+
+def compare(before: Dict, after: Dict) -> List[Dict]:
+    """Per configuration present in both reports: after/before ratios of throughput and memory"""
+    old = {r["key"]: r for r in before["results"]}
+    rows = []
+    for r in after["results"]:
+        b = old.get(r["key"])
+        if b is None:
+            continue
+        rows.append({
+            "key": r["key"],
+            "lines_per_sec": [b["lines_per_sec"], r["lines_per_sec"]],
+            "speedup": round(r["lines_per_sec"] / b["lines_per_sec"], 2),
+            "peak_rss_mb": [b["peak_rss_mb"], r["peak_rss_mb"]],
+            "pairs_found": [b["pairs_found"], r["pairs_found"]],
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synthetic large-corpus scaling benchmark")
+    sub = parser.add_subparsers(dest="command", required=True)
+    r = sub.add_parser("run", help="Measure detection over synthetic corpora")
+    r.add_argument("--sizes", nargs="+", type=int, default=DEFAULT_SIZES)
+    r.add_argument("--modes", nargs="+", choices=MODES, default=MODES)
+    r.add_argument("--windows", nargs="+", type=int, default=DEFAULT_WINDOWS,
+                   help="Look-ahead of window mode, max_distance of bucketed mode")
+    r.add_argument("--workers", nargs="+", type=int, default=sorted({1, os.cpu_count() or 1}))
+    r.add_argument("--seed", type=int, default=13)
+    r.add_argument("--report", default=DEFAULT_REPORT)
+    c = sub.add_parser("compare", help="Throughput ratios between two reports")
+    c.add_argument("before")
+    c.add_argument("after")
+    g = sub.add_parser("generate", help="Write a synthetic line table")
+    g.add_argument("lines", type=int)
+    g.add_argument("--seed", type=int, default=13)
+    g.add_argument("--output", default="json/lines_Synthetic.json")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        report = run(args.sizes, args.modes, args.windows, args.workers, args.seed)
+        Path(args.report).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Saved report to {args.report}")
+    elif args.command == "compare":
+        reports = []
+        for path in (args.before, args.after):
+            with open(path, "r", encoding="utf-8") as f:
+                reports.append(json.load(f))
+        rows = compare(*reports)
+        for row in rows:
+            print(f"{row['key']:52} {row['lines_per_sec'][0]:>9,} → {row['lines_per_sec'][1]:<9,} lines/s "
+                  f"x{row['speedup']:<5} {row['peak_rss_mb'][0]:>7.1f} → {row['peak_rss_mb'][1]:.1f} MB")
+        if not rows:
+            print("No configuration in common")
+    else:
+        table = synthesize(args.lines, LinePool.from_line_tables(), args.seed)
+        path = save_line_table(table, args.output)
+        print(f"  ✓ {table['total_lines']} lines in {len(table['poems'])} poems → {path}")
+
+
+if __name__ == "__main__":
+    main()
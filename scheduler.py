@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Admission control in front of the model providers
+Every (provider, api_key) pair gets a lane with two token buckets, requests
+per minute and tokens per minute, and a priority queue: interactive calls
+are always served before batch ones (benchmarks, jobs). Queues are bounded
+and a call whose expected wait exceeds its class limit is refused at once
+with Overloaded(retry_after) instead of waiting on the upstream timeout.
+
+Limits default to LIMITS and can be overridden per provider with
+<PROVIDER>_RPM / <PROVIDER>_TPM environment variables (e.g. OPENROUTER_RPM=20).
+
+    lane = scheduler.lane("openrouter", api_key)
+    reserved = await lane.acquire(estimated_tokens, "interactive")
+    ...call the provider...
+    lane.settle(reserved, actual_tokens)
+"""
+
+import asyncio
+import hashlib
+import heapq
+import itertools
+import math
+import os
+import time
+from typing import Dict, Optional, Tuple
+
+# Requests and tokens (input + output) per minute, per API key
+LIMITS = {
+    "anthropic": (50, 40000),
+    "google": (60, 250000),
+    "openai": (60, 30000),
+    "openrouter": (20, 100000),
+}
+DEFAULT_LIMITS = (30, 50000)
+
+PRIORITIES = ("interactive", "batch")
+# Queued calls per lane and class, and the longest wait a call is admitted for (seconds)
+MAX_QUEUE = {"interactive": 20, "batch": 500}
+MAX_WAIT = {"interactive": 15.0, "batch": 600.0}
+
+# Tokens reserved for the answer until the provider reports actual usage
+OUTPUT_RESERVE = 1000
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate for Greek-heavy text (providers do not all report input usage)"""
+    return max(1, len(text) // 3)
+
+
+class Overloaded(Exception):
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class TokenBucket:
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` is available"""
+        self._refill()
+        return max(0.0, (amount - self.level) / self.rate)
+
+    def take(self, amount: float):
+        self._refill()
+        self.level -= amount
+
+    def give(self, amount: float):
+        self._refill()
+        self.level = min(self.capacity, self.level + amount)
+
+    def drain(self, seconds: float):
+        """Empty the bucket for `seconds` (upstream said to back off)"""
+        self._refill()
+        self.level = min(self.level, -seconds * self.rate)
+
+
+class Lane:
+    """Rate limits and waiting calls of one provider + API key"""
+
+    def __init__(self, provider: str, key_id: str, rpm: int, tpm: int):
+        self.provider = provider
+        self.key_id = key_id
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.waiters = []
+        self.queued = {p: 0 for p in PRIORITIES}
+        self.queued_tokens = {p: 0 for p in PRIORITIES}
+        self.changed = asyncio.Condition()
+        self.stats = {p: {"admitted": 0, "rejected": 0, "wait_total": 0.0, "wait_max": 0.0} for p in PRIORITIES}
+
+    def expected_wait(self, tokens: int, priority: str) -> float:
+        """Wait behind every queued call of this class and above, at the refill rates"""
+        ahead = PRIORITIES[:PRIORITIES.index(priority) + 1]
+        requests = 1 + sum(self.queued[p] for p in ahead)
+        needed = tokens + sum(self.queued_tokens[p] for p in ahead)
+        return max(self.requests.wait_time(requests), self.tokens.wait_time(needed))
+
+    async def acquire(self, tokens: int, priority: str = "interactive") -> int:
+        """Wait for a slot; returns the tokens reserved (pass them to settle)"""
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority {priority!r}")
+        tokens = int(min(tokens, self.tokens.capacity))
+        wait = self.expected_wait(tokens, priority)
+        if self.queued[priority] >= MAX_QUEUE[priority] or wait > MAX_WAIT[priority]:
+            self.stats[priority]["rejected"] += 1
+            raise Overloaded(f"{self.provider} rate limit: {self.queued[priority]} {priority} calls queued, "
+                             f"~{wait:.0f}s wait", retry_after=wait)
+
+        entry = (PRIORITIES.index(priority), next(_sequence))
+        heapq.heappush(self.waiters, entry)
+        self.queued[priority] += 1
+        self.queued_tokens[priority] += tokens
+        start = time.monotonic()
+        try:
+            while True:
+                if self.waiters[0] == entry:
+                    wait = max(self.requests.wait_time(1), self.tokens.wait_time(tokens))
+                    if wait <= 0:
+                        # No await between the check and the take
+                        self.requests.take(1)
+                        self.tokens.take(tokens)
+                        break
+                    # Sleep until the refill, unless a higher-priority call arrives first
+                    async with self.changed:
+                        try:
+                            await asyncio.wait_for(self.changed.wait(), wait)
+                        except asyncio.TimeoutError:
+                            pass
+                else:
+                    async with self.changed:
+                        await self.changed.wait()
+        finally:
+            self.waiters.remove(entry)
+            heapq.heapify(self.waiters)
+            self.queued[priority] -= 1
+            self.queued_tokens[priority] -= tokens
+            async with self.changed:
+                self.changed.notify_all()
+
+        waited = time.monotonic() - start
+        s = self.stats[priority]
+        s["admitted"] += 1
+        s["wait_total"] += waited
+        s["wait_max"] = max(s["wait_max"], waited)
+        return tokens
+
+    def settle(self, reserved: int, actual: Optional[int]):
+        """Correct the token bucket once the real usage is known"""
+        if actual is None:
+            return
+        if actual < reserved:
+            self.tokens.give(reserved - actual)
+        else:
+            self.tokens.take(actual - reserved)
+
+    def backoff(self, seconds: float):
+        """The provider answered 429: stop admitting calls on this lane for a while"""
+        self.requests.drain(seconds)
+
+    def snapshot(self) -> Dict:
+        self.requests._refill()
+        self.tokens._refill()
+        return {
+            "provider": self.provider,
+            "key": self.key_id,
+            "limits": {"rpm": self.requests.capacity, "tpm": self.tokens.capacity},
+            "available": {"requests": round(self.requests.level, 1), "tokens": round(self.tokens.level)},
+            "queue": {
+                p: {
+                    "depth": self.queued[p],
+                    "admitted": s["admitted"],
+                    "rejected": s["rejected"],
+                    "wait_avg_s": round(s["wait_total"] / s["admitted"], 3) if s["admitted"] else 0.0,
+                    "wait_max_s": round(s["wait_max"], 3),
+                }
+                for p, s in self.stats.items()
+            },
+        }
+
+
+_sequence = itertools.count()
+
+
+def limits_for(provider: str) -> Tuple[int, int]:
+    rpm, tpm = LIMITS.get(provider, DEFAULT_LIMITS)
+    prefix = provider.upper()
+    return int(os.getenv(f"{prefix}_RPM", rpm)), int(os.getenv(f"{prefix}_TPM", tpm))
+
+
+class Scheduler:
+    def __init__(self):
+        self.lanes: Dict[Tuple[str, str], Lane] = {}
+
+    def lane(self, provider: str, api_key: str) -> Lane:
+        # Keys are only kept as a short fingerprint
+        key_id = hashlib.sha256(api_key.encode()).hexdigest()[:8] if api_key else "none"
+        if (provider, key_id) not in self.lanes:
+            self.lanes[(provider, key_id)] = Lane(provider, key_id, *limits_for(provider))
+        return self.lanes[(provider, key_id)]
+
+    def stats(self):
+        return [lane.snapshot() for lane in self.lanes.values()]
+
+
+scheduler = Scheduler()
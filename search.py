@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Full-text and faceted search over the rhyme corpora
+The regular corpus file of every poet in both variants
+(json/corpus_<Poet>[_topintzi].json; the enhanced files hold the same
+pairs) is indexed into a local SQLite database: a
+pairs table with the facet columns (poet, variant, classification), a
+pair_tags table (records.RhymeRecord.tags) and an FTS5 table over the
+folded text of both lines and their rhyme domains. Folding drops accents
+and diaeresis, lowercases and maps final sigma to σ, for documents and
+queries alike, so "ξανθη", "ΞΑΝΘΉ" and "ξανθή" all match.
+
+The index tracks each file's size and mtime; refresh() reindexes only the
+files that changed, appeared or disappeared.
+
+    index = SearchIndex()
+    index.refresh()
+    index.search("θαλασσα", poet="TellosAgras", tags=["IDV"], page=2)
+
+    python search.py build
+    python search.py query "καρδια" --tag RICH
+"""
+
+import json
+import re
+import sqlite3
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from build_corpus_from_txt import VARIANTS, corpus_paths
+from greek_phonology import fold
+from records import POETS, records_from_corpus
+
+INDEX_PATH = Path("index") / "search.db"
+MAX_PAGE_SIZE = 100
+# Seconds between checks of the corpus files from the API
+REFRESH_INTERVAL = 5.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    pairs INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS pairs (
+    id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    poet TEXT NOT NULL,
+    variant TEXT NOT NULL,
+    classification TEXT NOT NULL,
+    line1 INTEGER NOT NULL,
+    line2 INTEGER NOT NULL,
+    text1 TEXT NOT NULL,
+    text2 TEXT NOT NULL,
+    phonetic1 TEXT NOT NULL,
+    phonetic2 TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS pairs_source ON pairs (source);
+CREATE INDEX IF NOT EXISTS pairs_facets ON pairs (poet, variant, classification);
+CREATE TABLE IF NOT EXISTS pair_tags (
+    pair_id INTEGER NOT NULL,
+    tag TEXT NOT NULL,
+    PRIMARY KEY (tag, pair_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS pair_tags_pair ON pair_tags (pair_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS pairs_fts USING fts5 (body, tokenize = 'unicode61');
+"""
+
+WORD_RE = re.compile(r"\w+")
+FACETS = ("poet", "variant", "classification")
+
+
+def fold_text(text: str) -> str:
+    """Accent-, diaeresis- and case-folded words, final sigma as σ"""
+    return " ".join(fold(w).replace("ς", "σ") for w in WORD_RE.findall(text) if fold(w))
+
+
+def fts_query(query: str) -> Optional[str]:
+    """Folded words as quoted FTS5 prefix terms (every word must match); None if no words"""
+    words = fold_text(query).split()
+    return " ".join(f'"{w}"*' for w in words) if words else None
+
+
+def corpus_files() -> Dict[str, Tuple[str, str]]:
+    """Existing regular corpus files -> (poet, variant facet)"""
+    files = {}
+    for variant in VARIANTS:
+        for poet in POETS:
+            path = corpus_paths(poet, variant)[0]
+            if path.exists():
+                files[str(path)] = (poet, variant or "regular")
+    return files
+
+
+class SearchIndex:
+    def __init__(self, path=INDEX_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._checked = 0.0
+        with self._connect() as db:
+            db.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        db = sqlite3.connect(self.path, timeout=30)
+        db.row_factory = sqlite3.Row
+        try:
+            yield db
+        finally:
+            db.close()
+
+    # === INDEXING ===
+
+    def refresh(self) -> Dict:
+        """Reindex changed, new and removed corpus files; returns what was done"""
+        self._checked = time.monotonic()
+        files = corpus_files()
+        done = {"indexed": [], "removed": []}
+        with self._connect() as db:
+            known = {r["path"]: (r["size"], r["mtime_ns"]) for r in db.execute("SELECT * FROM sources")}
+            for path in set(known) - set(files):
+                self._drop(db, path)
+                db.execute("DELETE FROM sources WHERE path = ?", (path,))
+                done["removed"].append(path)
+            for path, facets in files.items():
+                st = Path(path).stat()
+                if known.get(path) == (st.st_size, st.st_mtime_ns):
+                    continue
+                with open(path, "r", encoding="utf-8") as f:
+                    records = records_from_corpus(json.load(f), facets[0])
+                self._drop(db, path)
+                self._insert(db, path, *facets, records)
+                db.execute("INSERT OR REPLACE INTO sources VALUES (?, ?, ?, ?)",
+                           (path, st.st_size, st.st_mtime_ns, len(records)))
+                done["indexed"].append(path)
+            db.commit()
+        return done
+
+    def refresh_if_due(self):
+        if time.monotonic() - self._checked >= REFRESH_INTERVAL:
+            self.refresh()
+
+    @staticmethod
+    def _drop(db: sqlite3.Connection, path: str):
+        ids = "SELECT id FROM pairs WHERE source = ?"
+        db.execute(f"DELETE FROM pairs_fts WHERE rowid IN ({ids})", (path,))
+        db.execute(f"DELETE FROM pair_tags WHERE pair_id IN ({ids})", (path,))
+        db.execute("DELETE FROM pairs WHERE source = ?", (path,))
+
+    @staticmethod
+    def _insert(db: sqlite3.Connection, path: str, poet: str, variant: str, records):
+        for r in records:
+            cur = db.execute(
+                "INSERT INTO pairs (source, poet, variant, classification, line1, line2, text1, text2, "
+                "phonetic1, phonetic2) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (path, poet, variant, r.classification, r.line1, r.line2,
+                 r.text1, r.text2, r.phonetic1, r.phonetic2))
+            pair_id = cur.lastrowid
+            body = fold_text(" ".join((r.text1, r.text2, r.phonetic1, r.phonetic2)))
+            db.execute("INSERT INTO pairs_fts (rowid, body) VALUES (?, ?)", (pair_id, body))
+            db.executemany("INSERT INTO pair_tags VALUES (?, ?)", [(pair_id, t) for t in r.tags])
+
+    # === QUERIES ===
+
+    def search(self, query: str = "", poet: Optional[str] = None, variant: Optional[str] = None,
+               classification: Optional[str] = None, tags: Optional[List[str]] = None,
+               page: int = 1, page_size: int = 20) -> Dict:
+        """
+        Pairs matching every query word (as a prefix) and every given facet value,
+        best match first; facet counts are over the whole match, not just the page.
+        """
+        if page < 1 or not 1 <= page_size <= MAX_PAGE_SIZE:
+            raise ValueError(f"page must be >= 1 and page_size between 1 and {MAX_PAGE_SIZE}")
+
+        where, args = [], []
+        match = fts_query(query)
+        if match:
+            where.append("p.id IN (SELECT rowid FROM pairs_fts WHERE pairs_fts MATCH ?)")
+            args.append(match)
+        for column, value in (("poet", poet), ("variant", variant), ("classification", classification)):
+            if value:
+                where.append(f"p.{column} = ?")
+                args.append(value)
+        for tag in tags or []:
+            where.append("p.id IN (SELECT pair_id FROM pair_tags WHERE tag = ?)")
+            args.append(tag)
+        condition = f"WHERE {' AND '.join(where)}" if where else ""
+
+        start = time.perf_counter()
+        with self._connect() as db:
+            # The full match once, for the count and the facets
+            db.execute(f"CREATE TEMP TABLE hits AS SELECT p.id FROM pairs p {condition}", args)
+            total = db.execute("SELECT COUNT(*) FROM hits").fetchone()[0]
+            if match:
+                rows = db.execute(
+                    "SELECT p.* FROM pairs_fts f JOIN pairs p ON p.id = f.rowid "
+                    "WHERE pairs_fts MATCH ? AND p.id IN (SELECT id FROM hits) "
+                    "ORDER BY f.rank, p.id LIMIT ? OFFSET ?",
+                    [match, page_size, (page - 1) * page_size]).fetchall()
+            else:
+                rows = db.execute("SELECT p.* FROM pairs p JOIN hits h ON h.id = p.id ORDER BY p.id LIMIT ? OFFSET ?",
+                                  [page_size, (page - 1) * page_size]).fetchall()
+            facets = {
+                column: dict(db.execute(f"SELECT p.{column}, COUNT(*) FROM hits h JOIN pairs p ON p.id = h.id "
+                                        f"GROUP BY p.{column} ORDER BY COUNT(*) DESC").fetchall())
+                for column in FACETS
+            }
+            facets["tag"] = dict(db.execute(
+                "SELECT t.tag, COUNT(*) FROM hits h JOIN pair_tags t ON t.pair_id = h.id "
+                "GROUP BY t.tag ORDER BY COUNT(*) DESC").fetchall())
+            tags_by_pair = {}
+            ids = [r["id"] for r in rows]
+            if ids:
+                marks = ",".join("?" * len(ids))
+                for pair_id, tag in db.execute(f"SELECT pair_id, tag FROM pair_tags WHERE pair_id IN ({marks})",
+                                               ids):
+                    tags_by_pair.setdefault(pair_id, []).append(tag)
+
+        return {
+            "query": query,
+            "total": total,
+            "page": page,
+            "page_size": page_size,
+            "pages": (total + page_size - 1) // page_size,
+            "results": [{
+                "poet": r["poet"],
+                "variant": r["variant"],
+                "classification": r["classification"],
+                "tags": sorted(tags_by_pair.get(r["id"], [])),
+                "line_numbers": [r["line1"], r["line2"]],
+                "lines": [r["text1"], r["text2"]],
+                "phonetic": [r["phonetic1"], r["phonetic2"]],
+            } for r in rows],
+            "facets": facets,
+            "elapsed_ms": round((time.perf_counter() - start) * 1000, 2),
+        }
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Corpus search index")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("build", help="Index new and changed corpus files")
+    q = sub.add_parser("query", help="Search the index")
+    q.add_argument("text", nargs="?", default="")
+    q.add_argument("--poet")
+    q.add_argument("--variant", choices=["regular", "topintzi"])
+    q.add_argument("--classification")
+    q.add_argument("--tag", action="append")
+    q.add_argument("--page", type=int, default=1)
+    args = parser.parse_args()
+
+    index = SearchIndex()
+    if args.command == "build":
+        start = time.perf_counter()
+        done = index.refresh()
+        print(f"Indexed {len(done['indexed'])} files, removed {len(done['removed'])} "
+              f"in {time.perf_counter() - start:.1f}s")
+    else:
+        index.refresh()
+        print(json.dumps(index.search(args.text, args.poet, args.variant, args.classification, args.tag,
+                                      args.page, 10), ensure_ascii=False, indent=2))
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Structured (JSON) identification output
+Instead of prose, the model returns rhyme pairs as JSON constrained by
+PAIRS_SCHEMA through each provider's own facility: a forced tool call for
+Anthropic, response_format json_schema for OpenAI/OpenRouter and
+responseSchema for Gemini (see app.call_model). The reply is validated into
+the Pydantic models below, and the output is capped per strategy
+(MAX_OUTPUT_TOKENS) instead of the 4000 tokens prose answers get.
+
+    POST /identify {"text": ..., "model": ..., "prompt_strategy": "few_shot", "output_format": "json"}
+    # -> RhymeResponse.pairs: [{"lines": [5, 8], "position": "M", "features": ["IDV"], ...}]
+
+    python benchmark_strategies.py --structured     # output tokens / latency vs the prose strategies
+"""
+
+import re
+from typing import List, Literal
+
+from pydantic import BaseModel, Field, ValidationError
+
+from prompts import get_identification_prompt
+
+POSITIONS = ["M", "F2", "F3"]
+FEATURE_CODES = ["TR-S", "TR-CC", "PR-C1", "PR-C2", "PR-CC1", "PR-CC2", "IDV", "IDV-2W", "MOS",
+                 "IMP-V", "IMP-C", "IMP-0F", "IMP-0M", "COPY"]
+
+# Output tokens per strategy in JSON mode; the CoT strategies get room for a
+# longer explanation per pair. Prose answers keep PROSE_MAX_TOKENS.
+MAX_OUTPUT_TOKENS = {
+    "zero_shot_structured": 1200,
+    "zero_shot_algorithm": 1200,
+    "few_shot": 1200,
+    "zero_shot_cot": 2000,
+    "few_shot_cot": 2000,
+}
+PROSE_MAX_TOKENS = 4000
+
+EXPLANATION_LIMIT = {"zero_shot_cot": "three sentences", "few_shot_cot": "three sentences"}
+
+# Fields of one pair object, also used by the packed prompts (packing.py)
+PAIR_FIELDS = """- "lines": the two line numbers (1-based, as numbered in the poem above)
+- "rhyme_domain": phonetic transcription of each line's rhyme domain, in the same order
+- "classification": the full code, e.g. "F2-MOS-IDV-2W"
+- "position": "M", "F2" or "F3"
+- "features": the feature codes of the classification ({codes})
+- "explanation": at most {limit}
+Lines without a rhyme partner are left out. Do not write anything outside the JSON.
+"""
+
+# Appended after the poem so the cacheable template prefix stays unchanged
+JSON_INSTRUCTIONS = """
+OUTPUT FORMAT: answer only with JSON of the form {{"pairs": [...]}}, one object per rhyme pair:
+""" + PAIR_FIELDS
+
+PAIRS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "pairs": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "lines": {"type": "array", "items": {"type": "integer"}, "minItems": 2, "maxItems": 2},
+                    "rhyme_domain": {"type": "array", "items": {"type": "string"}, "minItems": 2, "maxItems": 2},
+                    "classification": {"type": "string"},
+                    "position": {"type": "string", "enum": POSITIONS},
+                    "features": {"type": "array", "items": {"type": "string", "enum": FEATURE_CODES}},
+                    "explanation": {"type": "string"},
+                },
+                "required": ["lines", "rhyme_domain", "classification", "position", "features", "explanation"],
+                "additionalProperties": False,
+            },
+        },
+    },
+    "required": ["pairs"],
+    "additionalProperties": False,
+}
+
+
+class RhymePair(BaseModel):
+    lines: List[int] = Field(min_length=2, max_length=2)
+    rhyme_domain: List[str] = Field(min_length=2, max_length=2)
+    classification: str
+    position: Literal["M", "F2", "F3"]
+    features: List[str] = []
+    explanation: str = ""
+
+
+class StructuredIdentification(BaseModel):
+    pairs: List[RhymePair]
+
+
+class StructuredOutputError(ValueError):
+    pass
+
+
+def structured_prompt(text: str, strategy: str, rag_context: str = "") -> str:
+    """The strategy's prompt with the JSON output format appended"""
+    return get_identification_prompt(text, strategy, rag_context) + JSON_INSTRUCTIONS.format(
+        codes=", ".join(FEATURE_CODES), limit=EXPLANATION_LIMIT.get(strategy, "one sentence"))
+
+
+def gemini_schema(schema: dict) -> dict:
+    """Gemini's responseSchema is an OpenAPI subset without additionalProperties"""
+    if isinstance(schema, dict):
+        return {k: gemini_schema(v) for k, v in schema.items() if k != "additionalProperties"}
+    if isinstance(schema, list):
+        return [gemini_schema(v) for v in schema]
+    return schema
+
+
+FENCE_RE = re.compile(r"^```(?:json)?\s*|\s*```$")
+
+
+def parse_structured(output: str, num_lines: int) -> List[RhymePair]:
+    """
+    Validate a JSON reply; pairs naming lines outside the poem (or a line with
+    itself) are dropped. Raises StructuredOutputError when the reply is not
+    valid against the schema, e.g. when it was cut off by the token cap.
+    """
+    try:
+        parsed = StructuredIdentification.model_validate_json(FENCE_RE.sub("", output.strip()))
+    except ValidationError as e:
+        raise StructuredOutputError(f"Model output does not match the rhyme pair schema: "
+                                    f"{e.errors()[0]['msg']}") from e
+    return valid_pairs(parsed.pairs, num_lines)
+
+
+def valid_pairs(parsed: List[RhymePair], num_lines: int) -> List[RhymePair]:
+    """Pairs within the poem, each with its lower line first"""
+    pairs = []
+    for p in parsed:
+        a, b = p.lines
+        if a != b and 1 <= a <= num_lines and 1 <= b <= num_lines:
+            pairs.append(p.model_copy(update={"lines": [b, a], "rhyme_domain": p.rhyme_domain[::-1]}) if a > b else p)
+    return pairs
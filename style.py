@@ -0,0 +1,448 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Poet style fingerprints: nearest-poet attribution and style-matched examples
+A poet's rhyming habits are summarized as distributions over the pairs of
+their corpus (stress type, rhyme type, IMP variant, distance between the
+two lines), the rate of IDV and MOSAIC pairs, and the distribution of
+line lengths in syllables from the meter index (meter.py). The fingerprints
+of every poet are computed once per variant and kept in
+json/style[_<variant>].json, rebuilt when a corpus or meter index is newer.
+
+A poem is fingerprinted the same way: its verse lines go through the
+window detector the corpus build uses (rhyme_detection) and the scanner,
+so attributing it is a comparison with six small vectors. Groups are
+compared by total variation distance (half the L1 distance) and the rates
+by their absolute difference; groups the poem has no data for (no
+imperfect pairs, say) are left out. Similarity is one minus the mean,
+weighted by WEIGHTS. evaluate() measures attribution on held-out poems
+(each poem left out of its poet's fingerprint) and can tune the weights.
+
+For generation, typicality() scores a corpus pair by how common each of
+its traits is for the poet, so rag_system can pick the poet's most
+characteristic pairs, then those of the nearest poets.
+
+    attribute("Πάνω στην άμμο την ξανθή\\n...")   # {"poets": [{"poet", "similarity", "distances"}, ...], ...}
+    fingerprints()["TellosAgras"].vector()
+
+    python style.py build [--variant topintzi]
+    python style.py attribute poem.txt
+    python style.py evaluate [--variant topintzi] [--tune]
+"""
+
+import json
+import re
+import time
+from bisect import bisect_right
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from build_corpus_from_txt import VARIANTS, corpus_paths
+from ingest import JSON_DIR, load_line_table
+from meter import MeterIndex, meter_index, meter_index_path, scan_poem
+from records import POETS, RhymeRecord, load_records
+from rhyme_detection import find_rhymes_windowed
+
+FINGERPRINT_VERSION = 1
+# Categories per group; pair traits outside them (COPY) are not counted in that group
+GROUPS = {
+    "stress": ["M", "F2", "F3"],
+    "rhyme_type": ["PURE", "RICH", "IMPERFECT", "MOSAIC"],
+    "imp": ["IMP-V", "IMP-C", "IMP-0", "IMP-0F-TOPINTZI"],
+    "distance": ["1", "2", "3", "4+"],
+    "line_length": ["<=7", "8", "9-10", "11", "12", "13-14", "15", "16+"],
+}
+# Shares of all pairs, compared by absolute difference
+RATES = ["IDV", "MOS"]
+LENGTH_BUCKETS = [(7, "<=7"), (8, "8"), (10, "9-10"), (11, "11"), (12, "12"), (14, "13-14"), (15, "15")]
+MAX_TOP = 10
+# Weight of each group (and of the rates) in compare(), tuned on held-out poems (python style.py evaluate)
+WEIGHTS = {"stress": 0.25, "rhyme_type": 1.0, "imp": 0.25, "distance": 1.0, "line_length": 1.0, "rates": 1.0}
+# Poems with fewer detected pairs are left out of the evaluation
+MIN_EVAL_PAIRS = 4
+
+
+def length_bucket(syllables: int) -> str:
+    return next((label for top, label in LENGTH_BUCKETS if syllables <= top), "16+")
+
+
+def pair_traits(record: RhymeRecord) -> Dict[str, str]:
+    """Category of a pair in each pair group"""
+    distance = record.line2 - record.line1
+    traits = {
+        "stress": record.stress.value,
+        "rhyme_type": record.rhyme_type.value,
+        "distance": "4+" if distance >= 4 else str(distance),
+    }
+    if record.imp_type:
+        traits["imp"] = record.imp_type.value
+    return traits
+
+
+class Fingerprint:
+    """Category counts of one poet (or poem); vector() normalizes them"""
+
+    def __init__(self, counts: Optional[Dict[str, Dict[str, int]]] = None, pairs: int = 0, lines: int = 0):
+        self.counts = {group: Counter((counts or {}).get(group, {})) for group in [*GROUPS, "rates"]}
+        self.pairs = pairs
+        self.lines = lines
+
+    def add_pair(self, record: RhymeRecord):
+        self.pairs += 1
+        for group, category in pair_traits(record).items():
+            self.counts[group][category] += 1
+        if record.idv:
+            self.counts["rates"]["IDV"] += 1
+        if record.rhyme_type.value == "MOSAIC":
+            self.counts["rates"]["MOS"] += 1
+
+    def add_line(self, syllables: int):
+        self.lines += 1
+        self.counts["line_length"][length_bucket(syllables)] += 1
+
+    def distribution(self, group: str) -> Optional[List[float]]:
+        """Shares of the group's categories; None without data"""
+        counts = [self.counts[group][c] for c in GROUPS[group]]
+        total = sum(counts)
+        return [c / total for c in counts] if total else None
+
+    def rates(self) -> Optional[List[float]]:
+        return [self.counts["rates"][r] / self.pairs for r in RATES] if self.pairs else None
+
+    def share(self, group: str, category: str) -> float:
+        total = sum(self.counts[group][c] for c in GROUPS[group])
+        return self.counts[group][category] / total if total else 0.0
+
+    def vector(self) -> Dict[str, Optional[Dict[str, float]]]:
+        vector = {}
+        for group, categories in GROUPS.items():
+            dist = self.distribution(group)
+            vector[group] = {c: round(p, 4) for c, p in zip(categories, dist)} if dist else None
+        rates = self.rates()
+        vector["rates"] = {r: round(p, 4) for r, p in zip(RATES, rates)} if rates else None
+        return vector
+
+    def __sub__(self, other: "Fingerprint") -> "Fingerprint":
+        """These counts without other's (a poet's fingerprint without one of their poems)"""
+        return Fingerprint({group: self.counts[group] - other.counts[group] for group in self.counts},
+                           self.pairs - other.pairs, self.lines - other.lines)
+
+    def to_dict(self) -> Dict:
+        return {"pairs": self.pairs, "lines": self.lines,
+                "counts": {group: dict(counts) for group, counts in self.counts.items()}}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Fingerprint":
+        return cls(data["counts"], data["pairs"], data["lines"])
+
+
+def distances(a: Fingerprint, b: Fingerprint) -> Dict[str, float]:
+    """Distance per group (and for the rates) both fingerprints have data for"""
+    result = {}
+    for group in GROUPS:
+        pa, pb = a.distribution(group), b.distribution(group)
+        if pa and pb:
+            result[group] = sum(abs(x - y) for x, y in zip(pa, pb)) / 2
+    ra, rb = a.rates(), b.rates()
+    if ra and rb:
+        result["rates"] = sum(abs(x - y) for x, y in zip(ra, rb)) / len(RATES)
+    return result
+
+
+def similarity(dists: Dict[str, float], weights: Optional[Dict[str, float]] = None) -> float:
+    """One minus the weighted mean of the distances"""
+    weights = weights or WEIGHTS
+    total = sum(weights[g] for g in dists)
+    return 1 - sum(weights[g] * d for g, d in dists.items()) / total if total else 0.0
+
+
+def compare(a: Fingerprint, b: Fingerprint) -> Tuple[float, Dict[str, float]]:
+    """Similarity in [0, 1] and the distance per group both have data for"""
+    dists = distances(a, b)
+    return similarity(dists), dists
+
+
+# === CORPUS FINGERPRINTS ===
+
+def fingerprints_path(variant: Optional[str] = None):
+    return JSON_DIR / f"style{VARIANTS[variant]['suffix']}.json"
+
+
+def sources(variant: Optional[str] = None) -> List:
+    """Files the fingerprints are computed from"""
+    return [path for poet in POETS for path in (corpus_paths(poet, variant)[0], meter_index_path(poet))
+            if path.exists()]
+
+
+def fingerprints_stale(variant: Optional[str] = None) -> bool:
+    path = fingerprints_path(variant)
+    if not path.exists():
+        return True
+    built = path.stat().st_mtime
+    return any(source.stat().st_mtime > built for source in sources(variant))
+
+
+def build_fingerprints(variant: Optional[str] = None) -> Dict[str, Fingerprint]:
+    """Fingerprint every poet with a corpus for this variant and save them"""
+    prints = {}
+    for poet in POETS:
+        if not corpus_paths(poet, variant)[0].exists():
+            continue
+        fp = prints[poet] = Fingerprint()
+        for record in load_records(poet, variant):
+            fp.add_pair(record)
+        index = meter_index(poet)
+        for syllables, code in zip(index.syllables, index.codes):
+            if index.meters[code] != "none":
+                fp.add_line(syllables)
+    data = {"version": FINGERPRINT_VERSION, "variant": variant,
+            "poets": {poet: fp.to_dict() for poet, fp in sorted(prints.items())}}
+    fingerprints_path(variant).write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+    return prints
+
+
+# Loaded fingerprints by variant, with the mtime of the file they came from
+_loaded: Dict[Optional[str], Tuple[int, Dict[str, Fingerprint]]] = {}
+
+
+def fingerprints(variant: Optional[str] = None) -> Dict[str, Fingerprint]:
+    """The saved fingerprints, rebuilt when missing or older than a corpus or meter index"""
+    if variant not in VARIANTS:
+        raise ValueError(f"Unknown variant {variant!r}")
+    path = fingerprints_path(variant)
+    if fingerprints_stale(variant):
+        build_fingerprints(variant)
+    mtime = path.stat().st_mtime_ns
+    if variant not in _loaded or _loaded[variant][0] != mtime:
+        data = json.loads(path.read_text(encoding="utf-8"))
+        if data["version"] != FINGERPRINT_VERSION:
+            build_fingerprints(variant)
+            return fingerprints(variant)
+        _loaded[variant] = (mtime, {poet: Fingerprint.from_dict(d) for poet, d in data["poets"].items()})
+    return _loaded[variant][1]
+
+
+# === ATTRIBUTION ===
+
+def fingerprint_text(text: str, variant: Optional[str] = None) -> Fingerprint:
+    """Fingerprint a poem with the corpus build's window detector and the scanner"""
+    lines = [line.strip() for line in text.replace("\r\n", "\n").split("\n") if line.strip()]
+    fp = Fingerprint()
+    for i, j, res in find_rhymes_windowed(lines, variant=variant):
+        try:
+            fp.add_pair(RhymeRecord.from_dict("input", {"line_numbers": [i + 1, j + 1], "lines": [lines[i], lines[j]],
+                                                        **res}))
+        except ValueError:
+            continue
+    for scan in scan_poem(lines):
+        if scan.meter != "none":
+            fp.add_line(scan.syllables)
+    return fp
+
+
+def nearest(fp: Fingerprint, variant: Optional[str] = None, top: int = 3) -> List[Dict]:
+    ranked = []
+    for poet, other in fingerprints(variant).items():
+        score, dists = compare(fp, other)
+        ranked.append({"poet": poet, "similarity": round(score, 4),
+                       "distances": {g: round(d, 4) for g, d in dists.items()}})
+    ranked.sort(key=lambda r: -r["similarity"])
+    return ranked[:top]
+
+
+def attribute(text: str, variant: Optional[str] = None, top: int = 3) -> Dict:
+    """Nearest poets to a poem, with the poem's fingerprint"""
+    if not 1 <= top <= MAX_TOP:
+        raise ValueError(f"top must be between 1 and {MAX_TOP}")
+    start = time.perf_counter()
+    fingerprints(variant)
+    loaded = time.perf_counter()
+    fp = fingerprint_text(text, variant)
+    return {
+        "poets": nearest(fp, variant, top),
+        "pairs": fp.pairs,
+        "lines": fp.lines,
+        "fingerprint": fp.vector(),
+        "elapsed_ms": round((time.perf_counter() - loaded) * 1000, 2),
+        "load_ms": round((loaded - start) * 1000, 2),
+    }
+
+
+# === EVALUATION ===
+
+def poem_fingerprints(poet: str, variant: Optional[str] = None) -> List[Fingerprint]:
+    """A fingerprint per poem of the poet's line table, from the corpus and meter index (they sum to the poet's)"""
+    table = load_line_table(poet)
+    starts = [p["start"] for p in table["poems"]]
+    prints = [Fingerprint() for _ in starts]
+    for record in load_records(poet, variant):
+        k = bisect_right(starts, record.line1 - 1) - 1
+        if k >= 0 and record.line1 <= table["poems"][k]["end"]:
+            prints[k].add_pair(record)
+    index = meter_index(poet)
+    for k, p in enumerate(table["poems"]):
+        for row in range(p["start"], p["end"]):
+            if index.meters[index.codes[row]] != "none":
+                prints[k].add_line(index.syllables[row])
+    return prints
+
+
+def held_out(variant: Optional[str] = None, min_pairs: int = MIN_EVAL_PAIRS) -> List[Tuple[str, Dict]]:
+    """
+    Leave-one-poem-out distances: for every poem with min_pairs pairs, its
+    (poet, {candidate: distances}) against each poet's fingerprint, its own
+    poet's taken without the poem
+    """
+    prints = fingerprints(variant)
+    rows = []
+    for poet in prints:
+        for poem in poem_fingerprints(poet, variant):
+            if poem.pairs < min_pairs:
+                continue
+            rows.append((poet, {other: distances(poem, fp - poem if other == poet else fp)
+                                for other, fp in prints.items()}))
+    return rows
+
+
+def accuracy(rows: List[Tuple[str, Dict]], weights: Optional[Dict[str, float]] = None) -> Dict:
+    """Top-1 and top-3 attribution accuracy per poet and averaged over poets (macro)"""
+    hits = {}
+    for poet, candidates in rows:
+        ranked = sorted(candidates, key=lambda c: -similarity(candidates[c], weights))
+        counts = hits.setdefault(poet, [0, 0, 0])
+        counts[0] += 1
+        counts[1] += ranked[0] == poet
+        counts[2] += poet in ranked[:3]
+    per_poet = {poet: {"poems": n, "top1": round(t1 / n, 3), "top3": round(t3 / n, 3)}
+                for poet, (n, t1, t3) in sorted(hits.items())}
+    return {
+        "poems": len(rows),
+        "top1": round(sum(p["top1"] for p in per_poet.values()) / len(per_poet), 3) if per_poet else 0.0,
+        "top3": round(sum(p["top3"] for p in per_poet.values()) / len(per_poet), 3) if per_poet else 0.0,
+        "poets": per_poet,
+    }
+
+
+def tune_weights(rows: List[Tuple[str, Dict]], steps=(0.0, 0.25, 0.5, 1.0, 2.0, 4.0),
+                 rounds: int = 3) -> Dict[str, float]:
+    """Coordinate ascent on macro top-1 accuracy (top-3 breaks ties), one group at a time"""
+    weights = {g: 1.0 for g in WEIGHTS}
+
+    def score(w):
+        acc = accuracy(rows, w)
+        return acc["top1"], acc["top3"]
+
+    best = score(weights)
+    for _ in range(rounds):
+        improved = False
+        for group in weights:
+            for step in steps:
+                trial = {**weights, group: step}
+                if not any(trial.values()):
+                    continue
+                result = score(trial)
+                if result > best:
+                    best, weights, improved = result, trial, True
+        if not improved:
+            break
+    return weights
+
+
+def evaluate(variant: Optional[str] = None, tune: bool = False) -> Dict:
+    """
+    Held-out attribution accuracy with equal weights and with WEIGHTS. With
+    tune, the weight search is cross-validated over two folds (fitted on one
+    half of the held-out poems, scored on the other) and then run on all of
+    them to give the weights to use.
+    """
+    rows = held_out(variant)
+    equal = {g: 1.0 for g in WEIGHTS}
+    report = {"variant": variant, "min_pairs": MIN_EVAL_PAIRS,
+              "equal_weights": accuracy(rows, equal), "weights": WEIGHTS, "weighted": accuracy(rows)}
+    if tune:
+        folds = []
+        for fit, test in ((rows[0::2], rows[1::2]), (rows[1::2], rows[0::2])):
+            weights = tune_weights(fit)
+            folds.append({"weights": weights, "test": accuracy(test, weights),
+                          "test_equal_weights": accuracy(test, equal)})
+        report["cross_validation"] = folds
+        report["tuned_weights"] = tune_weights(rows)
+    return report
+
+
+# === GENERATION ===
+
+def neighbours(poet: str, variant: Optional[str] = None) -> List[str]:
+    """The other poets, nearest fingerprint first"""
+    prints = fingerprints(variant)
+    return [r["poet"] for r in nearest(prints[poet], variant, len(prints)) if r["poet"] != poet]
+
+
+def typicality(record: RhymeRecord, fp: Fingerprint, index: MeterIndex) -> float:
+    """
+    Mean share, in a poet's fingerprint, of the pair's traits and of its lines'
+    lengths (from index, the meter index of the record's own poet)
+    """
+    shares = [fp.share(group, category) for group, category in pair_traits(record).items()]
+    for line in record.line_numbers:
+        if index.meter(line) != "none":
+            shares.append(fp.share("line_length", length_bucket(index.syllables[line - 1])))
+    return sum(shares) / len(shares)
+
+
+def display_name(poet: str) -> str:
+    return re.sub(r"(?<=[a-z])(?=[A-Z])", " ", poet)
+
+
+def describe(poet: str, variant: Optional[str] = None) -> str:
+    """One-line summary of a poet's fingerprint for the generation prompt"""
+    fp = fingerprints(variant)[poet]
+    vector = fp.vector()
+    parts = []
+    for group, label in (("stress", "stress"), ("rhyme_type", "rhyme"), ("line_length", "line length")):
+        if vector[group]:
+            common = sorted(vector[group].items(), key=lambda cp: -cp[1])[:2]
+            parts.append(f"{label} " + ", ".join(f"{c} {p:.0%}" for c, p in common if p))
+    if vector["rates"]:
+        parts.append(", ".join(f"{r} {p:.0%}" for r, p in vector["rates"].items()))
+    return f"{display_name(poet)} ({'; '.join(parts)})"
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Poet style fingerprints")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="Recompute and save the fingerprints")
+    build.add_argument("--variant", choices=[v for v in VARIANTS if v], default=None)
+    attr = sub.add_parser("attribute", help="Nearest poets to a poem")
+    attr.add_argument("path")
+    attr.add_argument("--variant", choices=[v for v in VARIANTS if v], default=None)
+    attr.add_argument("--top", type=int, default=3)
+    ev = sub.add_parser("evaluate", help="Leave-one-poem-out attribution accuracy")
+    ev.add_argument("--variant", choices=[v for v in VARIANTS if v], default=None)
+    ev.add_argument("--tune", action="store_true", help="Cross-validate the weight search and print tuned weights")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        start = time.perf_counter()
+        prints = build_fingerprints(args.variant)
+        print(f"  ✓ {len(prints)} poets → {fingerprints_path(args.variant)} ({time.perf_counter() - start:.1f}s)")
+        for poet, fp in prints.items():
+            print(f"    {poet}: {fp.pairs} pairs, {fp.lines} lines")
+    elif args.command == "evaluate":
+        report = evaluate(args.variant, args.tune)
+        print(f"{'poet':22} {'poems':>6} {'equal top1/top3':>16} {'WEIGHTS top1/top3':>18}")
+        for poet, eq in report["equal_weights"]["poets"].items():
+            w = report["weighted"]["poets"][poet]
+            print(f"{poet:22} {eq['poems']:>6} {eq['top1']:>8.1%} {eq['top3']:>7.1%} {w['top1']:>9.1%} {w['top3']:>8.1%}")
+        eq, w = report["equal_weights"], report["weighted"]
+        print(f"{'macro':22} {eq['poems']:>6} {eq['top1']:>8.1%} {eq['top3']:>7.1%} {w['top1']:>9.1%} {w['top3']:>8.1%}")
+        for k, fold in enumerate(report.get("cross_validation", [])):
+            t, e = fold["test"], fold["test_equal_weights"]
+            print(f"  fold {k + 1}: tuned {t['top1']:.1%}/{t['top3']:.1%} vs equal {e['top1']:.1%}/{e['top3']:.1%} "
+                  f"with {fold['weights']}")
+        if args.tune:
+            print(f"  tuned on all held-out poems: {report['tuned_weights']}")
+    else:
+        with open(args.path, "r", encoding="utf-8") as f:
+            print(json.dumps(attribute(f.read(), args.variant, args.top), ensure_ascii=False, indent=2))
@@ -0,0 +1,32 @@
+"""Local verification of generated drafts"""
+
+from best_of_n import verify
+
+# Cross rhyme: a MOSAIC pair (lines 1, 3) and an IMP-V pair (lines 2, 4)
+DRAFT = """Και τότε εκείνη τη στιγμή εγώ 'μουν
+κι ο ίδιος ουρανός ξαναϋφαίνει
+το χόρτο πάνω στο οποίο κυλιώμουν
+το φως που ως εδώ κάτω δε φτάνει"""
+
+
+def test_verify_scores_mosaic_and_imp_v_pairs():
+    mosaic = verify(DRAFT, "F2", ["MOS"], 4)
+    assert {"lines": [1, 3], "matches": True} in [{k: p[k] for k in ("lines", "matches")} for p in mosaic["pairs"]]
+    imp_v = verify(DRAFT, "F2", ["IMP-V"], 4)
+    assert [p["lines"] for p in imp_v["pairs"] if p["matches"]] == [[2, 4]]
+    # Each draft has one fully matching pair and one with the stress only
+    assert mosaic["score"] == imp_v["score"] == 0.75
+
+# The same draft with an F3 mosaic (εγώ 'μουνα / κυλιόμουνα)
+DRAFT_F3 = """Και τότε εκείνη τη στιγμή εγώ 'μουνα
+κι ο ίδιος ουρανός ξαναϋφαίνει
+το χόρτο πάνω στο οποίο κυλιόμουνα
+το φως που ως εδώ κάτω δε φτάνει"""
+
+
+def test_verify_scores_mosaic_by_its_own_stress():
+    f3 = verify(DRAFT_F3, "F3", ["MOS"], 4)
+    assert [p["lines"] for p in f3["pairs"] if p["matches"]] == [[1, 3]]
+    assert f3["score"] == 0.5
+    # An F3 mosaic is not an F2 one
+    assert [1, 3] not in [p["lines"] for p in verify(DRAFT_F3, "F2", ["MOS"], 4)["pairs"]]
@@ -0,0 +1,41 @@
+"""Header filtering of the raw collections (examples from raw_text/)"""
+
+import pytest
+
+from ingest import header_kind, segment
+
+
+@pytest.mark.parametrize("text", [
+    "ΣΤΟΝ ΠΟΙΗΤΗΝ κ.ΙΩ.ΠΑΝΑΓΙΩΤΟΠΟΥΛΟΝ",      # dedication
+    "ΣΤΟΝ ΚΡΙΤΙΚΟ κ. Κ. ΔΗΜΑΡΑ",
+    "La chair vieillit après les roses.",      # epigraph
+    "Laforgue, «Les Complaintes»",             # its attribution
+    "1923-1930",                               # colophons
+    "Πάτρα. Γενάρης 1910",
+    "᾿Αθήνα. 1918",
+    "Δ. Σολωμός",                              # author lines
+    "Δ. Σολωμός (« \"Ο Πόρφυρας»)",
+])
+def test_non_verse_lines_are_meta(text):
+    assert header_kind(text, isolated=False) == "meta"
+
+
+@pytest.mark.parametrize("text", [
+    "Δ.Α. Πλένεις τ' αχείλι; Εγώ θα το ξαναφιλήσω.",
+    "Κακή 'ναι για το γέρο η ξενιτιά.",
+    "δέ βρίσκεται η ᾿Αθήνα. Έφυγε πιά!",
+])
+def test_verse_lines_are_kept(text):
+    assert header_kind(text, isolated=False) is None
+
+
+def test_uppercase_titles_stay_titles():
+    assert header_kind("ΠΑΡΑΦΩΝΙΕΣ", isolated=False) == "title"
+    assert header_kind("TO ANEYPETO", isolated=True) == "title"
+
+
+def test_epigraph_and_its_author_keep_the_poem_title():
+    records = list(segment(["ΒΑΚΧΙΚΟ", "", "Au lieu d'un habit vain, elle a un corps!", "MALLARMÉ", "",
+                            "Του σπιτιού χαρά, χέρια γυμνά της κόρης",
+                            "— χαρά που άρχιζες και θάμα που επροχώρεις —"]))
+    assert [(r["title"], r["line"]) for r in records] == [("ΒΑΚΧΙΚΟ", 1), ("ΒΑΚΧΙΚΟ", 2)]
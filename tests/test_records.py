@@ -0,0 +1,13 @@
+"""Compact rhyme pair records against the corpus files (run from the repo root)"""
+
+from records import measure, measure_all
+
+
+def test_measure_round_trips_one_poet():
+    m = measure("RomosFiliras", None)
+    assert m["pairs"] > 0 and m["records_kb"] < m["dicts_kb"]
+
+
+def test_measure_all_loads_every_corpus():
+    m = measure_all()
+    assert m["files"] == 12 and m["pairs"] > 0
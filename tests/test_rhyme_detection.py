@@ -0,0 +1,32 @@
+"""Bucketed detection against the window mode on the real corpora (run from the repo root)"""
+
+import pytest
+
+from ingest import iter_poems, load_line_table
+from rhyme_detection import DEFAULT_WINDOW, find_rhymes_bucketed, find_rhymes_windowed
+
+
+def detected(found):
+    return {(i, j, res["classification"]) for i, j, res in found}
+
+
+@pytest.mark.parametrize("variant", [None, "topintzi"])
+def test_bucketed_matches_window_within_max_distance(variant):
+    windowed, bucketed = set(), set()
+    for poem, _, lines in iter_poems(load_line_table("MitsosPapanikolaou")):
+        windowed |= {(poem["poem"], *pair) for pair in detected(find_rhymes_windowed(lines, variant=variant))}
+        bucketed |= {(poem["poem"], *pair) for pair in
+                     detected(find_rhymes_bucketed(lines, max_distance=DEFAULT_WINDOW, variant=variant))}
+    classes = {c for *_, c in windowed}
+    # The pairs a stress/vowel/coda key used to lose
+    assert "MOSAIC" in classes and any("IMP-V" in c for c in classes)
+    assert bucketed == windowed
+
+
+def test_bucketed_finds_mosaic_and_imp_v_at_any_distance():
+    lines = ["Και τότε εκείνη τη στιγμή εγώ 'μουν", "το χόρτο πάνω στο οποίο κυλιώμουν",
+             "κι ο ίδιος ουρανός ξαναϋφαίνει", "το φως που ως εδώ κάτω δε φτάνει"]
+    found = detected(find_rhymes_bucketed(lines))
+    assert found == detected(find_rhymes_windowed(lines))
+    assert any(i == 0 and j == 1 and c == "MOSAIC" for i, j, c in found)
+    assert any(i == 2 and j == 3 and "IMP-V" in c for i, j, c in found)